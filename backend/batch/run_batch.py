@@ -0,0 +1,262 @@
+"""
+Batch arrangement of MIDI corpora for neck instruments.
+
+Arrange every MIDI file of directories or glob patterns, for several instruments, in parallel
+worker processes, and append one JSON line per file and instrument to the output:
+    python -m backend.batch.run_batch corpus/ "other/**/*.mid" --instruments Guitar Ukulele \
+        --workers 8 --output arrangements.jsonl --cache arrangements.sqlite
+
+Each file is parsed once per worker task and arranged for every instrument. The results
+already in the output (same file content and instrument) are skipped, so an interrupted run
+is resumed by running it again (--retry-failed arranges the failed ones again). With a cache
+(see arrangement_cache), the arrangements already computed are read from it without parsing
+the MIDI file.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from backend.src.api.api import INSTRUMENT_CLASSES
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.arrangement_cache import (
+    ArrangementCache,
+    arrangement_key,
+    cached_neck_arrangement_hit,
+    midi_key,
+    piece_hash,
+)
+from backend.src.music_piece.arrangement.neck_arrangement import arrangement_cost, neck_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.positions.neck_position import NeckPosition
+
+MIDI_SUFFIXES = (".mid", ".midi")
+
+Record = dict[str, Any]
+
+
+def collect_midi_files(inputs: list[str]) -> list[Path]:
+    """Returns the MIDI files of the inputs, sorted and without duplicates.
+    An input is a MIDI file, a directory (searched recursively) or a glob pattern."""
+    files: set[Path] = set()
+    for pattern in inputs:
+        path = Path(pattern)
+        if path.is_dir():
+            files.update(file for file in path.rglob("*") if file.suffix.lower() in MIDI_SUFFIXES)
+        elif path.is_file():
+            files.add(path)
+        else:
+            files.update(
+                Path(file)
+                for file in glob.glob(pattern, recursive=True)  # noqa: PTH207  # patterns may be absolute
+                if Path(file).suffix.lower() in MIDI_SUFFIXES
+            )
+    return sorted(files)
+
+
+def completed_results(output: Path, *, retry_failed: bool = False) -> set[tuple[str, str, str]]:
+    """Returns the (file, instrument, MIDI key) of the results in the output,
+    only those without error to retry the failed ones."""
+    if not output.exists():
+        return set()
+    completed = set()
+    with output.open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # a line cut by an interrupted run
+                continue
+            if not retry_failed or record.get("error") is None:
+                completed.add((record["file"], record["instrument"], record["midi_key"]))
+    return completed
+
+
+@cache
+def _instrument(name: str) -> NeckInstrument:
+    """Returns the instrument of a name, created once per worker process."""
+    return INSTRUMENT_CLASSES[name]()
+
+
+def arrange_file(
+    midi_path: Path, instrument_names: list[str], fs: int, cache_path: Path | None
+) -> list[Record]:
+    """Arranges a MIDI file for instruments (run in a worker process).
+    The file is parsed at most once, and not at all when every arrangement is in the cache.
+
+    Returns:
+        list[Record]: One record per instrument: the file, instrument and MIDI key, the number
+            of chords, the total cost and the positions, if the result was read from the cache,
+            the time spent in seconds, and the error (None if the file was arranged).
+    """
+    file_key = midi_key(midi_path, fs)
+    arrangement_cache = None if cache_path is None else ArrangementCache(cache_path)
+    music_piece_hash = None if arrangement_cache is None else arrangement_cache.get(file_key)
+    music_piece: MusicPiece | None = None
+    records: list[Record] = []
+    for name in instrument_names:
+        start = time.perf_counter()
+        instrument = _instrument(name)
+        record: Record = {"file": str(midi_path), "instrument": name, "midi_key": file_key}
+        try:
+            positions = None
+            if arrangement_cache is not None and music_piece_hash is not None:
+                positions = arrangement_cache.get_arrangement(
+                    arrangement_key(music_piece_hash, instrument)
+                )
+            cached = positions is not None
+            if positions is None:
+                if music_piece is None:
+                    music_piece = MusicPiece.from_midi(midi_path, fs=fs)
+                if arrangement_cache is not None and music_piece_hash is None:
+                    music_piece_hash = piece_hash(music_piece)
+                    arrangement_cache.put(file_key, music_piece_hash)
+                positions, cached = _arrange(music_piece, instrument, arrangement_cache)
+        except Exception as error:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+            # a broken file must not stop the batch
+            record.update(
+                error=str(error) or type(error).__name__, seconds=time.perf_counter() - start
+            )
+        else:
+            record.update(
+                chords=len(positions),
+                total_cost=arrangement_cost(positions, instrument),
+                positions=[instrument.expand_courses(position).to_json() for position in positions],
+                cached=cached,
+                seconds=time.perf_counter() - start,
+                error=None,
+            )
+        records.append(record)
+    return records
+
+
+def _arrange(
+    music_piece: MusicPiece, instrument: NeckInstrument, arrangement_cache: ArrangementCache | None
+) -> tuple[list[NeckPosition], bool]:
+    """Arranges a music piece, through the cache if there is one, and returns the positions
+    with True if they were read from the cache.
+
+    Raises:
+        ValueError: if the piece can't be arranged, or the arrangement misses timed chords.
+    """
+    if arrangement_cache is None:
+        positions, cached = neck_arrangement(music_piece, instrument), False
+    else:
+        positions, cached = cached_neck_arrangement_hit(music_piece, instrument, arrangement_cache)
+    if len(positions) != len(music_piece.timed_chords):
+        msg = (
+            f"The arrangement has {len(positions)} positions "
+            f"for {len(music_piece.timed_chords)} timed chords."
+        )
+        raise ValueError(msg)
+    return positions, cached
+
+
+def _completed_tasks(
+    tasks: list[tuple[Path, list[str]]], workers: int, fs: int, cache_path: Path | None
+) -> Iterator[list[Record]]:
+    """Yields the records of each task as soon as it is done, in this process for one worker."""
+    if workers == 1:
+        for midi_path, names in tasks:
+            yield arrange_file(midi_path, names, fs, cache_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(arrange_file, midi_path, names, fs, cache_path)
+            for midi_path, names in tasks
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run(args: argparse.Namespace) -> int:
+    """Arranges the MIDI files, appends the results to the output and prints a summary."""
+    files = collect_midi_files(args.inputs)
+    completed = completed_results(args.output, retry_failed=args.retry_failed)
+    tasks: list[tuple[Path, list[str]]] = []
+    skipped = 0
+    for midi_path in files:
+        file_key = midi_key(midi_path, args.fs) if completed else ""
+        names = [
+            name for name in args.instruments if (str(midi_path), name, file_key) not in completed
+        ]
+        skipped += len(args.instruments) - len(names)
+        if names:
+            tasks.append((midi_path, names))
+    print(
+        f"{len(files)} MIDI files, {sum(len(names) for _, names in tasks)} arrangements to run, "
+        f"{skipped} already in {args.output}",
+        file=sys.stderr,
+    )
+
+    start = time.perf_counter()
+    counts = {"arranged": 0, "cached": 0, "failed": 0}
+    chords = 0
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("a", encoding="utf-8") as output:
+        for done, records in enumerate(
+            _completed_tasks(tasks, args.workers, args.fs, args.cache), start=1
+        ):
+            for record in records:
+                output.write(json.dumps(record) + "\n")
+                if record["error"] is not None:
+                    counts["failed"] += 1
+                else:
+                    counts["cached" if record["cached"] else "arranged"] += 1
+                    chords += record["chords"]
+            output.flush()  # the results of an interrupted run are kept
+            if args.progress:
+                elapsed = time.perf_counter() - start
+                print(
+                    f"\r[{done}/{len(tasks)}] {done / elapsed:.1f} files/s, "
+                    f"{counts['failed']} failed",
+                    end="" if sys.stderr.isatty() else "\n",  # redrawn on a terminal
+                    file=sys.stderr,
+                )
+    if args.progress and tasks and sys.stderr.isatty():
+        print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(tasks)} files in {elapsed:.2f} s with {args.workers} worker(s): "
+        f"{counts['arranged']} arranged, {counts['cached']} from the cache, "
+        f"{counts['failed']} failed, {skipped} skipped"
+    )
+    if elapsed > 0:
+        print(f"throughput: {len(tasks) / elapsed:.2f} files/s, {chords / elapsed:.0f} chords/s")
+    return 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parses the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("inputs", nargs="+", help="MIDI files, directories or glob patterns")
+    parser.add_argument(
+        "--instruments",
+        nargs="+",
+        choices=list(INSTRUMENT_CLASSES),
+        default=["Guitar"],
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", type=Path, default=Path("arrangements.jsonl"))
+    parser.add_argument("--cache", type=Path, default=None, help="SQLite arrangement cache")
+    parser.add_argument("--fs", type=int, default=20, help="frame rate of the piano rolls")
+    parser.add_argument("--progress", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument(
+        "--retry-failed", action="store_true", help="arrange again the results with an error"
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -0,0 +1 @@
+# empty __init__.py for benchmarks package
@@ -0,0 +1,400 @@
+"""
+Benchmark suite for the fingering and arrangement pipeline.
+
+Run the benchmarks and write the timings as a JSON baseline:
+    python -m backend.benchmarks.run_benchmarks run --output baseline.json
+
+Compare two baselines, exit with status 1 when a benchmark regressed beyond the threshold:
+    python -m backend.benchmarks.run_benchmarks compare baseline.json current.json --threshold 0.2
+
+Arranging 10k chords or more on every instrument takes a long time,
+so the arrangement lengths are set apart from the ingestion lengths.
+
+The fixed_lag_decoder benchmark streams the chords of a piece through a FixedLagDecoder
+and reports the latency of one chord (median and p99 over the chords and repeats).
+
+The import benchmark measures the cold import of the modules of IMPORT_BUDGETS in a fresh
+interpreter, run exits with status 1 when one of them exceeds its budget.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from functools import partial
+from pathlib import Path
+
+from backend.benchmarks.synthetic import random_chords, random_piece, random_roll, write_random_midi
+from backend.src.api.api import INSTRUMENT_CLASSES
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.build_position_graph import (
+    build_position_csr_graph,
+    build_position_graph,
+)
+from backend.src.music_piece.arrangement.dijkstra import csr_dijkstra, dijkstra
+from backend.src.music_piece.arrangement.fixed_lag_decoder import FixedLagDecoder
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.positions.neck_position import NeckPosition
+
+BENCHMARKS = [
+    "possible_positions",
+    "is_valid_position",
+    "valid_positions",
+    "position_cost",
+    "transition_cost",
+    "build_position_graph",
+    "build_position_csr_graph",
+    "dijkstra",
+    "csr_dijkstra",
+    "fixed_lag_decoder",
+    "from_roll",
+    "from_midi",
+    "import",
+]
+DEFAULT_CHORD_SIZES = [1, 2, 3, 4, 5, 6]
+DEFAULT_LENGTHS = [10, 100, 1_000, 10_000, 100_000]
+DEFAULT_ARRANGEMENT_LENGTHS = [10, 100, 1_000]
+MAX_TRANSITION_PAIRS = 100  # transition pairs measured between two consecutive chords
+STREAMING_LAG = 4  # the lag of the fixed-lag decoder benchmark
+
+# seconds of the cold import of a module (python -X importtime cumulative time)
+IMPORT_BUDGETS = {"backend.src.api.api": 1.0}
+# heavy dependencies loaded on first use, which importing the budgeted modules must not load
+LAZY_MODULES = ("pretty_midi", "mido")
+REPOSITORY_ROOT = Path(__file__).parents[2]
+
+Results = dict[str, dict[str, float]]
+
+
+def measure(function: Callable[[], object], repeat: int, calls: int = 1) -> dict[str, float]:
+    """Times `function` `repeat` times.
+
+    Args:
+        function (Callable): the function to time
+        repeat (int): the number of timed runs
+        calls (int): the number of operations done by one run of `function`
+
+    Returns:
+        dict: the min and median time of one run in seconds, the repeat and calls counts
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeat": repeat,
+        "calls": calls,
+    }
+
+
+def bench_fingering(
+    instrument_name: str,
+    instrument: NeckInstrument,
+    chord_sizes: list[int],
+    chords_per_size: int,
+    repeat: int,
+    seed: int,
+) -> Results:
+    """Benchmarks the enumeration, validation and costing of positions for one instrument."""
+    results: Results = {}
+    for size in chord_sizes:
+        if size > len(instrument.open_strings):
+            continue
+        suffix = f"{instrument_name}/chord_size={size}"
+        chords = [list(chord) for chord in random_chords(instrument, size, chords_per_size, seed)]
+        candidates = [instrument.possible_positions(chord) for chord in chords]
+        positions = [position for layer in candidates for position in layer]
+        valid_layers = [
+            [position for position in layer if instrument.is_valid_position(position)]
+            for layer in candidates
+        ]
+        valid_positions = [position for layer in valid_layers for position in layer]
+        pairs = [
+            pair
+            for previous, current in itertools.pairwise(valid_layers)
+            for pair in [(p, c) for p in previous for c in current][:MAX_TRANSITION_PAIRS]
+        ]
+
+        def enumerate_all(chords: list[list[int]] = chords) -> None:
+            for chord in chords:
+                instrument.possible_positions(chord)
+
+        def validate_all(positions: list[NeckPosition] = positions) -> None:
+            for position in positions:
+                instrument.is_valid_position(position)
+
+        def validate_layers(candidates: list[list[NeckPosition]] = candidates) -> None:
+            for layer in candidates:
+                instrument.valid_positions(layer)
+
+        def cost_all(positions: list[NeckPosition] = valid_positions) -> None:
+            for position in positions:
+                instrument.position_cost(position, check_valid=False)
+
+        def transition_all(pairs: list[tuple[NeckPosition, NeckPosition]] = pairs) -> None:
+            for position_1, position_2 in pairs:
+                instrument.transition_cost(position_1, position_2)
+
+        results[f"possible_positions/{suffix}"] = measure(enumerate_all, repeat, len(chords))
+        results[f"is_valid_position/{suffix}"] = measure(validate_all, repeat, len(positions))
+        results[f"valid_positions/{suffix}"] = measure(validate_layers, repeat, len(positions))
+        results[f"position_cost/{suffix}"] = measure(cost_all, repeat, len(valid_positions))
+        results[f"transition_cost/{suffix}"] = measure(transition_all, repeat, len(pairs))
+    return results
+
+
+def bench_arrangement(
+    instrument_name: str, instrument: NeckInstrument, lengths: list[int], repeat: int, seed: int
+) -> Results:
+    """Benchmarks the graph building and the shortest path search for one instrument."""
+    results: Results = {}
+    for length in lengths:
+        suffix = f"{instrument_name}/length={length}"
+        piece = random_piece(instrument, length, seed)
+        graph, _, _ = build_position_graph(piece, instrument)
+        csr_graph, _, _ = build_position_csr_graph(piece, instrument)
+        results[f"build_position_graph/{suffix}"] = measure(
+            partial(build_position_graph, piece, instrument), repeat, length
+        )
+        results[f"build_position_csr_graph/{suffix}"] = measure(
+            partial(build_position_csr_graph, piece, instrument), repeat, length
+        )
+        results[f"dijkstra/{suffix}"] = measure(
+            partial(dijkstra, graph, -1), repeat, len(graph.nodes)
+        )
+        results[f"csr_dijkstra/{suffix}"] = measure(
+            partial(csr_dijkstra, csr_graph, -1), repeat, csr_graph.number_of_nodes
+        )
+    return results
+
+
+def bench_streaming(
+    instrument_name: str, instrument: NeckInstrument, lengths: list[int], repeat: int, seed: int
+) -> Results:
+    """Benchmarks the latency of one chord pushed to a fixed-lag decoder for one instrument."""
+    results: Results = {}
+    for length in lengths:
+        piece = random_piece(instrument, length, seed)
+        chords = [timed_chord.chord for timed_chord in piece.timed_chords]
+        timings = []
+        for _ in range(repeat):
+            decoder = FixedLagDecoder(instrument, STREAMING_LAG)
+            for chord in chords:
+                start = time.perf_counter()
+                with contextlib.suppress(ValueError):  # a chord without valid position is skipped
+                    decoder.push(chord)
+                timings.append(time.perf_counter() - start)
+        results[f"fixed_lag_decoder/{instrument_name}/length={length}"] = {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "p99": statistics.quantiles(timings, n=100)[98] if len(timings) > 1 else timings[0],
+            "repeat": repeat,
+            "calls": length,
+        }
+    return results
+
+
+def bench_ingestion(lengths: list[int], repeat: int, seed: int) -> Results:
+    """Benchmarks the creation of music pieces from piano rolls and MIDI files."""
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for length in lengths:
+            roll = random_roll(length, seed)
+            midi_path = write_random_midi(Path(directory) / f"synthetic_{length}.mid", length, seed)
+            results[f"from_roll/length={length}"] = measure(
+                partial(MusicPiece.from_roll, roll), repeat, length
+            )
+            results[f"from_midi/length={length}"] = measure(
+                partial(MusicPiece.from_midi, midi_path), repeat, length
+            )
+    return results
+
+
+def import_time(module: str) -> tuple[float, list[str]]:
+    """Imports a module in a fresh interpreter.
+
+    Returns:
+        tuple[float, list[str]]: The cumulative import time of the module in seconds,
+            and the LAZY_MODULES it loaded.
+    """
+    completed = subprocess.run(  # runs this interpreter on a module name
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import json, sys, {module}; "
+            f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))",
+        ],
+        capture_output=True,
+        check=True,
+        cwd=REPOSITORY_ROOT,
+        text=True,
+    )
+    # lines as "import time: self [us] | cumulative | imported package"
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6, json.loads(completed.stdout)
+    msg = f"No import time reported for {module}."
+    raise ValueError(msg)
+
+
+def bench_imports(repeat: int) -> Results:
+    """Benchmarks the cold imports of the modules with an import budget."""
+    results: Results = {}
+    for module, budget in IMPORT_BUDGETS.items():
+        timings = [import_time(module)[0] for _ in range(repeat)]
+        results[f"import/{module}"] = {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "repeat": repeat,
+            "calls": 1,
+            "budget": budget,
+        }
+    return results
+
+
+def run(args: argparse.Namespace) -> int:
+    """Runs the benchmarks and writes the JSON baseline."""
+    selected = set(args.benchmarks)
+    results: Results = {}
+    for instrument_name in args.instruments:
+        instrument = INSTRUMENT_CLASSES[instrument_name]()
+        print(f"Benchmarking {instrument_name}...", file=sys.stderr)
+        if selected & {
+            "possible_positions",
+            "is_valid_position",
+            "valid_positions",
+            "position_cost",
+            "transition_cost",
+        }:
+            results.update(
+                bench_fingering(
+                    instrument_name,
+                    instrument,
+                    args.chord_sizes,
+                    args.chords_per_size,
+                    args.repeat,
+                    args.seed,
+                )
+            )
+        if selected & {
+            "build_position_graph",
+            "build_position_csr_graph",
+            "dijkstra",
+            "csr_dijkstra",
+        }:
+            results.update(
+                bench_arrangement(
+                    instrument_name, instrument, args.arrangement_lengths, args.repeat, args.seed
+                )
+            )
+        if "fixed_lag_decoder" in selected:
+            results.update(
+                bench_streaming(
+                    instrument_name, instrument, args.arrangement_lengths, args.repeat, args.seed
+                )
+            )
+    if selected & {"from_roll", "from_midi"}:
+        print("Benchmarking ingestion...", file=sys.stderr)
+        results.update(bench_ingestion(args.lengths, args.repeat, args.seed))
+    if "import" in selected:
+        print("Benchmarking imports...", file=sys.stderr)
+        results.update(bench_imports(args.repeat))
+
+    results = {key: value for key, value in results.items() if key.split("/")[0] in selected}
+    baseline = {
+        "metadata": {
+            "created": datetime.now(tz=UTC).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+    for key, timing in results.items():
+        p99 = f" (p99 {timing['p99'] * 1000:.3f} ms)" if "p99" in timing else ""
+        print(f"{key:<60} {timing['median'] * 1000:>12.3f} ms{p99}")
+    print(f"Results written to {args.output}", file=sys.stderr)
+    over_budget = [
+        key for key, timing in results.items() if timing["median"] > timing.get("budget", math.inf)
+    ]
+    for key in over_budget:
+        print(f"{key} is over its budget of {results[key]['budget']} s", file=sys.stderr)
+    return 1 if over_budget else 0
+
+
+def compare_results(baseline: Results, current: Results, threshold: float) -> list[str]:
+    """Returns the benchmarks whose median time grew by more than `threshold` (0.1 is 10%).
+    Benchmarks missing from one of the results are ignored."""
+    return [
+        key
+        for key, timing in current.items()
+        if key in baseline and timing["median"] > baseline[key]["median"] * (1 + threshold)
+    ]
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Compares two JSON baselines, returns 1 if a benchmark regressed."""
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+    current = json.loads(args.current.read_text(encoding="utf-8"))["results"]
+    regressions = compare_results(baseline, current, args.threshold)
+    for key in sorted(baseline.keys() & current.keys()):
+        ratio = current[key]["median"] / baseline[key]["median"] if baseline[key]["median"] else 1
+        flag = "REGRESSION" if key in regressions else ""
+        print(f"{key:<60} {ratio:>8.2f}x {flag}")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parses the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    run_parser.add_argument(
+        "--instruments",
+        nargs="+",
+        choices=list(INSTRUMENT_CLASSES),
+        default=list(INSTRUMENT_CLASSES),
+    )
+    run_parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    run_parser.add_argument("--chord-sizes", nargs="+", type=int, default=DEFAULT_CHORD_SIZES)
+    run_parser.add_argument("--chords-per-size", type=int, default=20)
+    run_parser.add_argument("--lengths", nargs="+", type=int, default=DEFAULT_LENGTHS)
+    run_parser.add_argument(
+        "--arrangement-lengths", nargs="+", type=int, default=DEFAULT_ARRANGEMENT_LENGTHS
+    )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two JSON baselines")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.set_defaults(handler=compare)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    sys.exit(arguments.handler(arguments))
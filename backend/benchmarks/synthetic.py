@@ -0,0 +1,104 @@
+"""
+This module generates seeded synthetic inputs for the benchmarks:
+chords, music pieces, piano rolls and MIDI files.
+"""
+
+import random
+from pathlib import Path
+
+import pretty_midi
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.piano_roll import PianoRoll
+from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.utils.constants import MAX_FINGERS, MAX_MIDI_NOTE
+
+CHORD_DURATION = 0.1  # seconds, two frames at the default frame rate of 20
+LOWEST_PITCH = 40  # E2
+HIGHEST_PITCH = 84  # C6
+
+
+def random_chord(instrument: NeckInstrument, size: int, rng: random.Random) -> tuple[int, ...]:
+    """Returns a chord of `size` distinct notes that the instrument can play.
+    The chord is drawn from a random placement on distinct strings within the reach of the hand,
+    so it has at least one candidate position.
+
+    Raises:
+        ValueError: if the instrument has less than `size` strings.
+    """
+    if size > len(instrument.open_strings):
+        raise ValueError(f"{instrument} cannot play {size} notes at once.")
+    while True:
+        strings = rng.sample(range(len(instrument.open_strings)), size)
+        base_fret = rng.randint(0, max(instrument.number_of_frets - MAX_FINGERS + 1, 0))
+        notes = {
+            instrument.open_strings[string]
+            + min(base_fret + rng.randint(0, MAX_FINGERS - 1), instrument.number_of_frets)
+            for string in strings
+        }
+        if len(notes) == size:
+            return tuple(sorted(notes))
+
+
+def random_chords(
+    instrument: NeckInstrument, size: int, count: int, seed: int = 0
+) -> list[tuple[int, ...]]:
+    """Returns `count` playable chords of `size` notes for the instrument."""
+    rng = random.Random(seed)
+    return [random_chord(instrument, size, rng) for _ in range(count)]
+
+
+def random_piece(
+    instrument: NeckInstrument, length: int, seed: int = 0, max_chord_size: int = 3
+) -> MusicPiece:
+    """Returns a music piece of `length` playable chords of 1 to `max_chord_size` notes."""
+    rng = random.Random(seed)
+    max_size = min(max_chord_size, len(instrument.open_strings))
+    piece = MusicPiece(title=f"synthetic_{instrument.name}_{length}")
+    for index in range(length):
+        chord = random_chord(instrument, rng.randint(1, max_size), rng)
+        piece.add_timed_chord(
+            TimedChord(chord=chord, start_time=index * CHORD_DURATION, duration=CHORD_DURATION)
+        )
+    return piece
+
+
+def random_pitch_chords(length: int, seed: int = 0, max_chord_size: int = 6) -> list[list[int]]:
+    """Returns `length` chords of random pitches, two consecutive chords always differ."""
+    rng = random.Random(seed)
+    chords: list[list[int]] = []
+    while len(chords) < length:
+        size = rng.randint(1, max_chord_size)
+        chord = sorted(rng.sample(range(LOWEST_PITCH, HIGHEST_PITCH + 1), size))
+        if not chords or chords[-1] != chord:
+            chords.append(chord)
+    return chords
+
+
+def random_roll(length: int, seed: int = 0, frame_rate: int = 20) -> PianoRoll:
+    """Returns a piano roll of `length` random chords, each lasting CHORD_DURATION."""
+    frames_per_chord = max(round(CHORD_DURATION * frame_rate), 1)
+    chords = random_pitch_chords(length, seed)
+    roll = [[False] * (length * frames_per_chord) for _ in range(MAX_MIDI_NOTE + 1)]
+    for index, chord in enumerate(chords):
+        for pitch in chord:
+            row = roll[pitch]
+            for frame in range(index * frames_per_chord, (index + 1) * frames_per_chord):
+                row[frame] = True
+    return PianoRoll(roll, frame_rate=frame_rate)
+
+
+def write_random_midi(path: Path, length: int, seed: int = 0) -> Path:
+    """Writes a MIDI file of `length` random chords, each lasting CHORD_DURATION."""
+    midi = pretty_midi.PrettyMIDI()
+    piano = pretty_midi.Instrument(program=0)
+    for index, chord in enumerate(random_pitch_chords(length, seed)):
+        start = index * CHORD_DURATION
+        piano.notes.extend(
+            pretty_midi.Note(velocity=80, pitch=pitch, start=start, end=start + CHORD_DURATION)
+            for pitch in chord
+        )
+    midi.instruments.append(piano)
+    midi.write(path.as_posix())
+    return path
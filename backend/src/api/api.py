@@ -2,13 +2,20 @@
 This module provides an API for interacting with musical instruments and their finger positions.
 """
 
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Literal
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from pydantic import BaseModel
 
+from backend.src.instruments.bounded_enumeration import EnumerationLimits
 from backend.src.instruments.neck_instrument import (
     Banjo,
     Bass,
@@ -18,11 +25,20 @@ from backend.src.instruments.neck_instrument import (
     NeckInstrument,
     Ukulele,
 )
+from backend.src.music_piece.arrangement.fixed_lag_decoder import Decision, FixedLagDecoder
+from backend.src.music_piece.arrangement.neck_arrangement import explain_arrangement
 from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.metrics import API_REQUEST_SECONDS, METRICS
 from backend.src.utils.note2num import note2num
 
 from .get_all_pos_from_notes import get_all_pos_from_notes
+from .get_arrangement_from_chords import get_arrangement_from_chords
 from .get_best_pos_from_notes import get_best_pos_from_notes
+from .get_instrument_comparison import get_instrument_comparison, shutdown_arrangement_pools
+from .get_voicings_for_chord_symbol import (
+    get_voicings_for_chord_symbol,
+    warm_up_voicing_indexes,
+)
 
 INSTRUMENT_CLASSES: dict[str, type[NeckInstrument]] = {
     "Guitar": Guitar,
@@ -39,9 +55,51 @@ class NoteInput(BaseModel):
 
     notes: list[str]
     instrument: str
+    explain: bool = False
+    max_placements: int = EnumerationLimits().max_placements
+    on_limit: Literal["reject", "degrade"] = "degrade"
+
+
+class ChordSymbolInput(BaseModel):
+    """This class represents the input for the getVoicingsForChordSymbol API endpoint."""
+
+    symbol: str
+    instrument: str
+    limit: int = 10
 
 
-app = FastAPI()
+class ChordsInput(BaseModel):
+    """This class represents the input for the compareInstruments API endpoint."""
+
+    chords: list[list[str]]
+    instruments: list[str] | None = None
+    explain: bool = False
+
+
+class ArrangementInput(BaseModel):
+    """This class represents the input for the arrangeChords API endpoint."""
+
+    chords: list[list[str]]
+    instrument: str
+    time_budget: float = 1.0
+    explain: bool = False
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Builds the voicing indexes of the instruments in the background at startup,
+    so the chord symbol requests only look the voicings up, and stops the worker processes
+    of the instrument comparisons at shutdown."""
+    threading.Thread(
+        target=warm_up_voicing_indexes,
+        args=([instrument_class() for instrument_class in INSTRUMENT_CLASSES.values()],),
+        daemon=True,
+    ).start()
+    yield
+    shutdown_arrangement_pools()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for all origins
 app.add_middleware(
@@ -53,6 +111,22 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_latency(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """Records the latency of each API request when metrics are enabled."""
+    if not METRICS.enabled:
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")  # label by route template, not by raw path
+    API_REQUEST_SECONDS.observe(
+        time.perf_counter() - start, route.path if route is not None else "unmatched"
+    )
+    return response
+
+
 @app.get("/", response_class=HTMLResponse)
 def read_root() -> HTMLResponse:
     """Root endpoint for the API, returns the frontend HTML."""
@@ -62,6 +136,12 @@ def read_root() -> HTMLResponse:
     return HTMLResponse(content="<h1>index.html not found</h1>")
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Returns the metrics of the pipeline in the Prometheus text format."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/getInstrumentDetails")
 def get_instrument_details(instrument_name: str) -> dict:
     """
@@ -87,6 +167,7 @@ def get_best_pos_from_notes_api(note_input: NoteInput) -> dict:
     Parameters:
         notes (List[str]): A list of notes.
         instrument (str): The name of the instrument.
+        explain (bool): If True, add the breakdown of the position cost.
 
     Returns:
         NPosition: The position to play the notes on the instrument.
@@ -102,17 +183,29 @@ def get_best_pos_from_notes_api(note_input: NoteInput) -> dict:
     position = get_best_pos_from_notes(notes_int, instrument)
     if not isinstance(position, NeckPosition):
         return {"error": "No valid position found for the given notes."}
-    return position.to_json()
+    if note_input.explain:
+        return {
+            **instrument.expand_courses(position).to_json(),
+            "cost_breakdown": instrument.explain_position_cost(position, check_valid=False),
+        }
+    return instrument.expand_courses(position).to_json()
 
 
 @app.post("/getAllPosFromNotes")
-def get_all_pos_from_notes_api(note_input: NoteInput) -> dict:
+def get_all_pos_from_notes_api(note_input: NoteInput, response: Response) -> dict:
     """
     This function takes a list of notes and an instrument and returns all positions.
+    When the estimated number of positions exceeds max_placements, the request is rejected,
+    or degraded to the cheapest positions found by a best-first search: the mode used and
+    the estimated number of positions are in the X-Enumeration-Mode and X-Enumeration-Size
+    headers. X-Enumeration-Complete is "false" when the best-first search ran out of expansions,
+    the positions are then the cheapest found, not necessarily the cheapest.
 
     Parameters:
         notes (List[str]): A list of notes.
         instrument (str): The name of the instrument.
+        max_placements (int): The limit of the estimated number of positions.
+        on_limit (str): "reject" or "degrade" the requests over the limit.
 
     Returns:
         dict: A dictionary mapping positions to their costs, or -1 if no valid positions are found.
@@ -125,8 +218,192 @@ def get_all_pos_from_notes_api(note_input: NoteInput) -> dict:
 
     notes_int = [note2num(note) for note in note_input.notes]
 
-    positions_costs = get_all_pos_from_notes(notes_int, instrument)
+    limits = EnumerationLimits(
+        max_placements=note_input.max_placements, on_exceeded=note_input.on_limit
+    )
+    positions_costs, enumeration = get_all_pos_from_notes(notes_int, instrument, limits)
+    response.headers["X-Enumeration-Mode"] = enumeration.mode
+    response.headers["X-Enumeration-Size"] = str(enumeration.estimated_size)
+    response.headers["X-Enumeration-Complete"] = str(enumeration.complete).lower()
+    if enumeration.mode == "rejected":
+        return {
+            "error": f"Too many positions to enumerate ({enumeration.estimated_size} estimated)."
+        }
     if isinstance(positions_costs, int):
         return {"error": "No valid positions found for the given notes."}
 
-    return {num: (pos.to_json(), cost) for num, (pos, cost) in enumerate(positions_costs.items())}
+    return {
+        num: (instrument.expand_courses(pos).to_json(), cost)
+        for num, (pos, cost) in enumerate(positions_costs.items())
+    }
+
+
+@app.post("/getVoicingsForChordSymbol")
+def get_voicings_for_chord_symbol_api(chord_symbol_input: ChordSymbolInput) -> dict:
+    """
+    This function takes a chord symbol and an instrument and returns the ranked voicings.
+
+    Parameters:
+        symbol (str): A chord symbol (e.g. 'Cmaj7', 'F#m7b5').
+        instrument (str): The name of the instrument.
+        limit (int): The maximum number of voicings, from 1 to MAX_VOICINGS.
+
+    Returns:
+        dict: A dictionary mapping ranks to positions and their costs, from the cheapest.
+    """
+
+    if chord_symbol_input.instrument in INSTRUMENT_CLASSES:
+        instrument = INSTRUMENT_CLASSES[chord_symbol_input.instrument]()
+    else:
+        return {"error": "Instrument not found."}
+
+    try:
+        voicings = get_voicings_for_chord_symbol(
+            chord_symbol_input.symbol, instrument, chord_symbol_input.limit
+        )
+    except ValueError as error:
+        return {"error": str(error)}
+    if isinstance(voicings, int):
+        return {"error": "No valid voicings found for the given chord symbol."}
+
+    return {
+        num: (instrument.expand_courses(pos).to_json(), cost)
+        for num, (pos, cost) in enumerate(voicings)
+    }
+
+
+@app.post("/compareInstruments")
+def compare_instruments_api(chords_input: ChordsInput) -> dict:
+    """
+    This function arranges a sequence of chords for several instruments and compares them.
+
+    Parameters:
+        chords (List[List[str]]): The chords, as lists of notes.
+        instruments (List[str] | None): The names of the instruments, all of them if None.
+        explain (bool): If True, add the breakdown of the cost of each arrangement.
+
+    Returns:
+        dict: For each instrument, from the easiest, the total cost and the positions,
+            or an error.
+    """
+
+    names = chords_input.instruments or list(INSTRUMENT_CLASSES)
+    if any(name not in INSTRUMENT_CLASSES for name in names):
+        return {"error": "Instrument not found."}
+    if not chords_input.chords:
+        return {"error": "No chords given."}
+
+    chords_int = [[note2num(note) for note in chord] for chord in chords_input.chords]
+
+    return get_instrument_comparison(
+        chords_int,
+        {name: INSTRUMENT_CLASSES[name]() for name in names},
+        explain=chords_input.explain,
+    )
+
+
+@app.post("/arrangeChords")
+def arrange_chords_api(arrangement_input: ArrangementInput) -> dict:
+    """
+    This function arranges a sequence of chords for an instrument within a time budget.
+
+    Parameters:
+        chords (List[List[str]]): The chords, as lists of notes.
+        instrument (str): The name of the instrument.
+        time_budget (float): The time, in seconds, given to improve the arrangement.
+        explain (bool): If True, add the breakdown of the cost of each position and transition.
+
+    Returns:
+        dict: The positions, the total cost, and whether the arrangement is proven optimal.
+    """
+
+    if arrangement_input.instrument in INSTRUMENT_CLASSES:
+        instrument = INSTRUMENT_CLASSES[arrangement_input.instrument]()
+    else:
+        return {"error": "Instrument not found."}
+    if not arrangement_input.chords:
+        return {"error": "No chords given."}
+
+    chords_int = [[note2num(note) for note in chord] for chord in arrangement_input.chords]
+
+    try:
+        arrangement = get_arrangement_from_chords(
+            chords_int, instrument, max(arrangement_input.time_budget, 0.0)
+        )
+    except ValueError as error:
+        return {"error": str(error)}
+
+    result = {
+        "positions": [
+            instrument.expand_courses(position).to_json() for position in arrangement.positions
+        ],
+        "total_cost": arrangement.total_cost,
+        "optimal": arrangement.optimal,
+    }
+    if arrangement_input.explain:
+        result["cost_breakdown"] = explain_arrangement(arrangement.positions, instrument)
+    return result
+
+
+@app.websocket("/streamArrangement")
+async def stream_arrangement_api(websocket: WebSocket, instrument: str, lag: int = 2) -> None:
+    """
+    This function arranges a stream of chords live, committing each chord lag chords later.
+
+    Parameters:
+        instrument (str): The name of the instrument (query parameter).
+        lag (int): The number of later chords seen before committing a chord (query parameter).
+
+    Messages:
+        received: {"notes": ["C4", "E4", "G4"]} for each chord, with "sustained": ["C4"]
+            for the notes held from the previous chord, {"end": true} to end the stream.
+        sent: {"index": 0, "position": {...}, "position_cost": 1.0, "transition_cost": 2.0}
+            for each committed chord, by index of the chord in the stream,
+            {"index": 0, "error": "..."} for a chord without valid position (skipped),
+            {"error": "..."} for an invalid message.
+    """
+    await websocket.accept()
+    if instrument not in INSTRUMENT_CLASSES or lag < 0:
+        await websocket.send_json({"error": "Instrument not found or negative lag."})
+        await websocket.close()
+        return
+    neck_instrument = INSTRUMENT_CLASSES[instrument]()
+    decoder = FixedLagDecoder(neck_instrument, lag)
+
+    def decision_json(decision: Decision) -> dict:
+        return {
+            "index": decision.chord_index,
+            "position": neck_instrument.expand_courses(decision.position).to_json(),
+            "position_cost": decision.position_cost,
+            "transition_cost": decision.transition_cost,
+        }
+
+    index = 0
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                await websocket.send_json({"error": "Messages must be JSON objects."})
+                continue
+            if message.get("end"):
+                for decision in await run_in_threadpool(decoder.flush):
+                    await websocket.send_json(decision_json(decision))
+                await websocket.close()
+                return
+            try:
+                chord = tuple(sorted(note2num(note) for note in message["notes"]))
+                sustained = tuple(sorted(note2num(note) for note in message.get("sustained", [])))
+            except (KeyError, IndexError, TypeError, ValueError):
+                await websocket.send_json({"error": "Messages must hold a list of notes."})
+                continue
+            try:
+                # the decoding is CPU-bound: the event loop keeps serving the other clients
+                decisions = await run_in_threadpool(decoder.push, chord, sustained)
+            except ValueError as error:
+                await websocket.send_json({"index": index, "error": str(error)})
+                decisions = []
+            index += 1
+            for decision in decisions:
+                await websocket.send_json(decision_json(decision))
+    except WebSocketDisconnect:
+        return
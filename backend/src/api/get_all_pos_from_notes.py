@@ -3,36 +3,37 @@ This module contains the logic for determining the optimal finger positions
 for a given set of musical notes and a specific instrument.
 """
 
+from backend.src.instruments.bounded_enumeration import (
+    EnumerationLimits,
+    EnumerationResult,
+    bounded_positions,
+)
 from backend.src.instruments.neck_instrument import NeckInstrument
 from backend.src.positions.neck_position import NeckPosition
 
 
 def get_all_pos_from_notes(
-    notes: list[int], input_instrument: NeckInstrument
-) -> dict[NeckPosition, float] | int:
+    notes: list[int], input_instrument: NeckInstrument, limits: EnumerationLimits | None = None
+) -> tuple[dict[NeckPosition, float] | int, EnumerationResult]:
     """
     This function takes a list of notes and an instrument and returns a position.
 
     Parameters:
         notes (List[str]): A list of notes.
         instrument (INeck): A neck instrument.
+        limits (EnumerationLimits | None): The limits of the enumeration, the default ones if None.
 
     Returns:
         dict[NeckPosition, int] | int: A dictionary mapping positions to their costs,
                                        or -1 if no valid positions are found.
+        EnumerationResult: how the positions were found (exhaustive, best_first or rejected).
     """
 
-    possible_positions = input_instrument.possible_positions(notes)
-    possible_positions = [
-        pos for pos in possible_positions if input_instrument.is_valid_position(pos)
-    ]
+    result = bounded_positions(
+        notes=notes, instrument=input_instrument, limits=limits or EnumerationLimits()
+    )
 
-    if len(possible_positions) == 0:
-        return -1
+    if len(result.positions_costs) == 0:
+        return -1, result
 
-    positions_costs = {}
-    for position in possible_positions:
-        cost = input_instrument.position_cost(position)
-        positions_costs[position] = cost
-
-    return positions_costs
+    return dict(result.positions_costs), result
@@ -0,0 +1,32 @@
+"""
+This module contains the logic for arranging a sequence of chords on a specific instrument
+within a time budget.
+"""
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.anytime_arrangement import (
+    AnytimeArrangement,
+    anytime_arrangement,
+)
+from backend.src.music_piece.music_piece import MusicPiece
+
+
+def get_arrangement_from_chords(
+    chords: list[list[int]], input_instrument: NeckInstrument, time_budget: float
+) -> AnytimeArrangement:
+    """
+    This function takes a sequence of chords and an instrument and returns an arrangement.
+
+    Parameters:
+        chords (List[List[int]]): The chords, as MIDI note numbers, one per beat.
+        instrument (INeck): A neck instrument.
+        time_budget (float): The time, in seconds, given to improve the arrangement.
+
+    Returns:
+        AnytimeArrangement: The best arrangement found, and whether it is proven optimal.
+
+    Raises:
+        ValueError: if a chord has no valid position.
+    """
+
+    return anytime_arrangement(MusicPiece.from_chords(chords), input_instrument, time_budget)
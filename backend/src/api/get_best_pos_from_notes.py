@@ -21,18 +21,7 @@ def get_best_pos_from_notes(
         NeckPosition: The position to play the notes on the instrument.
     """
 
-    possible_positions = input_instrument.possible_positions(notes)
-    possible_positions = [
-        pos for pos in possible_positions if input_instrument.is_valid_position(pos)
-    ]
-
-    if len(possible_positions) == 0:
+    best_position = input_instrument.best_position(notes)
+    if best_position is None:
         return -1
-
-    best_position = possible_positions[0]
-
-    for position in possible_positions:
-        if input_instrument.position_cost(position) < input_instrument.position_cost(best_position):
-            best_position = position
-
     return best_position
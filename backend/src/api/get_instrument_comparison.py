@@ -0,0 +1,93 @@
+"""
+This module contains the logic for comparing the arrangements of a sequence of chords
+on several instruments.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.multi_instrument_arrangement import (
+    InstrumentArrangement,
+    multi_instrument_arrangement,
+)
+from backend.src.music_piece.arrangement.neck_arrangement import explain_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+
+# fewer chords are arranged in the request thread, faster than a round trip to the workers
+IN_PROCESS_CHORDS = 32
+
+# the pool of worker processes shared by all the requests for the lifetime of the app,
+# by start method of its workers
+ARRANGEMENT_POOLS: dict[str, ProcessPoolExecutor] = {}
+_ARRANGEMENT_POOLS_LOCK = threading.Lock()
+
+
+def arrangement_pool() -> ProcessPoolExecutor:
+    """Returns the shared pool of worker processes, created on first use.
+    The workers are started by a fork server (spawned where there is none), never forked from
+    the server process, whose threads may hold locks the child would inherit."""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with _ARRANGEMENT_POOLS_LOCK:
+        if method not in ARRANGEMENT_POOLS:
+            ARRANGEMENT_POOLS[method] = ProcessPoolExecutor(
+                mp_context=multiprocessing.get_context(method)
+            )
+        return ARRANGEMENT_POOLS[method]
+
+
+def shutdown_arrangement_pools() -> None:
+    """Stops the workers of the shared pool (e.g. at shutdown), a later request starts new ones."""
+    with _ARRANGEMENT_POOLS_LOCK:
+        while ARRANGEMENT_POOLS:
+            ARRANGEMENT_POOLS.popitem()[1].shutdown()
+
+
+def get_instrument_comparison(
+    chords: list[list[int]], instruments: dict[str, NeckInstrument], *, explain: bool = False
+) -> dict[str, dict]:
+    """
+    This function arranges a sequence of chords for each instrument and compares the total costs.
+    Up to IN_PROCESS_CHORDS chords, the instruments are arranged in this process,
+    above on the shared pool of worker processes.
+
+    Parameters:
+        chords (List[List[int]]): The chords, as MIDI note numbers, one per beat.
+        instruments (Dict[str, NeckInstrument]): The instruments, by name.
+        explain (bool): If True, add the breakdown of the cost of each arrangement.
+
+    Returns:
+        dict: For each instrument, from the cheapest, the total cost and the positions
+            (and the cost breakdown), or the error when the chords can't be arranged
+            for the instrument.
+    """
+
+    music_piece = MusicPiece.from_chords(chords)
+    if len(chords) <= IN_PROCESS_CHORDS:
+        arrangements = multi_instrument_arrangement(music_piece, instruments, max_workers=1)
+    else:
+        arrangements = multi_instrument_arrangement(
+            music_piece, instruments, executor=arrangement_pool()
+        )
+    return {
+        name: _arrangement_json(arrangement, instruments[name], explain=explain)
+        for name, arrangement in arrangements.items()
+    }
+
+
+def _arrangement_json(
+    arrangement: InstrumentArrangement, instrument: NeckInstrument, *, explain: bool
+) -> dict:
+    """Returns the JSON form of the arrangement of an instrument, or of its error."""
+    if arrangement.error is not None:
+        return {"error": arrangement.error}
+    result = {
+        "total_cost": arrangement.total_cost,
+        "positions": [
+            instrument.expand_courses(position).to_json() for position in arrangement.positions
+        ],
+    }
+    if explain:
+        result["cost_breakdown"] = explain_arrangement(arrangement.positions, instrument)
+    return result
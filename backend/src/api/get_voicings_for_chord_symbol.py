@@ -0,0 +1,76 @@
+"""
+This module contains the logic for finding the voicings of a chord symbol
+(e.g. 'Cmaj7') on a specific instrument.
+"""
+
+import threading
+
+from backend.src.autochord.chord_symbol import chord_symbol_pitch_classes, vocabulary_pitch_classes
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.instruments.voicing_index import VoicingIndex
+from backend.src.positions.neck_position import NeckPosition
+
+MAX_VOICINGS = 20  # the largest limit of a request, the voicings kept per chord
+
+# one index per instrument name, shared by all the requests
+VOICING_INDEXES: dict[str, VoicingIndex] = {}
+# one lock per instrument name, held while its index is built
+_VOICING_INDEX_LOCKS: dict[str, threading.Lock] = {}
+_VOICING_INDEX_LOCKS_LOCK = threading.Lock()
+
+
+def voicing_index(instrument: NeckInstrument) -> VoicingIndex:
+    """Returns the voicing index of an instrument. It is built for every chord symbol of the
+    vocabulary when it is created, so the requests only look the voicings up; a request
+    arriving while the index is built waits for it, the requests for the other instruments
+    don't."""
+    if instrument.name in VOICING_INDEXES:
+        return VOICING_INDEXES[instrument.name]
+    with _VOICING_INDEX_LOCKS_LOCK:
+        lock = _VOICING_INDEX_LOCKS.setdefault(instrument.name, threading.Lock())
+    with lock:
+        if instrument.name not in VOICING_INDEXES:
+            index = VoicingIndex(instrument, max_voicings=MAX_VOICINGS)
+            index.build(
+                [
+                    pitch_classes
+                    for pitch_classes in vocabulary_pitch_classes()
+                    if len(pitch_classes) <= len(instrument.open_strings)
+                ]
+            )
+            VOICING_INDEXES[instrument.name] = index
+        return VOICING_INDEXES[instrument.name]
+
+
+def warm_up_voicing_indexes(instruments: list[NeckInstrument]) -> None:
+    """Builds the voicing indexes of instruments ahead of the requests (e.g. at startup)."""
+    for instrument in instruments:
+        voicing_index(instrument)
+
+
+def get_voicings_for_chord_symbol(
+    symbol: str, input_instrument: NeckInstrument, limit: int = 10
+) -> list[tuple[NeckPosition, float]] | int:
+    """
+    This function takes a chord symbol and an instrument and returns the ranked voicings.
+
+    Parameters:
+        symbol (str): A chord symbol (e.g. 'Cmaj7', 'F#m7b5').
+        instrument (INeck): A neck instrument.
+        limit (int): The maximum number of voicings, from 1 to MAX_VOICINGS.
+
+    Returns:
+        list[tuple[NeckPosition, float]] | int: The voicings and their cost, from the cheapest,
+                                                or -1 if no valid voicing is found.
+
+    Raises:
+        ValueError: if the chord symbol is not in the vocabulary, or the limit is out of range.
+    """
+    if not 1 <= limit <= MAX_VOICINGS:
+        msg = f"The limit must be between 1 and {MAX_VOICINGS}, not {limit}."
+        raise ValueError(msg)
+    pitch_classes = chord_symbol_pitch_classes(symbol)
+    voicings = voicing_index(input_instrument).voicings(pitch_classes)[:limit]
+    if not voicings:
+        return -1
+    return voicings
@@ -0,0 +1,115 @@
+"""
+This module parses chord symbols (e.g. 'Cmaj7', 'F#m7b5') into pitch classes,
+using the same vocabulary as the chord names of name_chord (see chord_data.json).
+"""
+
+import itertools
+from functools import cache
+
+from backend.src.autochord.name_chord import load_chord_data
+
+PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+ALTERATIONS = {"#": 1, "b": -1}
+
+MINOR_THIRD = 3
+MAJOR_THIRD = 4
+PERFECT_FIFTH = 7
+# suffixes replacing the default major third and perfect fifth of the triad
+THIRD_SUFFIXES = {"m", "sus2", "sus4"}
+FIFTH_SUFFIXES = {"b5"}
+
+
+@cache
+def _suffix_intervals() -> dict[str, int]:
+    """Returns the suffixes of the vocabulary and their interval, the longest first so that
+    'maj7' is not read as 'm' then 'aj7'."""
+    return dict(
+        sorted(
+            (
+                (suffix, int(interval))
+                for interval, (_, suffix) in load_chord_data().items()
+                if suffix
+            ),
+            key=lambda item: -len(item[0]),
+        )
+    )
+
+
+def _parse_suffix(suffix: str) -> list[str] | None:
+    """Splits a chord suffix into the suffixes of the vocabulary, None if it can't be split."""
+    tokens = []
+    index = 0
+    while index < len(suffix):
+        for token in _suffix_intervals():
+            if suffix.startswith(token, index):
+                tokens.append(token)
+                index += len(token)
+                break
+        else:
+            return None
+    return tokens
+
+
+def parse_chord_symbol(symbol: str) -> tuple[int, list[int]]:
+    """Parses a chord symbol into its root pitch class and intervals.
+    The chord is a major triad, unless the suffix changes its third (m, sus2, sus4)
+    or its fifth (b5), plus the intervals of the other suffixes (e.g. 7, maj7, 9).
+
+    Args:
+        symbol (str): The chord symbol (e.g. 'Cmaj7', 'F#m7b5', 'Ebsus4').
+
+    Returns:
+        tuple[int, list[int]]: The root pitch class (0 is C) and the sorted intervals
+            from the root, in semitones (e.g. (0, [0, 4, 7, 11]) for 'Cmaj7').
+
+    Raises:
+        ValueError: if the symbol is not in the vocabulary.
+    """
+    if not symbol or symbol[0] not in PITCH_CLASSES:
+        msg = f"The chord symbol {symbol!r} doesn't start with a note name (A to G)."
+        raise ValueError(msg)
+    # 'Cb5' is C with a flat fifth, not C flat with a 5: try the alteration first, then without
+    candidates = []
+    if symbol[1:2] in ALTERATIONS:
+        candidates.append((PITCH_CLASSES[symbol[0]] + ALTERATIONS[symbol[1]], symbol[2:]))
+    candidates.append((PITCH_CLASSES[symbol[0]], symbol[1:]))
+    for root, suffix in candidates:
+        tokens = _parse_suffix(suffix)
+        if tokens is None:
+            continue
+        intervals = {0, *(_suffix_intervals()[token] for token in tokens)}
+        if not THIRD_SUFFIXES.intersection(tokens):
+            intervals.add(MAJOR_THIRD)
+        if not FIFTH_SUFFIXES.intersection(tokens):
+            intervals.add(PERFECT_FIFTH)
+        return root % 12, sorted(intervals)
+    msg = f"The chord symbol {symbol!r} is not in the vocabulary of chord_data.json."
+    raise ValueError(msg)
+
+
+def chord_symbol_pitch_classes(symbol: str) -> frozenset[int]:
+    """Returns the pitch classes (0 is C) of the notes of a chord symbol."""
+    root, intervals = parse_chord_symbol(symbol)
+    return frozenset((root + interval) % 12 for interval in intervals)
+
+
+@cache
+def vocabulary_pitch_classes() -> list[frozenset[int]]:
+    """Returns the distinct sets of pitch classes of the chord symbols of the vocabulary,
+    for every root and combination of suffixes, from the smallest."""
+    suffixes = list(_suffix_intervals())
+    sets_of_pitch_classes: set[frozenset[int]] = set()
+    for tokens in itertools.chain.from_iterable(
+        itertools.combinations(suffixes, size) for size in range(len(suffixes) + 1)
+    ):
+        intervals = {0, *(_suffix_intervals()[token] for token in tokens)}
+        if not THIRD_SUFFIXES.intersection(tokens):
+            intervals.add(MAJOR_THIRD)
+        if not FIFTH_SUFFIXES.intersection(tokens):
+            intervals.add(PERFECT_FIFTH)
+        sets_of_pitch_classes.update(
+            frozenset((root + interval) % 12 for interval in intervals) for root in range(12)
+        )
+    return sorted(
+        sets_of_pitch_classes, key=lambda pitch_classes: (len(pitch_classes), sorted(pitch_classes))
+    )
@@ -1,22 +1,134 @@
 """
 This module aims to identify the name of a chord based on its notes.
 It provides functionality to analyze the intervals between notes and determine the chord name.
+
+The names are precomputed: a chord is reduced to its root pitch class, the 12-bit mask of
+its intervals within the octave and the bits of its extended intervals (9ths, 11ths, 13ths),
+then named with table lookups.
+
+The chord data and the tables are loaded on first use, importing the module reads no file.
 """
 
 import json
+from functools import cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.utils.constants import MAX_MIDI_NOTE, MIN_MIDI_NOTE
 from backend.src.utils.note2num import note2num
 from backend.src.utils.num2note import num2note
 
+if TYPE_CHECKING:
+    from backend.src.music_piece.music_piece import MusicPiece
+
 # Get the path to chord_data.json relative to this file using pathlib
 CHORD_DATA_PATH = Path(__file__).parent / "chord_data.json"
-with CHORD_DATA_PATH.open(encoding="utf-8") as f:
-    chord_data = json.load(f)["intervals"]  # Assuming chord_data.json has an "intervals" key
+
+# intervals placed at the end of the name to follow the chord naming convention
+TRAILING_INTERVALS = (1, 2, 5)
+ROOT_NAMES = [num2note(pitch_class + 12)[:-1] for pitch_class in range(12)]
+
+
+@cache
+def load_chord_data() -> dict[str, list[str]]:
+    """Returns the names of the intervals of chord_data.json, by interval, read on first use."""
+    with CHORD_DATA_PATH.open(encoding="utf-8") as f:
+        return json.load(f)["intervals"]
+
+
+def __getattr__(name: str) -> object:
+    """Returns the chord data as the chord_data attribute of the module, read on first use."""
+    if name == "chord_data":
+        return load_chord_data()
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+@cache
+def _extended_intervals() -> tuple[int, ...]:
+    """Returns the intervals above the octave named as such (e.g. 13 is b9),
+    the others are reduced to the octave."""
+    return tuple(sorted(int(key) for key in load_chord_data() if int(key) >= 12))
+
+
+def _interval_bits(interval: int) -> tuple[int, int]:
+    """Returns the bit of the interval in the octave mask and in the extended intervals mask,
+    one of them is 0."""
+    extended_intervals = _extended_intervals()
+    if interval in extended_intervals:
+        return 0, 1 << extended_intervals.index(interval)
+    return 1 << (interval % 12), 0
+
+
+@cache
+def _interval_bit_tables() -> tuple[
+    list[tuple[int, int]], npt.NDArray[np.int64], npt.NDArray[np.int64]
+]:
+    """Returns the bits of every interval between two MIDI notes, as a list for single chords
+    and as arrays (octave and extended bits) for whole music pieces."""
+    interval_bits = [_interval_bits(interval) for interval in range(MAX_MIDI_NOTE + 1)]
+    return (
+        interval_bits,
+        np.array([bits[0] for bits in interval_bits], dtype=np.int64),
+        np.array([bits[1] for bits in interval_bits], dtype=np.int64),
+    )
+
+
+@cache
+def _name_tables() -> tuple[list[tuple[str, str]], list[str]]:
+    """Builds the naming tables on first use.
+
+    Returns:
+        list[tuple[str, str]]: indexed by root pitch class * 4096 + octave mask,
+            the root and octave intervals part of the name, and its trailing part
+        list[str]: indexed by the extended intervals mask, the extended intervals part of the name
+    """
+    chord_data = load_chord_data()
+    heads = []
+    tails = []
+    for mask in range(1 << 12):
+        intervals = [interval for interval in range(12) if mask >> interval & 1]
+        heads.append(
+            "".join(
+                chord_data[str(interval)][1]
+                for interval in intervals
+                if interval not in TRAILING_INTERVALS
+            )
+        )
+        tails.append(
+            "".join(
+                chord_data[str(interval)][1]
+                for interval in TRAILING_INTERVALS
+                if interval in intervals
+            )
+        )
+    table = [
+        (root + head, tail) for root in ROOT_NAMES for head, tail in zip(heads, tails, strict=True)
+    ]
+    extensions = [
+        "".join(
+            chord_data[str(interval)][1]
+            for bit, interval in enumerate(_extended_intervals())
+            if mask >> bit & 1
+        )
+        for mask in range(1 << len(_extended_intervals()))
+    ]
+    return table, extensions
+
+
+def _lookup_name(root: int, mask: int, extension_mask: int) -> str:
+    """Returns the chord name of a root note and its interval masks."""
+    table, extensions = _name_tables()
+    head, tail = table[(root % 12) << 12 | mask]
+    return head + extensions[extension_mask] + tail
 
 
 def name_chord(in_notes: list[str] | list[int]) -> str:
     """Identifies the name of a chord based on its notes.
+    Repeated intervals (e.g. a doubled third) are named once.
 
     Args:
         notes (list[str]): A list of note names (e.g., ['C4', 'E4', 'G4']).
@@ -37,29 +149,48 @@ def name_chord(in_notes: list[str] | list[int]) -> str:
     else:
         notes = [int(note) for note in in_notes]
 
-    # Sort the MIDI numbers
-    notes.sort()
+    root = min(notes)
+    if root < MIN_MIDI_NOTE or max(notes) > MAX_MIDI_NOTE:
+        raise ValueError(f"The notes {notes} are not all midi note numbers (0-127)")
+    interval_bits, _, _ = _interval_bit_tables()
+    mask = 0
+    extension_mask = 0
+    for note in notes:
+        mask_bit, extension_bit = interval_bits[note - root]
+        mask |= mask_bit
+        extension_mask |= extension_bit
+    return _lookup_name(root, mask, extension_mask)
 
-    # Identify intervals and determine chord name
-    raw_intervals = [notes[i] - notes[0] for i in range(1, len(notes))]
 
-    # simplify intervals if they are not in the chord_data
-    intervals = [
-        interval if str(interval) in chord_data else interval % 12 for interval in raw_intervals
-    ]
-
-    intervals.sort()  # Sort intervals for consistent naming
-    # place the intervals 1, 2, 5 at the end to follow the chord naming convention
-    for interval in [1, 2, 5]:
-        if interval in intervals:
-            intervals.remove(interval)
-            intervals.append(interval)
+def name_chords(music_piece: "MusicPiece") -> list[str | None]:
+    """Names every timed chord of a music piece in a single pass over all its notes.
 
-    chord_name = num2note(notes[0])  # tonic note
-    for num in range(10):
-        chord_name = chord_name.replace(str(num), "")  # Remove any digit from the chord name
-
-    for interval in intervals:
-        chord_name += chord_data[str(interval)][1]
+    Args:
+        music_piece (MusicPiece): The music piece to label.
 
-    return chord_name
+    Returns:
+        list[str | None]: The name of each timed chord, None for the chords of less than
+            three notes.
+    """
+    chords = [timed_chord.chord for timed_chord in music_piece.timed_chords]
+    named_chords = [chord for chord in chords if len(chord) >= 3]
+    if not named_chords:
+        return [None] * len(chords)
+    sizes = np.array([len(chord) for chord in named_chords])
+    notes = np.fromiter((note for chord in named_chords for note in chord), dtype=np.int64)
+    if notes.min() < MIN_MIDI_NOTE or notes.max() > MAX_MIDI_NOTE:
+        msg = "The music piece has notes that are not midi note numbers (0-127)."
+        raise ValueError(msg)
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    roots = np.minimum.reduceat(notes, offsets)
+    intervals = notes - np.repeat(roots, sizes)
+    _, mask_bits, extension_bits = _interval_bit_tables()
+    masks = np.bitwise_or.reduceat(mask_bits[intervals], offsets)
+    extension_masks = np.bitwise_or.reduceat(extension_bits[intervals], offsets)
+    labels = iter(
+        _lookup_name(root, mask, extension_mask)
+        for root, mask, extension_mask in zip(
+            roots.tolist(), masks.tolist(), extension_masks.tolist(), strict=True
+        )
+    )
+    return [next(labels) if len(chord) >= 3 else None for chord in chords]
@@ -0,0 +1,170 @@
+"""
+This module provides an admission control of the enumeration of the positions of notes
+on a neck instrument.
+
+The number of positions is about the product of the number of places of each note,
+which can explode for big chords on instruments with many strings. The size is estimated
+up front from the places of each note: under the limit, the positions are enumerated;
+above it, the request is rejected or degraded to a best-first search of the cheapest positions.
+"""
+
+import heapq
+import itertools
+import math
+from typing import Literal, NamedTuple
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.constants import MAX_FINGERS
+
+EnumerationMode = Literal["exhaustive", "best_first", "rejected"]
+
+
+class EnumerationLimits(NamedTuple):
+    """The limits of an enumeration request.
+
+    max_placements: the estimated enumeration size above which the limit is exceeded
+    on_exceeded: "reject" the request, or "degrade" it to a best-first search
+    max_positions: the number of positions found by the best-first search
+    max_expansions: the number of partial placements the best-first search may expand
+    """
+
+    max_placements: int = 20_000
+    on_exceeded: Literal["reject", "degrade"] = "degrade"
+    max_positions: int = 20
+    max_expansions: int = 50_000
+
+
+class EnumerationResult(NamedTuple):
+    """The valid positions of notes with their costs, and how they were found.
+    complete is False when the best-first search ran out of expansions:
+    the positions are then the cheapest found, not necessarily the cheapest."""
+
+    positions_costs: list[tuple[NeckPosition, float]]
+    mode: EnumerationMode
+    estimated_size: int
+    complete: bool = True
+
+
+def enumeration_size(instrument: NeckInstrument, notes: list[int]) -> int:
+    """Returns the number of placements of the notes enumerated by possible_positions
+    (each placement then has one or a few fingerings)."""
+    if not notes:
+        return 0
+    return math.prod(len(instrument.possible_places_one_note(note)) for note in notes)
+
+
+def bounded_positions(
+    instrument: NeckInstrument, notes: list[int], limits: EnumerationLimits
+) -> EnumerationResult:
+    """Returns the valid positions of the notes with their costs, within the limits.
+    The exhaustive enumeration keeps the order of possible_positions,
+    the best-first search returns the positions from the cheapest."""
+    size = enumeration_size(instrument, notes)
+    if size <= limits.max_placements:
+        positions = instrument.valid_positions(instrument.possible_positions(notes))
+        return EnumerationResult(
+            [
+                (position, instrument.position_cost(position, check_valid=False))
+                for position in positions
+            ],
+            "exhaustive",
+            size,
+        )
+    if limits.on_exceeded == "reject":
+        return EnumerationResult([], "rejected", size)
+    positions_costs, complete = best_first_positions(
+        instrument, notes, limits.max_positions, limits.max_expansions
+    )
+    return EnumerationResult(positions_costs, "best_first", size, complete)
+
+
+def best_first_positions(
+    instrument: NeckInstrument, notes: list[int], count: int, max_expansions: int
+) -> tuple[list[tuple[NeckPosition, float]], bool]:
+    """Searches the count cheapest valid positions of the notes, best first.
+
+    The partial placements are expanded from the lowest bound of their cost
+    (see NeckInstrument.best_position for the bounds and the cuts), and a complete placement
+    is pushed back with the exact cost of each valid fingering: a position popped from the
+    queue is cheaper than everything left, so the positions come out from the cheapest.
+
+    Returns:
+        tuple[list[tuple[NeckPosition, float]], bool]: The positions and their costs,
+            and False if the search stopped after max_expansions, before finding count positions.
+    """
+    if not notes or count <= 0:
+        return [], True
+    places = [instrument.possible_places_one_note(note) for note in notes]
+    min_factor = min(instrument.string_gap_dificulty_factor.values(), default=0.0)
+    max_finger = max(instrument.fingers)
+    counter = itertools.count()  # ties are popped in the order they were pushed
+    queue: list[tuple[float, int, NeckPosition | tuple[tuple[tuple[int, int], ...], float]]] = [
+        (-1.0, next(counter), ((), 0.0))
+    ]
+    results: list[tuple[NeckPosition, float]] = []
+    expansions = 0
+
+    while queue and len(results) < count:
+        priority, _, state = heapq.heappop(queue)
+        if isinstance(state, NeckPosition):
+            results.append((state, priority))
+            continue
+        if expansions == max_expansions:
+            return results, False
+        expansions += 1
+        placed, string_gap_bound = state
+        if len(placed) == len(notes):
+            for cost, position in _placement_positions(instrument, placed):
+                heapq.heappush(queue, (cost, next(counter), position))
+            continue
+
+        for string, fret in places[len(placed)]:
+            if any(string == placed_string for placed_string, _ in placed):
+                continue
+            bounds = _child_bounds(placed, string_gap_bound, (string, fret), min_factor, max_finger)
+            if bounds is None:
+                continue
+            priority = min(sum(bounds), instrument.invalid_position_cost_penalty)
+            heapq.heappush(queue, (priority, next(counter), ((*placed, (string, fret)), bounds[0])))
+    return results, True
+
+
+def _placement_positions(
+    instrument: NeckInstrument, placed: tuple[tuple[int, int], ...]
+) -> list[tuple[float, NeckPosition]]:
+    """Returns the valid fingerings of a complete placement, with their exact cost."""
+    no_finger_position = NeckPosition(())
+    for string, fret in placed:
+        no_finger_position.add_note(string, fret, 0)
+    return [
+        (instrument.position_cost(position, check_valid=False), position)
+        for position in instrument.fingerings(no_finger_position)
+        if instrument.is_valid_position(position)
+    ]
+
+
+def _child_bounds(
+    placed: tuple[tuple[int, int], ...],
+    string_gap_bound: float,
+    place: tuple[int, int],
+    min_factor: float,
+    max_finger: int,
+) -> tuple[float, float] | None:
+    """Returns the lower bounds of a partial placement extended by a (string, fret) place:
+    its string gap bound and its hand placement bound, or None if the fretted notes
+    span more frets than the fingers can hold."""
+    string, fret = place
+    fretted = [placed_fret for _, placed_fret in placed if placed_fret > 0]
+    bound = string_gap_bound
+    if fret > 0:
+        if fretted and max(*fretted, fret) - min(*fretted, fret) > MAX_FINGERS:
+            return None
+        fretted.append(fret)
+        bound += sum(
+            min_factor * abs(string - placed_string)
+            for placed_string, placed_fret in placed
+            if placed_fret > 0 and placed_fret != fret
+        )
+    hand_bound = max(0, max(1, max(fretted) - MAX_FINGERS) - max_finger) if fretted else -1
+    return bound, hand_bound
@@ -0,0 +1,23 @@
+"""
+This module provides the fingerprint of an instrument: a hash of everything its positions
+and costs depend on, to share or cache what is derived from equal instruments.
+"""
+
+import hashlib
+import json
+
+from backend.src.instruments.instrument import Instrument
+
+
+def instrument_fingerprint(instrument: Instrument) -> str:
+    """Returns a hash of everything an arrangement depends on in the instrument:
+    its class, and every attribute holding plain data (tuning, frets, fingers, cost weights).
+    Derived objects, as the compiled validity model, are left out."""
+    plain_types = (bool, int, float, str, list, tuple, dict, type(None))
+    attributes = {
+        name: repr(value)
+        for name, value in sorted(vars(instrument).items())
+        if isinstance(value, plain_types)
+    }
+    content = json.dumps([type(instrument).__qualname__, attributes], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
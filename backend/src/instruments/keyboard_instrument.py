@@ -3,11 +3,45 @@ This module contains the KeyboardInstrument class,
 which represents a keyboard instrument.
 """
 
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
 from backend.src.positions.position import Position
 
 from .instrument import Instrument
 
 
+class SlotArrays(NamedTuple):
+    """NumPy forms of the finger relations, for the batch costs of positions in slot form."""
+
+    ok_distances: npt.NDArray[np.int64]  # the ok distances matrix
+    same_hand: npt.NDArray[np.bool_]  # [i, j] is True if the fingers i and j are on one hand
+    finger_pairs: npt.NDArray[np.bool_]  # [i, j] is True for i < j, each pair counted once
+    hand_offsets: npt.NDArray[np.int64]  # the ok distance of each finger from its hand
+
+    @classmethod
+    def from_matrix(
+        cls, ok_distances_matrix: list[list[int]], hands_separation: int
+    ) -> "SlotArrays":
+        """Returns the slot arrays of an ok distances matrix."""
+        num_fingers = len(ok_distances_matrix)
+        ok_distances = np.array(ok_distances_matrix, dtype=np.int64)
+        is_left = np.arange(num_fingers) < hands_separation
+        return cls(
+            ok_distances=ok_distances,
+            same_hand=is_left[:, None] == is_left[None, :],
+            finger_pairs=np.triu(np.ones((num_fingers, num_fingers), dtype=bool), k=1),
+            hand_offsets=np.concatenate(
+                [
+                    ok_distances[0, :hands_separation],
+                    ok_distances[hands_separation, hands_separation:],
+                ]
+            ),
+        )
+
+
 class KeyboardInstrument(Instrument):
     """Class representing a keyboard instrument"""
 
@@ -44,6 +78,7 @@ class KeyboardInstrument(Instrument):
         self.same_finger_penalty_factor = 500
         self.two_hands_penalty_factor = 90
         self.crossing_hands_penalty_factor = 120
+        self.max_stretch = 2  # semitones beyond the ok distance of two fingers still playable
 
         self.ok_distances_matrix = [
             #   0   1   2   3   4   5   6   7   8   9
@@ -61,88 +96,153 @@ class KeyboardInstrument(Instrument):
 
         self.hand_amplitude = self.ok_distances_matrix[0][self.hands_separation - 1]
 
+        self.slot_arrays = SlotArrays.from_matrix(self.ok_distances_matrix, self.hands_separation)
+
     def same_hand(self, finger_i: int, finger_j: int) -> bool:
         """Checks if two fingers are on the same hand"""
         return (finger_i < self.hands_separation and finger_j < self.hands_separation) or (
             finger_i >= self.hands_separation and finger_j >= self.hands_separation
         )
 
-    def position_cost(self, position_1: Position, *, display: bool = False) -> float:
+    def possible_positions(self, note_list: list[int]) -> list[Position]:
+        """Returns the possible fingerings of a list of notes.
+        Fingers are assigned in increasing order to the notes sorted by increasing pitch
+        (left pinky on the lowest note, right pinky on the highest), so the hands never cross
+        and each finger plays at most one note.
+        An assignment is pruned with all its completions as soon as two notes of the same hand
+        are further apart than the ok distance of their fingers plus self.max_stretch.
+        At most C(10, n) assignments are explored instead of 10^n.
+        """
+        notes = sorted(set(note_list))
+        fingers = sorted(self.fingers)
+        if (
+            not notes
+            or len(notes) > len(fingers)
+            or notes[0] < self.range[0]
+            or notes[-1] > self.range[1]
+        ):
+            return []
+
+        positions: list[Position] = []
+
+        def search(index: int, assigned: list[int], next_finger_index: int) -> None:
+            if index == len(notes):
+                positions.append(Position(zip(notes, assigned, strict=True)))
+                return
+            # leave enough fingers for the remaining notes
+            last_finger_index = len(fingers) - (len(notes) - index)
+            for finger_index in range(next_finger_index, last_finger_index + 1):
+                finger = fingers[finger_index]
+                if all(
+                    notes[index] - notes[j]
+                    <= self.ok_distances_matrix[assigned[j]][finger] + self.max_stretch
+                    for j in range(index)
+                    if self.same_hand(assigned[j], finger)
+                ):
+                    search(index + 1, [*assigned, finger], finger_index + 1)
+
+        search(0, [], 0)
+        return positions
+
+    def position_cost(self, position_1: Position) -> float:
         """Computes the cost of a position.
         In a keyboard instrument, the cost is for each hand
             . 0 when two fingers are below the ok distance
               (non overlapping <=> non negative distance)
             . the summed distance between the two fingers otherwise
+        See explain_position_cost for the detail of each component.
 
         Args:
             position (Position): the position to evaluate
         """
-        if display:
-            print()
-
         position = position_1.sort_by_finger()
+        placements = position.placements
+        fingers = position.fingers
+
+        cost = 0.0
+        for i in range(len(fingers) - 1):
+            finger_i = fingers[i]
+            ok_distances = self.ok_distances_matrix[finger_i]
+            for j in range(i + 1, len(fingers)):
+                distance = placements[j] - placements[i]
+                if distance < 0 and self.same_hand(finger_i, fingers[j]):
+                    cost += self.overlapping_penalty_factor
+                ok_distance = ok_distances[fingers[j]]
+                if distance > ok_distance:
+                    cost += abs(distance - ok_distance) ** 2.5 + 1
+            # if two times same finger in position
+            if finger_i == fingers[i + 1]:
+                cost += self.same_finger_penalty_factor
+
+        # if two hands used for notes within the hand amplitude
+        if (
+            len(fingers) <= self.hands_separation
+            and (max(placements) - min(placements)) < self.hand_amplitude
+            and min(fingers) < self.hands_separation <= max(fingers)
+        ):
+            cost += self.two_hands_penalty_factor
+
+        # if crossing hands
+        left_hand, right_hand = self.hand_placements(position)
+        if -1 not in (left_hand, right_hand) and left_hand > right_hand:
+            cost += self.crossing_hands_penalty_factor
 
-        cost = 0
+        return cost
 
+    def explain_position_cost(self, position_1: Position) -> dict[str, float]:
+        """Explains the cost of a position, component by component.
+        The components sum up to position_cost:
+            overlapping: fingers of the same hand in the wrong order
+            too_far: fingers further apart than their ok distance
+            same_finger: a finger used twice
+            two_hands: two hands used for notes one hand could play
+            crossing_hands: the left hand placed above the right hand
+        """
+        position = position_1.sort_by_finger()
+        placements = position.placements
+        fingers = position.fingers
+
+        overlapping = 0.0
+        too_far = 0.0
         for i in range(len(position) - 1):
             for j in range(i + 1, len(position)):
-                finger_i = position.fingers[i]
-                finger_j = position.fingers[j]
-                distance = position.placements[j] - position.placements[i]
-                ok_distance = self.ok_distances_matrix[finger_i][finger_j]
-
-                if self.same_hand(finger_i, finger_j) and distance < 0:
-                    cost += self.overlapping_penalty_factor
-                    if display:
-                        print(f"Overlapping fingers: {finger_i} and {finger_j}")
+                distance = placements[j] - placements[i]
+                ok_distance = self.ok_distances_matrix[fingers[i]][fingers[j]]
+                if distance < 0 and self.same_hand(fingers[i], fingers[j]):
+                    overlapping += self.overlapping_penalty_factor
                 if distance > ok_distance:
-                    add = abs(distance - ok_distance) ** 2.5 + 1
-                    cost += add
-                    if display:
-                        print(
-                            f"Fingers {finger_i} and {finger_j} too far: \
-distance = {distance}, ok distance = {ok_distance}, cost = {add}"
-                        )
+                    too_far += abs(distance - ok_distance) ** 2.5 + 1
 
         # if two times same finger in position
-        for i in range(len(position) - 1):
-            if position.fingers[i] == position.fingers[i + 1]:
-                cost += self.same_finger_penalty_factor
-                if display:
-                    print(f"Same finger used twice: {position.fingers[i]}")
+        same_finger = float(
+            self.same_finger_penalty_factor
+            * sum(fingers[i] == fingers[i + 1] for i in range(len(position) - 1))
+        )
 
         # if two hands used
         # and less than 6 notes
         # and delta between max
         # and min note is less than hand amplitude
+        two_hands = 0.0
         if (
             len(position) <= self.hands_separation
-            and (max(position.placements) - min(position.placements)) < self.hand_amplitude
-        ) and (
-            min(position.fingers) < self.hands_separation
-            and max(position.fingers) >= self.hands_separation
-        ):
-            cost += self.two_hands_penalty_factor
-            if display:
-                print(
-                    f"Two hands penalty, \
-min note: {min(position.placements)}, \
-max note: {max(position.placements)}, \
-hand amplitude: {self.hand_amplitude}"
-                )
+            and (max(placements) - min(placements)) < self.hand_amplitude
+        ) and (min(fingers) < self.hands_separation <= max(fingers)):
+            two_hands = float(self.two_hands_penalty_factor)
 
         # if crossing hands
-        hand_placement = self.hand_placements(position)
-        if (
-            hand_placement[0] != -1
-            and hand_placement[1] != -1
-            and hand_placement[0] > hand_placement[1]
-        ):
-            cost += self.crossing_hands_penalty_factor
-            if display:
-                print("Crossing hands")
-
-        return cost
+        crossing_hands = 0.0
+        left_hand, right_hand = self.hand_placements(position)
+        if -1 not in (left_hand, right_hand) and left_hand > right_hand:
+            crossing_hands = float(self.crossing_hands_penalty_factor)
+
+        return {
+            "overlapping": overlapping,
+            "too_far": too_far,
+            "same_finger": same_finger,
+            "two_hands": two_hands,
+            "crossing_hands": crossing_hands,
+        }
 
     def hand_placements(self, position: Position) -> tuple[int, int]:
         """Computes the placement of the two hands within one position."""
@@ -166,73 +266,190 @@ hand amplitude: {self.hand_amplitude}"
 
         return left_hand_placement, right_hand_placement
 
-    def transition_cost(
-        self, position_1: Position, position_2: Position, *, display: bool = False
-    ) -> float:
+    def to_slots(self, position: Position) -> list[int]:
+        """Returns the fixed slot form of a position: the placement of each finger,
+        -1 if the finger is not used (the first placement if a finger is used twice)."""
+        slots = [-1] * len(self.fingers)
+        for placement, finger in reversed(position.finger_positions):
+            slots[finger] = placement
+        return slots
+
+    def positions_to_slots(self, positions: list[Position]) -> npt.NDArray[np.int64]:
+        """Returns the slot form of a list of positions, an array of shape (positions, fingers)."""
+        return np.array(
+            [self.to_slots(position) for position in positions], dtype=np.int64
+        ).reshape(len(positions), len(self.fingers))
+
+    def slots_to_position(self, slots: npt.NDArray[np.int64] | list[int]) -> Position:
+        """Returns the position of a slot form, sorted by finger."""
+        return Position(
+            (int(placement), finger) for finger, placement in enumerate(slots) if placement != -1
+        )
+
+    def transition_cost(self, position_1: Position, position_2: Position) -> float:
         """Computes the cost of a transition between two positions.
-        The transition cost is the distance between the hands positions"""
-        if display:
-            print()
-        pos_1_full = position_1.get_full_position(len(self.fingers))
-        pos_2_full = position_2.get_full_position(len(self.fingers))
-
-        cost = 0
-
-        for i in range(len(pos_1_full)):
-            if pos_1_full.placements[i] != -1 and pos_2_full.placements[i] != -1:
-                add = abs(pos_2_full.placements[i] - pos_1_full.placements[i])
-                cost += add
-                if display and add > 0:
-                    print(
-                        f"Finger {i}: {pos_1_full.placements[i]} \
--> {pos_2_full.placements[i]}, cost: {add}"
-                    )
+        The transition cost is the distance between the hands positions
+        See explain_transition_cost for the detail of each component."""
+        cost = 0.0
+        same_notes = 0
+        for placement_1, placement_2 in zip(
+            self.to_slots(position_1), self.to_slots(position_2), strict=True
+        ):
+            if placement_1 != -1 and placement_2 != -1:
+                cost += abs(placement_2 - placement_1)
+                same_notes += placement_1 == placement_2
 
-        hand_pos_1 = self.hand_placements(position_1)
-        hand_pos_2 = self.hand_placements(position_2)
+        cost += self._hands_displacement(position_1, position_2)
+        cost += self._two_hands_transition(position_1, position_2)
 
-        if hand_pos_1[0] != -1 and hand_pos_2[0] != -1:
-            add = abs(hand_pos_2[0] - hand_pos_1[0]) * 2
-            cost += add
-            if display and add > 0:
-                print(f"Left hand: {hand_pos_1[0]} -> {hand_pos_2[0]}, cost: {add}")
-
-        if hand_pos_1[1] != -1 and hand_pos_2[1] != -1:
-            add = abs(hand_pos_2[1] - hand_pos_1[1]) * 2
-            cost += add
-            if display and add > 0:
-                print(f"Right hand: {hand_pos_1[1]} -> {hand_pos_2[1]}, cost: {add}")
-
-        # if different hands used for near notes
-        # (near notes are notes with a distance less than self.hand_amplitude)
-        # first check if different hands used, only right to only left or only left to only right
-        if (
-            (
-                max(position_1.fingers) < self.hands_separation
-                and min(position_2.fingers) >= self.hands_separation
-            )
-            or (
-                max(position_2.fingers) < self.hands_separation
-                and min(position_1.fingers) >= self.hands_separation
+        # less cost if same finger on same note again
+        return max(0.0, cost - 2 * same_notes)
+
+    def explain_transition_cost(
+        self, position_1: Position, position_2: Position
+    ) -> dict[str, float]:
+        """Explains the cost of a transition between two positions, component by component.
+        The components sum up to transition_cost:
+            finger_movement: the distances between the placements of each finger
+            hand_displacement: the moves of the hands
+            two_hands: switching hands for near notes
+            same_note_bonus: the bonus (negative) for a finger kept on the same note
+        """
+        slot_pairs = [
+            (placement_1, placement_2)
+            for placement_1, placement_2 in zip(
+                self.to_slots(position_1), self.to_slots(position_2), strict=True
             )
-        ) and abs(max(position_1.placements) - min(position_2.placements)) < self.hand_amplitude:
-            cost += self.two_hands_penalty_factor
-            if display:
-                print("Two hands penalty")
+            if -1 not in (placement_1, placement_2)
+        ]
+        finger_movement = float(sum(abs(p_2 - p_1) for p_1, p_2 in slot_pairs))
+        hand_displacement = float(self._hands_displacement(position_1, position_2))
+        two_hands = float(self._two_hands_transition(position_1, position_2))
+
+        cost = finger_movement + hand_displacement + two_hands
+        same_notes = sum(p_1 == p_2 for p_1, p_2 in slot_pairs)
+        return {
+            "finger_movement": finger_movement,
+            "hand_displacement": hand_displacement,
+            "two_hands": two_hands,
+            "same_note_bonus": max(0.0, cost - 2 * same_notes) - cost,
+        }
+
+    def position_costs(self, slots: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+        """Computes the cost of a batch of positions in slot form, shape (positions, fingers).
+        Same as position_cost for positions using each finger at most once."""
+        used = slots >= 0
+        # distances[k, i, j] = placement of finger j - placement of finger i
+        distances = slots[:, None, :] - slots[:, :, None]
+        pairs = used[:, :, None] & used[:, None, :] & self.slot_arrays.finger_pairs
+        excess = distances - self.slot_arrays.ok_distances
+        costs = (pairs & (distances < 0) & self.slot_arrays.same_hand).sum(axis=(1, 2)) * float(
+            self.overlapping_penalty_factor
+        )
+        too_far = pairs & (excess > 0)
+        costs += np.where(too_far, np.clip(excess, 0, None) ** 2.5 + 1, 0.0).sum(axis=(1, 2))
+
+        left_used = used[:, : self.hands_separation].any(axis=1)
+        right_used = used[:, self.hands_separation :].any(axis=1)
+        highest = np.where(used, slots, np.iinfo(np.int64).min).max(axis=1)
+        lowest = np.where(used, slots, np.iinfo(np.int64).max).min(axis=1)
+        two_hands = (
+            (used.sum(axis=1) <= self.hands_separation)
+            & (highest - lowest < self.hand_amplitude)
+            & left_used
+            & right_used
+        )
+        costs += two_hands * float(self.two_hands_penalty_factor)
+
+        left, left_present, right, right_present = self._hand_placements_batch(slots)
+        crossing = left_present & right_present & (left > right)
+        return costs + crossing * float(self.crossing_hands_penalty_factor)
+
+    def transition_costs(
+        self, slots_1: npt.NDArray[np.int64], slots_2: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.float64]:
+        """Computes the cost of the transitions between two batches of positions in slot form,
+        a matrix of shape (positions 1, positions 2). Same as transition_cost."""
+        used_1 = slots_1 >= 0
+        used_2 = slots_2 >= 0
+        both = used_1[:, None, :] & used_2[None, :, :]
+        moves = np.abs(slots_2[None, :, :] - slots_1[:, None, :])
+        costs = np.where(both, moves, 0).sum(axis=2).astype(np.float64)
+        same_notes = (both & (moves == 0)).sum(axis=2)
+
+        costs += self._hands_displacements(slots_1, slots_2)
+        costs += self._two_hands_transitions(slots_1, slots_2)
 
         # less cost if same finger on same note again
-        for i, (placement1, finger1, placement2, finger2) in enumerate(
-            zip(
-                pos_1_full.placements,
-                pos_1_full.fingers,
-                pos_2_full.placements,
-                pos_2_full.fingers,
-                strict=False,
-            )
+        return np.maximum(0.0, costs - 2 * same_notes)
+
+    def _hands_displacements(
+        self, slots_1: npt.NDArray[np.int64], slots_2: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        """Computes _hands_displacement between two batches of positions in slot form."""
+        left_1, left_present_1, right_1, right_present_1 = self._hand_placements_batch(slots_1)
+        left_2, left_present_2, right_2, right_present_2 = self._hand_placements_batch(slots_2)
+        displacements = np.zeros((len(slots_1), len(slots_2)), dtype=np.int64)
+        for hand_1, present_1, hand_2, present_2 in (
+            (left_1, left_present_1, left_2, left_present_2),
+            (right_1, right_present_1, right_2, right_present_2),
         ):
-            if placement1 == placement2 and finger1 == finger2 and placement1 != -1:
-                cost = max(0, cost - 2)
-                if display:
-                    print(f"Same finger on same note bonus -2 (finger {i})")
+            present = present_1[:, None] & present_2[None, :]
+            displacements += np.where(present, np.abs(hand_2[None, :] - hand_1[:, None]) * 2, 0)
+        return displacements
+
+    def _two_hands_transitions(
+        self, slots_1: npt.NDArray[np.int64], slots_2: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.float64]:
+        """Computes _two_hands_transition between two batches of positions in slot form."""
+        used_1 = slots_1 >= 0
+        used_2 = slots_2 >= 0
+        only_left_1 = used_1[:, self.hands_separation :].sum(axis=1) == 0
+        only_right_1 = used_1[:, : self.hands_separation].sum(axis=1) == 0
+        only_left_2 = used_2[:, self.hands_separation :].sum(axis=1) == 0
+        only_right_2 = used_2[:, : self.hands_separation].sum(axis=1) == 0
+        highest_1 = np.where(used_1, slots_1, np.iinfo(np.int64).min).max(axis=1)
+        lowest_2 = np.where(used_2, slots_2, np.iinfo(np.int64).max).min(axis=1)
+        switch = (only_left_1[:, None] & only_right_2[None, :]) | (
+            only_right_1[:, None] & only_left_2[None, :]
+        )
+        near = np.abs(highest_1[:, None] - lowest_2[None, :]) < self.hand_amplitude
+        return (switch & near) * float(self.two_hands_penalty_factor)
+
+    def _hand_placements_batch(
+        self, slots: npt.NDArray[np.int64]
+    ) -> tuple[
+        npt.NDArray[np.int64], npt.NDArray[np.bool_], npt.NDArray[np.int64], npt.NDArray[np.bool_]
+    ]:
+        """Computes hand_placements for a batch of positions in slot form.
+        Returns the left hand placements, where they exist, the right hand placements
+        and where they exist."""
+        used = slots >= 0
+        relative = np.where(used, slots - self.slot_arrays.hand_offsets, 0)
+        res = []
+        for hand in (slice(0, self.hands_separation), slice(self.hands_separation, None)):
+            count = used[:, hand].sum(axis=1)
+            placement = relative[:, hand].sum(axis=1) // np.maximum(count, 1)
+            res.extend([placement, (count > 0) & (placement != -1)])
+        return res[0], res[1], res[2], res[3]
+
+    def _hands_displacement(self, position_1: Position, position_2: Position) -> int:
+        """Computes the cost of the moves of each hand between two positions."""
+        hand_pos_1 = self.hand_placements(position_1)
+        hand_pos_2 = self.hand_placements(position_2)
+        return sum(
+            abs(hand_2 - hand_1) * 2
+            for hand_1, hand_2 in zip(hand_pos_1, hand_pos_2, strict=True)
+            if -1 not in (hand_1, hand_2)
+        )
 
-        return cost
+    def _two_hands_transition(self, position_1: Position, position_2: Position) -> int:
+        """Computes the penalty of switching hands for near notes between two positions.
+        (near notes are notes with a distance less than self.hand_amplitude)
+        Only right to only left or only left to only right counts as switching hands."""
+        if (
+            max(position_1.fingers) < self.hands_separation <= min(position_2.fingers)
+            or max(position_2.fingers) < self.hands_separation <= min(position_1.fingers)
+        ) and abs(max(position_1.placements) - min(position_2.placements)) < self.hand_amplitude:
+            return self.two_hands_penalty_factor
+        return 0
@@ -3,12 +3,20 @@ This module contains the NeckInstrument class,
 which represents a neck instrument and its properties.
 """
 
+from functools import lru_cache
+
+import numpy as np
+
 from backend.src.positions.neck_position import NeckPosition
 from backend.src.utils.constants import MAX_FINGERS
+from backend.src.utils.metrics import CANDIDATES_PER_CHORD, METRICS
 from backend.src.utils.note2num import note2num
 from backend.src.utils.num2note import num2note
 
 from .instrument import Instrument
+from .neck_validity import NeckValidityModel
+
+MIN_VECTORIZED_POSITIONS = 64  # below, checking the positions one by one is faster
 
 
 class NeckInstrument(Instrument):
@@ -21,25 +29,43 @@ class NeckInstrument(Instrument):
         number_of_frets: int = 12,
         open_strings: list[str] | None = None,  # the midi notes of the open strings
         fingers: dict[int, str] | None = None,  # 0 is when the string is played without a finger
+        courses: list[int] | None = None,  # the number of strings of each open string, if doubled
     ) -> None:
-        """Initializes a neck instrument with the given parameters."""
+        """Initializes a neck instrument with the given parameters.
+        On an instrument with courses (groups of strings tuned together and fretted together,
+        as the doubled strings of the mandolin), the open strings are the courses:
+        positions are enumerated, validated and costed on the courses,
+        and expand_courses gives the position on the individual strings."""
         if open_strings is None:
             open_strings = ["E4", "B3", "G3", "D3", "A2", "E2"]
         if fingers is None:
             fingers = {0: "0", 1: "1", 2: "2", 3: "3", 4: "4"}
+        if courses is None:
+            courses = [1] * len(open_strings)
+        if len(courses) != len(open_strings) or min(courses, default=1) < 1:
+            msg = "There must be one course of at least one string per open string."
+            raise ValueError(msg)
         self.open_strings = [note2num(note) for note in open_strings]
+        self.courses = courses
         self.number_of_frets = number_of_frets
         note_range = (
             num2note(min(self.open_strings)),
             num2note(max(self.open_strings) + number_of_frets),
         )
         super().__init__(name, "Strings", description, note_range, fingers)
+        self.validity_model = NeckValidityModel(
+            len(self.open_strings), number_of_frets, list(self.fingers)
+        )
         self.__basic_attributes()
 
     def detail(self) -> dict:
         """Returns the details of the neck instrument"""
         return {
-            "strings": [num2note(note) for note in self.open_strings],
+            "strings": [
+                num2note(note)
+                for note, course in zip(self.open_strings, self.courses, strict=True)
+                for _ in range(course)
+            ],
             "frets": self.number_of_frets,
             "range": self.range,
             "description": self.description,
@@ -61,6 +87,26 @@ class NeckInstrument(Instrument):
         self.new_finger_cost = 2
         self.in_between_strings_cost = 15
 
+    def expand_courses(self, neck_position: NeckPosition) -> NeckPosition:
+        """Returns a position on the courses as a position on the individual strings:
+        each course placement is repeated on every string of the course, with the same finger."""
+        if all(course == 1 for course in self.courses):
+            return neck_position
+        first_strings = [1]
+        for course in self.courses:
+            first_strings.append(first_strings[-1] + course)
+        strings, frets, fingers = [], [], []
+        for course, fret, finger in zip(
+            neck_position.strings, neck_position.frets, neck_position.fingers, strict=True
+        ):
+            for string in range(first_strings[course - 1], first_strings[course]):
+                strings.append(string)
+                frets.append(fret)
+                fingers.append(finger)
+        return NeckPosition.from_strings_frets(
+            fingers=fingers, strings=strings, frets=frets, pos_id=neck_position.id
+        )
+
     def get_notes(self, neck_position: NeckPosition) -> list[str | None]:
         """Returns the notes of a position"""
         if not self.is_valid_position(neck_position):
@@ -70,8 +116,32 @@ class NeckInstrument(Instrument):
             for i in range(len(neck_position))
         ]
 
-    def is_valid_position(self, in_position: NeckPosition, *, display: bool = False) -> bool:
-        """Checks if a position is valid.
+    def is_valid_position(self, in_position: NeckPosition) -> bool:
+        """Checks if a position is valid, see invalid_reason for the rules."""
+        return self.validity_model.is_valid(in_position.placements, in_position.fingers)
+
+    def valid_positions(self, candidates: list[NeckPosition]) -> list[NeckPosition]:
+        """Returns the valid positions of a list, in the same order.
+        The positions of the same length are checked at once, unless the list is too short
+        to pay for building the arrays."""
+        if len(candidates) < MIN_VECTORIZED_POSITIONS:
+            return [candidate for candidate in candidates if self.is_valid_position(candidate)]
+        valid = np.zeros(len(candidates), dtype=bool)
+        indexes_by_length: dict[int, list[int]] = {}
+        for index, candidate in enumerate(candidates):
+            indexes_by_length.setdefault(len(candidate), []).append(index)
+        for indexes in indexes_by_length.values():
+            group = [candidates[index] for index in indexes]
+            valid[indexes] = self.validity_model.valid_mask(
+                np.array([candidate.placements for candidate in group], dtype=np.int64),
+                np.array([candidate.fingers for candidate in group], dtype=np.int64),
+            )
+        return [
+            candidate for candidate, is_valid in zip(candidates, valid, strict=True) if is_valid
+        ]
+
+    def invalid_reason(self, in_position: NeckPosition) -> str | None:
+        """Returns why a position is not valid, None if it is valid.
         A valid position is a position where:
             - two adjacent fingers must be within 1 or 0 fret of each other
             - max and min fret must be within the range of the left hand (here 4 frets)
@@ -82,67 +152,46 @@ class NeckInstrument(Instrument):
             - the note is not out of the range of the instrument
         """
         neck_position = in_position.sort_by_finger()
+        frets = neck_position.frets
+        strings = neck_position.strings
+        fingers = neck_position.fingers
 
         # Check if the frets are in increasing order
-        if neck_position.frets != sorted(neck_position.frets):
-            if display:
-                print("   Frets are not in increasing order")
-            return False
+        if frets != sorted(frets):
+            return "Frets are not in increasing order"
 
         # Check if the fingers are on different strings
-        if len(set(neck_position.strings)) != len(neck_position.strings):
-            if display:
-                print("   Fingers are on the same string")
-            return False
+        if len(set(strings)) != len(strings):
+            return "Fingers are on the same string"
 
         # Check if the max and min fret are within the range of the left hand
         # (do not count the open strings <=> fret = 0)
-        try:
-            fretted = [fret for fret in neck_position.frets if fret > 0]
-            min_fret = min(fretted)
-            max_fret = max(fretted)
-
-            if max_fret is not None and min_fret is not None and max_fret - min_fret > MAX_FINGERS:
-                if display:
-                    print("   Max and min fret are not within the range of the left hand")
-                return False
-        except ValueError:
-            pass
+        fretted = [fret for fret in frets if fret > 0]
+        if fretted and max(fretted) - min(fretted) > MAX_FINGERS:
+            return "Max and min fret are not within the range of the left hand"
 
         for i in range(len(neck_position)):
             # Check if the note is out of the range of the instrument
-            if neck_position.frets[i] < 0 or neck_position.frets[i] > self.number_of_frets:
-                if display:
-                    print("   Fret is out of the range of the instrument")
-                return False
+            if frets[i] < 0 or frets[i] > self.number_of_frets:
+                return "Fret is out of the range of the instrument"
 
             # Check if a string doesn't exist
-            if neck_position.strings[i] not in range(1, len(self.open_strings) + 1):
-                if display:
-                    print("   String doesn't exist")
-                return False
+            if not 1 <= strings[i] <= len(self.open_strings):
+                return "String doesn't exist"
 
             # Check if a finger doesn't exist
-            if neck_position.fingers[i] not in self.fingers:
-                if display:
-                    print("   Finger doesn't exist")
-                return False
+            if fingers[i] not in self.fingers:
+                return "Finger doesn't exist"
 
-            if (
-                i + 1 == len(neck_position)
-                or neck_position.fingers[i] == 0
-                or neck_position.fingers[i + 1] == 0
-            ):
+            if i + 1 == len(neck_position) or fingers[i] == 0 or fingers[i + 1] == 0:
                 continue
 
             # Check if two adjacent fingers are within 1 fret of each other
-            fret_diff = abs(neck_position.frets[i + 1] - neck_position.frets[i])
-            finger_diff = abs(neck_position.fingers[i + 1] - neck_position.fingers[i])
+            fret_diff = abs(frets[i + 1] - frets[i])
+            finger_diff = abs(fingers[i + 1] - fingers[i])
             if fret_diff > 1 > finger_diff:
-                if display:
-                    print("   Fingers are not within 1 or 0 fret of each other")
-                return False
-        return True
+                return "Fingers are not within 1 or 0 fret of each other"
+        return None
 
     def default_fingering(self, in_position: NeckPosition) -> NeckPosition:
         """Returns the default fingering of a position.
@@ -205,7 +254,7 @@ class NeckInstrument(Instrument):
         return neck_position
 
     def position_cost(  # type: ignore[override]
-        self, position_1: NeckPosition, *, check_valid: bool = True, display: bool = False
+        self, position_1: NeckPosition, *, check_valid: bool = True
     ) -> float:
         """Computes the cost of a position.
         Cost is
@@ -214,77 +263,100 @@ class NeckInstrument(Instrument):
                 multiplied by a dificulty factor
             the hand placement (the lower the better)
             the number of in between strings not played if > 1
+        See explain_position_cost for the detail of each component.
 
         Args:
             position (NeckPosition): the position to evaluate
             check_valid (bool): if True, check if the position is valid
-            display (bool): if True, display the cost computation
         """
         # if needed check if the position is valid, else return the invalid position cost penalty
-        if display:
-            print()
-
-        if check_valid and not self.is_valid_position(position_1, display=display):
+        if check_valid and not self.is_valid_position(position_1):
             return self.invalid_position_cost_penalty
 
-        cost = 0.0
+        strings = position_1.strings
+        fingers = position_1.fingers
 
         # Compute the cost of the in between strings not played
         # = number of gaps * self.in_between_strings_cost
         gaps = 0
-        if len(position_1) > 3:
-            for i in range(1, len(position_1) - 1):
-                if position_1.strings[i] != position_1.strings[i + 1] + 1:
+        if len(strings) > 3:
+            for i in range(1, len(strings) - 1):
+                if strings[i] != strings[i + 1] + 1:
                     gaps += 1
-        cost += gaps * self.in_between_strings_cost
-        if gaps > 0 and display:
-            print(f"Gaps: {gaps}, penalty: {gaps * self.in_between_strings_cost}")
+        cost = float(gaps * self.in_between_strings_cost)
 
         # Compute the cost of the string gap
-        for i in range(len(position_1) - 1):
-            for j in range(i + 1, len(position_1)):
-                finger_i = position_1.fingers[i]
-                finger_j = position_1.fingers[j]
-                if finger_i == 0 or finger_j == 0:
+        for i in range(len(strings) - 1):
+            finger_i = fingers[i]
+            if finger_i == 0:
+                continue
+            for j in range(i + 1, len(strings)):
+                finger_j = fingers[j]
+                if finger_j in (0, finger_i):
                     continue
-                if finger_i != finger_j:
-                    gap = abs(position_1.strings[j] - position_1.strings[i])
-                    finger_pair = (
-                        (finger_i, finger_j) if finger_i < finger_j else (finger_j, finger_i)
-                    )
-                    if finger_pair in self.string_gap_dificulty_factor:
-                        cost += self.string_gap_dificulty_factor[finger_pair] * gap
-                        if display:
-                            print(
-                                f"Fingers {finger_i} and {finger_j}, gap = {gap}, \
-cost = {self.string_gap_dificulty_factor[finger_pair] * gap}"
-                            )
-                    else:
-                        if display:
-                            print(f"No dificulty factor for fingers {finger_i} and {finger_j}")
-                        return self.invalid_position_cost_penalty
-        cost += self.hand_placements(position_1)
-        if display:
-            print(f"Hand placement cost: {self.hand_placements(position_1)}")
+                finger_pair = (finger_i, finger_j) if finger_i < finger_j else (finger_j, finger_i)
+                factor = self.string_gap_dificulty_factor.get(finger_pair)
+                if factor is None:
+                    return self.invalid_position_cost_penalty
+                cost += factor * abs(strings[j] - strings[i])
+
+        return cost + self.hand_placements(position_1)
+
+    def explain_position_cost(
+        self, position_1: NeckPosition, *, check_valid: bool = True
+    ) -> dict[str, float]:
+        """Explains the cost of a position, component by component.
+        The components sum up to position_cost:
+            invalid_position: the penalty of an invalid position (then the only component)
+            in_between_strings: the strings not played between the played strings
+            string_gap: the distances between the fingers strings, by dificulty factor
+            hand_placement: the placement of the hand on the neck
+        """
+        invalid = {"invalid_position": float(self.invalid_position_cost_penalty)}
+        if check_valid and not self.is_valid_position(position_1):
+            return invalid
 
-        return cost
+        strings = position_1.strings
+        fingers = position_1.fingers
+        gaps = 0
+        if len(strings) > 3:
+            gaps = sum(strings[i] != strings[i + 1] + 1 for i in range(1, len(strings) - 1))
+
+        string_gap = 0.0
+        for i in range(len(strings) - 1):
+            for j in range(i + 1, len(strings)):
+                if 0 in (fingers[i], fingers[j]) or fingers[i] == fingers[j]:
+                    continue
+                finger_pair = (min(fingers[i], fingers[j]), max(fingers[i], fingers[j]))
+                if finger_pair not in self.string_gap_dificulty_factor:
+                    return invalid
+                string_gap += self.string_gap_dificulty_factor[finger_pair] * abs(
+                    strings[j] - strings[i]
+                )
+
+        return {
+            "in_between_strings": float(gaps * self.in_between_strings_cost),
+            "string_gap": string_gap,
+            "hand_placement": float(self.hand_placements(position_1)),
+        }
 
     def possible_places_one_note(self, note: int) -> list[tuple[int, int]]:
         """Returns the possible places of a note on the neck.
         Returns a list of tuples (string, fret)."""
-        places: list[tuple[int, int]] = []
-        places.extend(
-            (string + 1, fret)
-            for string, open_note in enumerate(self.open_strings)
-            for fret in range(self.number_of_frets + 1)
-            if open_note + fret == note
-        )
-        return places
+        return list(_places_one_note(tuple(self.open_strings), self.number_of_frets, note))
 
     def possible_positions(self, note_list: list[int]) -> list[NeckPosition]:
         """Returns the possible positions of a list of notes on the neck."""
         if len(note_list) == 0:
             return []
+        with METRICS.time_stage("enumeration"):
+            res = self._possible_positions(note_list)
+        if METRICS.enabled:
+            CANDIDATES_PER_CHORD.observe(len(res), "enumerated")
+        return res
+
+    def _possible_positions(self, note_list: list[int]) -> list[NeckPosition]:
+        """Enumerates the possible positions of a non empty list of notes on the neck."""
         if len(note_list) == 1:
             no_finger_pos = []
             for string, fret in self.possible_places_one_note(note_list[0]):
@@ -307,18 +379,84 @@ cost = {self.string_gap_dificulty_factor[finger_pair] * gap}"
                 return compute_positions(note_list, new_positions, index + 1)
 
             no_finger_pos = compute_positions(note_list, [NeckPosition(())], 0)
-        default_finger_pos = [self.default_fingering(position) for position in no_finger_pos]
-        # now shift all the positions while finger 4 isn't used
         res = []
-        for current_position in default_finger_pos:
-            while (
-                max(current_position.fingers) < MAX_FINGERS and max(current_position.fingers) > 0
-            ) and (not current_position.is_barre()):
-                res.append(current_position.copy())
-                current_position.shift(1)
-            res.append(current_position)
+        for no_finger_position in no_finger_pos:
+            res.extend(self.fingerings(no_finger_position))
         return res
 
+    def fingerings(self, no_finger_position: NeckPosition) -> list[NeckPosition]:
+        """Returns the fingerings of a placement of notes on the neck.
+        The default fingering first, then the same fingering shifted by one finger
+        while finger 4 isn't used."""
+        current_position = self.default_fingering(no_finger_position)
+        res = []
+        while (
+            max(current_position.fingers) < MAX_FINGERS and max(current_position.fingers) > 0
+        ) and (not current_position.is_barre()):
+            res.append(current_position.copy())
+            current_position.shift(1)
+        res.append(current_position)
+        return res
+
+    def best_position(self, note_list: list[int]) -> NeckPosition | None:
+        """Returns the valid position of minimum cost for a list of notes, None if there is none.
+        Branch and bound over the places of each note, visited in the order of
+        possible_positions so that ties resolve to the same position as an exhaustive search.
+        A partial placement is cut when it cannot lead to a valid position
+        (two notes on the same string, fretted notes more than MAX_FINGERS frets apart),
+        or when a lower bound of its cost reaches the best cost found so far:
+            - two fretted notes on different frets never share a finger, so they cost at least
+              the smallest string gap dificulty factor times their string gap
+            - the hand placement is at least the lowest fret still reachable minus the
+              highest finger
+        """
+        if len(note_list) == 0:
+            return None
+        places = [self.possible_places_one_note(note) for note in note_list]
+        min_factor = min(self.string_gap_dificulty_factor.values(), default=0.0)
+        max_finger = max(self.fingers)
+        best_position: NeckPosition | None = None
+        best_cost = float("inf")
+
+        def search(index: int, placed: list[tuple[int, int]], string_gap_bound: float) -> None:
+            nonlocal best_position, best_cost
+            if index == len(note_list):
+                no_finger_position = NeckPosition(())
+                for string, fret in placed:
+                    no_finger_position.add_note(string, fret, 0)
+                for candidate in self.fingerings(no_finger_position):
+                    if not self.is_valid_position(candidate):
+                        continue
+                    cost = self.position_cost(candidate, check_valid=False)
+                    if cost < best_cost:
+                        best_position, best_cost = candidate, cost
+                return
+
+            for string, fret in places[index]:
+                if any(string == placed_string for placed_string, _ in placed):
+                    continue
+                fretted = [placed_fret for _, placed_fret in placed if placed_fret > 0]
+                bound = string_gap_bound
+                if fret > 0:
+                    if fretted and max(*fretted, fret) - min(*fretted, fret) > MAX_FINGERS:
+                        continue
+                    fretted.append(fret)
+                    bound += sum(
+                        min_factor * abs(string - placed_string)
+                        for placed_string, placed_fret in placed
+                        if placed_fret > 0 and placed_fret != fret
+                    )
+                hand_bound = (
+                    max(0, max(1, max(fretted) - MAX_FINGERS) - max_finger) if fretted else -1
+                )
+                if min(bound + hand_bound, self.invalid_position_cost_penalty) >= best_cost:
+                    continue
+                search(index + 1, [*placed, (string, fret)], bound)
+
+        with METRICS.time_stage("voicing_search"):
+            search(0, [], 0.0)
+        return best_position
+
     def hand_placements(self, neck_position: NeckPosition) -> int:
         """Computes the placement of the left hand within one position."""
         left_hand = []
@@ -330,7 +468,7 @@ cost = {self.string_gap_dificulty_factor[finger_pair] * gap}"
         return abs(sum(left_hand) // len(left_hand))
 
     def transition_cost(  # type: ignore[override]
-        self, position_1: NeckPosition, position_2: NeckPosition, *, display: bool = False
+        self, position_1: NeckPosition, position_2: NeckPosition
     ) -> float:
         """Computes the cost of a transition between two positions.
         The transition cost is:
@@ -338,51 +476,84 @@ cost = {self.string_gap_dificulty_factor[finger_pair] * gap}"
             the cost of the new fingers
             the difference between the hands placements by self.hand_deplacement_penalty_factor
             bonus for same finger on same string and same fret
+        See explain_transition_cost for the detail of each component.
         """
-        if display:
-            print()
+        strings_1, frets_1, fingers_1 = position_1.strings, position_1.frets, position_1.fingers
+        strings_2, frets_2, fingers_2 = position_2.strings, position_2.frets, position_2.fingers
 
         cost = 0.0
 
-        for j in range(len(position_2)):
-            for i in range(len(position_1)):
-                if position_1.fingers[i] == position_2.fingers[j]:
-                    add = abs(position_2.strings[j] - position_1.strings[i])
-                    cost += add
-                    if display and add > 0:
-                        print(
-                            f"Finger {position_1.fingers[i]}: {position_1.strings[i]} -> \
-{position_2.strings[j]}, cost: {add}"
-                        )
-
-                if (
-                    position_1.strings[i] == position_2.strings[j]
-                    and position_1.frets[i] == position_2.frets[j]
-                    and position_1.fingers[i] == position_2.fingers[j]
-                ):
+        for j, finger in enumerate(fingers_2):
+            for i, previous_finger in enumerate(fingers_1):
+                if previous_finger != finger:
+                    continue
+                cost += abs(strings_2[j] - strings_1[i])
+                if strings_1[i] == strings_2[j] and frets_1[i] == frets_2[j]:
                     cost -= self.same_finger_same_string_same_fret_bonus
-                    if display:
-                        print("Same finger on same string and same fret")
 
-            if position_2.fingers[j] not in position_1.fingers and position_2.fingers[j] != 0:
-                add = self.new_finger_cost
-                cost += add
-                if display:
-                    print(f"New finger {position_2.fingers[j]}, cost: {add}")
+            if finger != 0 and finger not in fingers_1:
+                cost += self.new_finger_cost
 
         hand_pos_1 = self.hand_placements(position_1)
         hand_pos_2 = self.hand_placements(position_2)
+        if hand_pos_1 != -1 and hand_pos_2 != -1:
+            cost += abs(hand_pos_2 - hand_pos_1) * self.hand_deplacement_penalty_factor
 
-        if hand_pos_1 == -1 or hand_pos_2 == -1:
-            add = 0
-        else:
-            add = abs(hand_pos_2 - hand_pos_1) * self.hand_deplacement_penalty_factor
-        cost += add
+        return cost
 
-        if display and add > 0:
-            print(f"Left hand: {hand_pos_1} -> {hand_pos_2}, cost: {add}")
+    def explain_transition_cost(
+        self, position_1: NeckPosition, position_2: NeckPosition
+    ) -> dict[str, float]:
+        """Explains the cost of a transition between two positions, component by component.
+        The components sum up to transition_cost:
+            finger_movement: the distances between the strings of each finger
+            same_place_bonus: the bonus (negative) for a finger kept on the same string and fret
+            new_fingers: the cost of the fingers not used in the first position
+            hand_displacement: the move of the hand, by self.hand_deplacement_penalty_factor
+        """
+        finger_movement = 0.0
+        same_place_bonus = 0.0
+        new_fingers = 0.0
+        for fp_2 in position_2.finger_positions:
+            for fp_1 in position_1.finger_positions:
+                if fp_1.finger != fp_2.finger:
+                    continue
+                finger_movement += abs(fp_2.placement // 100 - fp_1.placement // 100)
+                if fp_1.placement == fp_2.placement:
+                    same_place_bonus -= self.same_finger_same_string_same_fret_bonus
+            if fp_2.finger != 0 and fp_2.finger not in position_1.fingers:
+                new_fingers += self.new_finger_cost
 
-        return cost
+        hand_pos_1 = self.hand_placements(position_1)
+        hand_pos_2 = self.hand_placements(position_2)
+        hand_displacement = 0.0
+        if hand_pos_1 != -1 and hand_pos_2 != -1:
+            hand_displacement = float(
+                abs(hand_pos_2 - hand_pos_1) * self.hand_deplacement_penalty_factor
+            )
+
+        return {
+            "finger_movement": finger_movement,
+            "same_place_bonus": same_place_bonus,
+            "new_fingers": new_fingers,
+            "hand_displacement": hand_displacement,
+        }
+
+
+@lru_cache(maxsize=4096)
+def _places_one_note(
+    open_strings: tuple[int, ...], number_of_frets: int, note: int
+) -> tuple[tuple[int, int], ...]:
+    """Returns the (string, fret) places of a note on a neck, cached per tuning."""
+    return tuple(
+        (string + 1, fret)
+        for string, open_note in enumerate(open_strings)
+        for fret in range(number_of_frets + 1)
+        if open_note + fret == note
+    )
+
+
+METRICS.register_lru_cache("places_one_note", _places_one_note)
 
 
 class Guitar(NeckInstrument):
@@ -437,7 +608,8 @@ class Mandolin(NeckInstrument):
             "mandolin",
             "Basic mandolin",
             number_of_frets=18,
-            open_strings=["E5", "E5", "A4", "A4", "D4", "D4", "G4", "G4"],
+            open_strings=["E5", "A4", "D4", "G4"],
+            courses=[2, 2, 2, 2],
         )
 
 
@@ -485,4 +657,4 @@ if __name__ == "__main__":
             pos = position.sort_by_string()
             print("Valid position:", pos)
             print("Notes:", guitar.get_notes(pos))
-            print(guitar.position_cost(pos, display=False))
+            print(guitar.explain_position_cost(pos))
@@ -0,0 +1,124 @@
+"""
+This module contains the NeckValidityModel class, a precompiled form of the validity rules
+of a neck instrument (see NeckInstrument.invalid_reason).
+
+Placements (string * 100 + fret) and fingers are checked against integer bitmasks,
+and the frets held by each finger are packed in one integer per finger,
+so the rules need neither sorting nor copies of the position.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.utils.constants import MAX_FINGERS
+
+
+class NeckValidityModel:
+    """The validity rules of a neck instrument, compiled for its strings, frets and fingers."""
+
+    def __init__(self, number_of_strings: int, number_of_frets: int, fingers: list[int]) -> None:
+        """Compiles the rules.
+
+        Args:
+            number_of_strings (int): The strings are numbered from 1 to number_of_strings.
+            number_of_frets (int): The frets are numbered from 0 (open string) to number_of_frets.
+            fingers (list[int]): The fingers of the instrument, 0 is the open string.
+        """
+        valid_placements = [
+            string * 100 + fret
+            for string in range(1, number_of_strings + 1)
+            for fret in range(number_of_frets + 1)
+        ]
+        # bit p is set when the placement p exists
+        self.placement_mask = sum(1 << placement for placement in valid_placements)
+        self.finger_mask = sum(1 << finger for finger in set(fingers) if finger >= 0)
+        # the same masks as lookup tables, for arrays of positions
+        self.placement_table = np.zeros((number_of_strings + 1) * 100, dtype=bool)
+        self.placement_table[valid_placements] = True
+        self.finger_table = np.zeros(max(self.finger_mask.bit_length(), 1), dtype=bool)
+        self.finger_table[[finger for finger in set(fingers) if finger >= 0]] = True
+
+    def is_valid(self, placements: list[int], fingers: list[int]) -> bool:
+        """Returns True if the placements played with the fingers form a valid position."""
+        strings_mask = 0
+        fretted_mask = 0
+        finger_frets: dict[int, int] = {}  # the frets held by each finger, as a bitmask
+        for placement, finger in zip(placements, fingers, strict=True):
+            # the fret and the string exist
+            if placement < 0 or not self.placement_mask >> placement & 1:
+                return False
+            # the finger exists
+            if finger < 0 or not self.finger_mask >> finger & 1:
+                return False
+            # each placement is on a different string
+            string_bit = 1 << placement // 100
+            if strings_mask & string_bit:
+                return False
+            strings_mask |= string_bit
+            fret = placement % 100
+            # the frets of a finger are in increasing order
+            frets = finger_frets.get(finger, 0)
+            if frets >> (fret + 1):
+                return False
+            finger_frets[finger] = frets | 1 << fret
+            if fret:
+                fretted_mask |= 1 << fret
+
+        # the fretted placements are within the range of the left hand
+        lowest_fretted = fretted_mask & -fretted_mask
+        if fretted_mask.bit_length() - lowest_fretted.bit_length() > MAX_FINGERS:
+            return False
+
+        previous_highest = -1
+        for finger in sorted(finger_frets):
+            frets = finger_frets[finger]
+            lowest = frets & -frets
+            # the frets are in increasing order from one finger to the next
+            if lowest.bit_length() - 1 < previous_highest:
+                return False
+            # a finger holds adjacent frets only (frets + lowest clears a run of bits)
+            if finger and (frets + lowest) & frets:
+                return False
+            previous_highest = frets.bit_length() - 1
+        return True
+
+    def valid_mask(
+        self, placements: npt.NDArray[np.int64], fingers: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.bool_]:
+        """Checks many positions of the same length at once.
+
+        Args:
+            placements (NDArray): (positions, notes) the placements of each position.
+            fingers (NDArray): (positions, notes) the fingers of each position.
+
+        Returns:
+            NDArray: (positions,) True for the valid positions.
+        """
+        if placements.shape[1] == 0:
+            return np.ones(len(placements), dtype=bool)
+        placements_in_table = (placements >= 0) & (placements < len(self.placement_table))
+        valid = (
+            placements_in_table & self.placement_table[np.where(placements_in_table, placements, 0)]
+        ).all(axis=1)
+        fingers_in_table = (fingers >= 0) & (fingers < len(self.finger_table))
+        valid &= (fingers_in_table & self.finger_table[np.where(fingers_in_table, fingers, 0)]).all(
+            axis=1
+        )
+
+        strings = np.sort(placements // 100, axis=1)
+        valid &= (np.diff(strings, axis=1) != 0).all(axis=1)
+
+        frets = placements % 100
+        fretted = frets > 0
+        highest = np.where(fretted, frets, 0).max(axis=1)
+        lowest = np.where(fretted, frets, highest[:, None]).min(axis=1)
+        valid &= highest - lowest <= MAX_FINGERS
+
+        order = np.argsort(fingers, axis=1, kind="stable")
+        sorted_frets = np.take_along_axis(frets, order, axis=1)
+        sorted_fingers = np.take_along_axis(fingers, order, axis=1)
+        fret_steps = np.diff(sorted_frets, axis=1)
+        valid &= (fret_steps >= 0).all(axis=1)
+        same_finger = (np.diff(sorted_fingers, axis=1) == 0) & (sorted_fingers[:, 1:] != 0)
+        valid &= np.logical_not((same_finger & (fret_steps > 1)).any(axis=1))
+        return valid
@@ -0,0 +1,185 @@
+"""
+This module contains the ShapeLibrary class, which generates the positions of a chord
+on a neck instrument by translating the hand shapes of its transpositions along the neck.
+The libraries are shared by the equal instruments, see shape_library.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from backend.src.instruments.instrument_fingerprint import instrument_fingerprint
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.constants import MAX_FINGERS
+from backend.src.utils.metrics import METRICS
+
+MAX_SHAPE_LIBRARIES = 64  # the libraries kept for the instruments (tunings, capos...) last used
+
+
+class Shape(NamedTuple):
+    """A fingering of a chord, relative to its first note: the frets are offsets
+    from the pitch of the first note, so the shape plays every transposition of the chord."""
+
+    strings: tuple[int, ...]
+    fret_offsets: tuple[int, ...]
+    fingers: tuple[int, ...]
+    shape_cost: float | None  # in between strings and string gap costs, None if unplayable
+    hand_offset: int  # the hand placement is abs(first note + hand_offset)
+    lowest_offset: int
+    highest_offset: int
+
+
+class ShapeLibrary:
+    """Library of the hand shapes of a neck instrument, by chord intervals.
+
+    The shapes of a chord are derived once per intervals, from the first note, by enumerating
+    the strings of its notes. A chord is then answered by translating the shapes of its
+    intervals to its first note, keeping those within the frets of the neck. The costs of the
+    positions reuse the shape costs, only the hand placement depends on the translation.
+    Fretted shapes can't play open strings: the chords with a note of an open string
+    are enumerated with possible_positions.
+
+    The positions and costs are the ones of possible_positions, valid_positions
+    and position_cost, in the same order.
+    """
+
+    def __init__(self, instrument: NeckInstrument) -> None:
+        """Initializes an empty library.
+
+        Args:
+            instrument (NeckInstrument): The instrument, its cost weights must not change.
+        """
+        self.instrument = instrument
+        self.__open_notes = frozenset(instrument.open_strings)
+        self.__shapes: dict[tuple[int, ...], list[Shape]] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of chord intervals in the library."""
+        return len(self.__shapes)
+
+    def __contains__(self, intervals: tuple[int, ...]) -> bool:
+        """Returns True if the shapes of the intervals (from the first note) are derived."""
+        return intervals in self.__shapes
+
+    def is_regular(self, chord: tuple[int, ...]) -> bool:
+        """Returns True if the positions of the chord are translated shapes:
+        none of its notes can be played on an open string."""
+        return bool(chord) and self.__open_notes.isdisjoint(chord)
+
+    def candidates(self, chord: tuple[int, ...]) -> list[tuple[NeckPosition, float]]:
+        """Returns the valid positions of a chord, with their position costs."""
+        instrument = self.instrument
+        if not self.is_regular(chord):
+            possible_positions = instrument.possible_positions(list(chord))
+            with METRICS.time_stage("validation"):
+                valid_positions = instrument.valid_positions(possible_positions)
+            with METRICS.time_stage("costing"):
+                return [
+                    (position, instrument.position_cost(position, check_valid=False))
+                    for position in valid_positions
+                ]
+        with METRICS.time_stage("enumeration"):
+            return self.__translated_shapes(chord)
+
+    def __translated_shapes(self, chord: tuple[int, ...]) -> list[tuple[NeckPosition, float]]:
+        """Returns the shapes of the intervals of a regular chord translated to its first note."""
+        instrument = self.instrument
+        first_note = chord[0]
+        intervals = tuple(note - first_note for note in chord)
+        if intervals not in self.__shapes:
+            self.__shapes[intervals] = self.__derive_shapes(intervals)
+        penalty = float(instrument.invalid_position_cost_penalty)
+        return [
+            (
+                NeckPosition.from_strings_frets(
+                    fingers=list(shape.fingers),
+                    strings=list(shape.strings),
+                    frets=[first_note + offset for offset in shape.fret_offsets],
+                ),
+                penalty
+                if shape.shape_cost is None
+                else shape.shape_cost + abs(first_note + shape.hand_offset),
+            )
+            for shape in self.__shapes[intervals]
+            if first_note + shape.lowest_offset >= 1
+            and first_note + shape.highest_offset <= instrument.number_of_frets
+        ]
+
+    def __derive_shapes(self, intervals: tuple[int, ...]) -> list[Shape]:
+        """Derives the valid fretted shapes of chord intervals, in the order of the enumeration
+        (strings of the first note, then of the second note...)."""
+        instrument = self.instrument
+        open_strings = instrument.open_strings
+        shapes: list[Shape] = []
+
+        def search(strings: list[int], offsets: list[int]) -> None:
+            if len(strings) == len(intervals):
+                shapes.extend(self.__fingered_shapes(strings, offsets))
+                return
+            for string in range(1, len(open_strings) + 1):
+                if string in strings:
+                    continue
+                offset = intervals[len(strings)] - open_strings[string - 1]
+                if offsets and max(*offsets, offset) - min(*offsets, offset) > MAX_FINGERS:
+                    continue
+                search([*strings, string], [*offsets, offset])
+
+        search([], [])
+        return shapes
+
+    def __fingered_shapes(self, strings: list[int], offsets: list[int]) -> list[Shape]:
+        """Returns the valid shapes of the fingerings of notes on strings, at fret offsets.
+        They are fingered at the first fret, validity doesn't depend on the translation."""
+        instrument = self.instrument
+        lowest, highest = min(offsets), max(offsets)
+        if highest - lowest + 1 > instrument.number_of_frets:
+            return []
+        first_note = 1 - lowest  # the first note of the translation on the first fret
+        no_finger_position = NeckPosition(())
+        for string, offset in zip(strings, offsets, strict=True):
+            no_finger_position.add_note(string, first_note + offset, 0)
+        shapes = []
+        for position in instrument.fingerings(no_finger_position):
+            if not instrument.is_valid_position(position):
+                continue
+            breakdown = instrument.explain_position_cost(position, check_valid=False)
+            fret_offsets = tuple(fret - first_note for fret in position.frets)
+            shapes.append(
+                Shape(
+                    strings=tuple(position.strings),
+                    fret_offsets=fret_offsets,
+                    fingers=tuple(position.fingers),
+                    shape_cost=(
+                        None
+                        if "invalid_position" in breakdown
+                        else breakdown["in_between_strings"] + breakdown["string_gap"]
+                    ),
+                    hand_offset=(sum(fret_offsets) - sum(position.fingers)) // len(position),
+                    lowest_offset=lowest,
+                    highest_offset=highest,
+                )
+            )
+        return shapes
+
+
+# one library per instrument fingerprint, shared by all the arrangements of the process
+SHAPE_LIBRARIES: OrderedDict[str, ShapeLibrary] = OrderedDict()
+_SHAPE_LIBRARIES_LOCK = threading.Lock()
+
+
+def shape_library(instrument: NeckInstrument) -> ShapeLibrary:
+    """Returns the shape library of an instrument, shared by the instruments with the same
+    fingerprint, so the shapes are derived once for every piece and request.
+    The library keeps a copy of the instrument: changing the instrument afterwards
+    changes its fingerprint, and doesn't reach the shared shapes."""
+    fingerprint = instrument_fingerprint(instrument)
+    with _SHAPE_LIBRARIES_LOCK:
+        if fingerprint in SHAPE_LIBRARIES:
+            SHAPE_LIBRARIES.move_to_end(fingerprint)
+        else:
+            SHAPE_LIBRARIES[fingerprint] = ShapeLibrary(copy.deepcopy(instrument))
+            if len(SHAPE_LIBRARIES) > MAX_SHAPE_LIBRARIES:
+                SHAPE_LIBRARIES.popitem(last=False)
+        return SHAPE_LIBRARIES[fingerprint]
@@ -0,0 +1,100 @@
+"""
+This module contains the VoicingIndex class, which maps a set of pitch classes
+to the best positions playing it on a neck instrument.
+"""
+
+import heapq
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.constants import MAX_FINGERS
+
+
+class VoicingIndex:
+    """Index of the voicings of a neck instrument, by set of pitch classes.
+
+    An entry holds the cheapest valid positions playing each pitch class of the set exactly once,
+    in any octave of the instrument, sorted by position cost. The entries are computed ahead of
+    the lookups by build (e.g. for every chord symbol of the vocabulary), then a lookup is a
+    dictionary access; a set that wasn't built is computed on its first lookup.
+    """
+
+    def __init__(self, instrument: NeckInstrument, max_voicings: int = 10) -> None:
+        """Initializes an empty index.
+
+        Args:
+            instrument (NeckInstrument): The instrument playing the voicings.
+            max_voicings (int): The number of voicings kept per set of pitch classes.
+        """
+        self.instrument = instrument
+        self.max_voicings = max_voicings
+        self.__voicings: dict[frozenset[int], list[tuple[NeckPosition, float]]] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of sets of pitch classes in the index."""
+        return len(self.__voicings)
+
+    def __contains__(self, pitch_classes: frozenset[int]) -> bool:
+        """Returns True if the voicings of the pitch classes are already indexed."""
+        return pitch_classes in self.__voicings
+
+    def voicings(self, pitch_classes: frozenset[int]) -> list[tuple[NeckPosition, float]]:
+        """Returns the indexed voicings of a set of pitch classes (0 is C),
+        from the cheapest to the most expensive, with their cost."""
+        if pitch_classes not in self.__voicings:
+            self.__voicings[pitch_classes] = self.__best_voicings(pitch_classes)
+        return self.__voicings[pitch_classes]
+
+    def build(self, sets_of_pitch_classes: list[frozenset[int]]) -> None:
+        """Indexes the voicings of several sets of pitch classes ahead of the lookups."""
+        for pitch_classes in sets_of_pitch_classes:
+            self.voicings(pitch_classes)
+
+    def __best_voicings(self, pitch_classes: frozenset[int]) -> list[tuple[NeckPosition, float]]:
+        """Ranks the valid positions placing each pitch class on its own string."""
+        instrument = self.instrument
+        if not pitch_classes or len(pitch_classes) > len(instrument.open_strings):
+            return []
+        places = [
+            [
+                (string, fret)
+                for string, open_string in enumerate(instrument.open_strings, start=1)
+                for fret in range(
+                    (pitch_class - open_string) % 12, instrument.number_of_frets + 1, 12
+                )
+            ]
+            for pitch_class in sorted(pitch_classes)
+        ]
+        candidates: list[tuple[NeckPosition, float]] = []
+        for placements in self.__placements(places, []):
+            no_finger_position = NeckPosition(())
+            # the notes from the lowest, as possible_positions places them
+            for string, fret in sorted(
+                placements, key=lambda place: instrument.open_strings[place[0] - 1] + place[1]
+            ):
+                no_finger_position.add_note(string, fret, 0)
+            candidates.extend(
+                (position, instrument.position_cost(position, check_valid=False))
+                for position in instrument.fingerings(no_finger_position)
+                if instrument.is_valid_position(position)
+            )
+        return heapq.nsmallest(self.max_voicings, candidates, key=lambda candidate: candidate[1])
+
+    @staticmethod
+    def __placements(
+        places: list[list[tuple[int, int]]], placed: list[tuple[int, int]]
+    ) -> list[list[tuple[int, int]]]:
+        """Returns the placements of the next pitch classes on distinct strings, skipping those
+        whose fretted notes span more frets than the fingers can hold."""
+        if len(placed) == len(places):
+            return [placed]
+        strings = {string for string, _ in placed}
+        frets = [fret for _, fret in placed if fret > 0]
+        placements = []
+        for string, fret in places[len(placed)]:
+            if string in strings:
+                continue
+            if fret > 0 and frets and max(*frets, fret) - min(*frets, fret) > MAX_FINGERS:
+                continue
+            placements.extend(VoicingIndex.__placements(places, [*placed, (string, fret)]))
+        return placements
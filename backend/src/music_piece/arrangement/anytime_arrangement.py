@@ -0,0 +1,194 @@
+"""
+This module provides an anytime arrangement of musical pieces, for a time budget.
+
+A beam search keeps, after each chord, the cheapest positions reached: with a width of one it
+is a greedy arrangement, found fast; the beam is then widened until the time budget runs out.
+Once the beam holds every position of every chord, nothing is pruned and the search is the exact
+shortest path of neck_arrangement: the arrangement is then proven optimal.
+"""
+
+import itertools
+import math
+import time
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.instruments.shape_library import shape_library
+from backend.src.music_piece.arrangement.held_notes import held_transition_costs, held_transitions
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.num2note import num2note
+
+BEAM_GROWTH = 4  # the factor of the width of the beam from one pass to the next
+
+
+class AnytimeArrangement(NamedTuple):
+    """The best arrangement found within the time budget.
+
+    positions: the positions, one per timed chord
+    total_cost: the sum of the position and transition costs of the arrangement
+    optimal: True if the arrangement is proven optimal (the last pass pruned nothing)
+    beam_width: the width of the beam of the last completed pass
+    """
+
+    positions: list[NeckPosition]
+    total_cost: float
+    optimal: bool
+    beam_width: int
+
+
+class _Layer(NamedTuple):
+    """The candidates of a timed chord: the valid positions of its chord and their position
+    costs, and its sustained notes."""
+
+    chord: tuple[int, ...]
+    positions: list[NeckPosition]
+    costs: npt.NDArray[np.float64]
+    sustained: tuple[int, ...] = ()
+
+
+def anytime_arrangement(
+    music_piece: MusicPiece, instrument: NeckInstrument, time_budget: float
+) -> AnytimeArrangement:
+    """Arranges the music piece for the instrument, improving the arrangement until the time
+    budget (in seconds) runs out. The first, greedy, pass always completes.
+
+    Raises:
+        ValueError: if the piece is empty, or a chord has no valid position.
+    """
+    deadline = time.perf_counter() + time_budget
+    layers = _candidate_layers(music_piece, instrument)
+    transitions = _Transitions(instrument)
+    max_candidates = max(len(layer.positions) for layer in layers)
+
+    width = 1
+    best = _beam_pass(layers, transitions, width, max_candidates, deadline=math.inf)
+    while not best.optimal and time.perf_counter() < deadline:
+        width = min(width * BEAM_GROWTH, max_candidates)
+        try:
+            arrangement = _beam_pass(layers, transitions, width, max_candidates, deadline)
+        except TimeoutError:
+            break
+        if arrangement.optimal or arrangement.total_cost < best.total_cost:
+            best = arrangement
+    return best
+
+
+def _candidate_layers(music_piece: MusicPiece, instrument: NeckInstrument) -> list[_Layer]:
+    """Returns the candidates of each timed chord, the chords sharing their candidates."""
+    if not music_piece.timed_chords:
+        msg = "The music piece has no chord to arrange."
+        raise ValueError(msg)
+    shapes = shape_library(instrument)
+    chord_layers: dict[tuple[int, ...], _Layer] = {}
+    errors = []
+    for timed_chord in music_piece.timed_chords:
+        chord = timed_chord.chord
+        if chord not in chord_layers:
+            candidates = shapes.candidates(chord)
+            chord_layers[chord] = _Layer(
+                chord,
+                [position for position, _ in candidates],
+                np.array([cost for _, cost in candidates], dtype=np.float64),
+            )
+            if not candidates:
+                notes_str = ", ".join([num2note(note) for note in chord])
+                errors.append(f"No valid positions found for notes: {notes_str} for {instrument}")
+    if errors:
+        raise ValueError("Errors found during neck arrangement:\n" + "\n\t".join(errors))
+    return [
+        chord_layers[timed_chord.chord]._replace(sustained=timed_chord.sustained)
+        for timed_chord in music_piece.timed_chords
+    ]
+
+
+class _Transitions:
+    """The transition costs from a position of a chord to every position of the next chord,
+    computed for the positions the beam reaches, and shared by the repeated chord pairs.
+    The transitions not allowed by the sustained notes of the next chord cost infinity
+    (see held_notes)."""
+
+    def __init__(self, instrument: NeckInstrument) -> None:
+        """Initializes an empty cache of transition costs."""
+        self.instrument = instrument
+        self.__rows: dict[tuple[tuple[int, ...], tuple[int, ...], int], npt.NDArray[np.float64]]
+        self.__rows = {}
+        self.__held: dict[
+            tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]], npt.NDArray[np.bool_]
+        ] = {}
+
+    def row(self, layer: _Layer, index: int, next_layer: _Layer) -> npt.NDArray[np.float64]:
+        """Returns the transition costs from a position of a layer to the next layer."""
+        key = (layer.chord, next_layer.chord, index)
+        if key not in self.__rows:
+            position = layer.positions[index]
+            self.__rows[key] = np.array(
+                [
+                    self.instrument.transition_cost(position, next_position)
+                    for next_position in next_layer.positions
+                ],
+                dtype=np.float64,
+            )
+        if not next_layer.sustained:
+            return self.__rows[key]
+        held_key = (layer.chord, next_layer.chord, next_layer.sustained)
+        if held_key not in self.__held:
+            self.__held[held_key] = held_transitions(
+                layer.positions, next_layer.positions, next_layer.sustained, self.instrument
+            )
+        return held_transition_costs(self.__rows[key], self.__held[held_key][index])
+
+
+def _beam_pass(
+    layers: list[_Layer],
+    transitions: _Transitions,
+    width: int,
+    max_candidates: int,
+    deadline: float,
+) -> AnytimeArrangement:
+    """Runs a beam search keeping the width cheapest positions of each layer,
+    and returns the cheapest arrangement found.
+
+    Raises:
+        TimeoutError: if the deadline passes before the end of the search.
+    """
+    costs = layers[0].costs
+    beam = _cheapest(costs, width)
+    back_pointers: list[npt.NDArray[np.int64]] = []
+    for layer, next_layer in itertools.pairwise(layers):
+        if time.perf_counter() >= deadline:
+            raise TimeoutError
+        totals = np.full(len(next_layer.positions), np.inf)
+        pointers = np.zeros(len(next_layer.positions), dtype=np.int64)
+        for index in beam:
+            candidate = costs[index] + transitions.row(layer, index, next_layer)
+            better = candidate < totals
+            totals[better] = candidate[better]
+            pointers[better] = index
+        costs = totals + next_layer.costs
+        back_pointers.append(pointers)
+        beam = _cheapest(costs, width)
+
+    index = int(beam[np.argmin(costs[beam])])
+    total_cost = float(costs[index])
+    path = [index]
+    for pointers in reversed(back_pointers):
+        index = int(pointers[index])
+        path.append(index)
+    path.reverse()
+    return AnytimeArrangement(
+        positions=[layer.positions[index] for layer, index in zip(layers, path, strict=True)],
+        total_cost=total_cost,
+        optimal=width >= max_candidates,  # nothing was pruned
+        beam_width=width,
+    )
+
+
+def _cheapest(costs: npt.NDArray[np.float64], width: int) -> npt.NDArray[np.int64]:
+    """Returns the indexes of the width cheapest costs (all of them if there are fewer)."""
+    if len(costs) <= width:
+        return np.arange(len(costs))
+    return np.argpartition(costs, width - 1)[:width]
@@ -0,0 +1,222 @@
+"""
+This module provides a persistent cache of neck arrangements, stored in a SQLite database.
+
+An arrangement is keyed by a content hash of the timed chords of the music piece,
+the fingerprint of the instrument (tuning, frets, fingers and every cost weight)
+and the version of the solver, so a change of any of them misses the cache.
+A MIDI file can also be looked up by the hash of its bytes, without parsing it.
+
+The database is shared by several worker processes: it runs in WAL mode, every operation
+opens its own connection and writes in an immediate transaction. When the stored arrangements
+exceed the size limit, the least recently used ones are evicted.
+"""
+
+import contextlib
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from backend.src.instruments.instrument_fingerprint import instrument_fingerprint
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.neck_arrangement import SOLVER_VERSION, neck_arrangement
+from backend.src.music_piece.music_piece import ChordMerging, MusicPiece
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.metrics import CACHE_REQUESTS, METRICS
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+BUSY_TIMEOUT = 30.0  # seconds waited for a lock held by another process
+
+
+def piece_hash(music_piece: MusicPiece) -> str:
+    """Returns a hash of the content of the music piece: the notes and timing of its chords,
+    and their sustained notes."""
+    digest = hashlib.sha256()
+    for timed_chord in music_piece.timed_chords:
+        digest.update(
+            f"{timed_chord.chord}|{timed_chord.start_time!r}|{timed_chord.duration!r}".encode()
+        )
+        if timed_chord.sustained:
+            digest.update(f"|{timed_chord.sustained}".encode())
+        digest.update(b";")
+    return digest.hexdigest()
+
+
+def arrangement_key(music_piece_hash: str, instrument: NeckInstrument) -> str:
+    """Returns the cache key of the arrangement of a music piece, by its hash, on an instrument."""
+    return (
+        "arrangement:"
+        + hashlib.sha256(
+            f"{SOLVER_VERSION}|{instrument_fingerprint(instrument)}|{music_piece_hash}".encode()
+        ).hexdigest()
+    )
+
+
+def midi_key(midi_path: Path, fs: int, merging: ChordMerging | None = None) -> str:
+    """Returns the cache key of the music piece hash of a MIDI file read at frame rate fs,
+    with the chord merging."""
+    digest = hashlib.sha256(f"{fs};".encode())
+    if merging is not None:
+        digest.update(f"{tuple(merging)!r};".encode())
+    digest.update(midi_path.read_bytes())
+    return "midi:" + digest.hexdigest()
+
+
+class ArrangementCache:
+    """Persistent cache of arrangements (and of MIDI file to music piece hashes)."""
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Opens the cache database, creating it if needed.
+
+        Args:
+            path (Path): The SQLite database file.
+            max_bytes (int): The size of the stored values above which entries are evicted.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+            )
+
+    def __connect(self) -> contextlib.closing[sqlite3.Connection]:
+        """Opens a connection, in autocommit mode: transactions are explicit.
+        It is closed at the end of the with block."""
+        return contextlib.closing(
+            sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        )
+
+    def __len__(self) -> int:
+        """Returns the number of entries."""
+        with self.__connect() as connection:
+            return int(connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+
+    def size(self) -> int:
+        """Returns the total size of the stored values, in bytes."""
+        with self.__connect() as connection:
+            return int(
+                connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            )
+
+    def get(self, key: str) -> str | None:
+        """Returns the value of a key and marks it as recently used, None if it isn't cached."""
+        with self.__connect() as connection:
+            row = connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+        if METRICS.enabled:
+            CACHE_REQUESTS.inc("arrangement", "miss" if row is None else "hit")
+        return None if row is None else str(row[0])
+
+    def put(self, key: str, value: str) -> None:
+        """Stores the value of a key, then evicts the least recently used entries
+        while the stored values exceed max_bytes."""
+        size = len(value.encode())
+        with self.__connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, size, time.time()),
+                )
+                self.__evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self.__connect() as connection:
+            connection.execute("DELETE FROM entries")
+
+    def __evict(self, connection: sqlite3.Connection) -> None:
+        """Deletes the least recently used entries until the values fit in max_bytes."""
+        excess = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess -= self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def get_arrangement(self, key: str) -> list[NeckPosition] | None:
+        """Returns the cached arrangement of a key, None if it isn't cached."""
+        value = self.get(key)
+        if value is None:
+            return None
+        return [
+            NeckPosition.from_strings_frets(
+                fingers=position["fingers"], strings=position["strings"], frets=position["frets"]
+            )
+            for position in json.loads(value)
+        ]
+
+    def put_arrangement(self, key: str, positions: list[NeckPosition]) -> None:
+        """Stores an arrangement."""
+        self.put(key, json.dumps([position.to_json() for position in positions]))
+
+
+def cached_neck_arrangement(
+    music_piece: MusicPiece, instrument: NeckInstrument, cache: ArrangementCache
+) -> list[NeckPosition]:
+    """Same as neck_arrangement, the result is read from the cache when it was already computed.
+
+    Raises:
+        ValueError: as neck_arrangement, errors are not cached.
+    """
+    positions, _ = cached_neck_arrangement_hit(music_piece, instrument, cache)
+    return positions
+
+
+def cached_neck_arrangement_hit(
+    music_piece: MusicPiece, instrument: NeckInstrument, cache: ArrangementCache
+) -> tuple[list[NeckPosition], bool]:
+    """Same as cached_neck_arrangement, with True if the arrangement was read from the cache.
+
+    Raises:
+        ValueError: as neck_arrangement, errors are not cached.
+    """
+    key = arrangement_key(piece_hash(music_piece), instrument)
+    positions = cache.get_arrangement(key)
+    if positions is not None:
+        return positions, True
+    positions = neck_arrangement(music_piece, instrument)
+    cache.put_arrangement(key, positions)
+    return positions, False
+
+
+def cached_neck_arrangement_from_midi(
+    midi_path: Path,
+    instrument: NeckInstrument,
+    cache: ArrangementCache,
+    fs: int = 20,
+    merging: ChordMerging | None = None,
+) -> list[NeckPosition]:
+    """Arranges a MIDI file, as neck_arrangement of MusicPiece.from_midi.
+    Once the file was arranged, the cache finds its music piece hash from the bytes of the file,
+    so a hit doesn't parse the MIDI file."""
+    file_key = midi_key(midi_path, fs, merging)
+    music_piece_hash = cache.get(file_key)
+    if music_piece_hash is not None:
+        positions = cache.get_arrangement(arrangement_key(music_piece_hash, instrument))
+        if positions is not None:
+            return positions
+    music_piece = MusicPiece.from_midi(midi_path, fs=fs, merging=merging)
+    cache.put(file_key, piece_hash(music_piece))
+    return cached_neck_arrangement(music_piece, instrument, cache)
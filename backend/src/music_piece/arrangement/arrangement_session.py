@@ -0,0 +1,252 @@
+"""
+This module provides an arrangement session, to re-arrange a music piece after small edits.
+The session keeps the candidate positions of each timed chord and the dynamic programming
+tables of the arrangement, so an edit only recomputes the layers it touches
+instead of rebuilding the whole position graph.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.held_notes import held_transition_costs, held_transitions
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.num2note import num2note
+
+FloatArray = npt.NDArray[np.float64]
+IndexArray = npt.NDArray[np.intp]
+
+
+class _Layer:
+    """The candidates of one timed chord and their dynamic programming tables."""
+
+    __slots__ = (
+        "back_pointers",
+        "backward",
+        "candidates",
+        "costs",
+        "forward",
+        "incoming",
+        "next_pointers",
+        "timed_chord",
+    )
+
+    def __init__(
+        self, timed_chord: TimedChord, candidates: list[NeckPosition], costs: FloatArray
+    ) -> None:
+        """Initializes a layer whose tables are not computed yet."""
+        self.timed_chord = timed_chord
+        self.candidates = candidates
+        self.costs = costs
+        # transition costs from each candidate of the previous layer, None when outdated
+        self.incoming: FloatArray | None = None
+        # best path from the first layer to each candidate, and best candidate of the previous layer
+        self.forward: FloatArray = costs
+        self.back_pointers: IndexArray = np.zeros(0, dtype=np.intp)
+        # best path from each candidate to the last layer (without the candidate's own cost)
+        # and best candidate of the next layer
+        self.backward: FloatArray = np.zeros(len(candidates))
+        self.next_pointers: IndexArray = np.zeros(0, dtype=np.intp)
+
+
+class ArrangementSession:
+    """
+    Class holding the arrangement of a music piece for a neck instrument, kept up to date
+    while timed chords are inserted, deleted or replaced.
+
+    Each timed chord is a layer of valid candidate positions. The session keeps:
+        - the position costs of each layer, and the transition costs from the previous layer
+        - forward tables: the cost of the best path from the first layer to each candidate
+        - backward tables: the cost of the best path from each candidate to the last layer
+
+    An edit at layer k outdates the forward tables from k and the backward tables up to k.
+    They are repaired when the arrangement is requested, over the layers between the edits
+    only, so a local edit costs O(affected layers) instead of O(piece).
+    """
+
+    def __init__(self, music_piece: MusicPiece, instrument: NeckInstrument) -> None:
+        """Initializes the session with the timed chords of a music piece.
+
+        Raises:
+            ValueError: if a timed chord has no valid position on the instrument.
+        """
+        self.instrument = instrument
+        self.__layers: list[_Layer] = []
+        self.__forward_valid = 0  # the forward tables of the layers before this index are valid
+        self.__backward_valid = 0  # the backward tables of the layers from this index are valid
+
+        errors = []
+        for timed_chord in music_piece.timed_chords:
+            try:
+                self.__layers.append(self.__layer(timed_chord))
+            except ValueError as error:
+                errors.append(str(error))
+        if errors:
+            raise ValueError("Errors found during neck arrangement:\n" + "\n\t".join(errors))
+
+        self.__backward_valid = len(self.__layers)
+        while self.__backward_valid > 0:
+            self.__backward_valid -= 1
+            self.__solve_backward(self.__backward_valid)
+
+    def __len__(self) -> int:
+        """Returns the number of timed chords of the session."""
+        return len(self.__layers)
+
+    @property
+    def timed_chords(self) -> list[TimedChord]:
+        """Returns the timed chords of the session, edits included."""
+        return [layer.timed_chord for layer in self.__layers]
+
+    def insert(self, index: int, timed_chord: TimedChord) -> None:
+        """Inserts a timed chord before the timed chord at index (at the end if index is
+        the number of timed chords).
+
+        Raises:
+            IndexError: if index is out of the range of the session.
+            ValueError: if the timed chord has no valid position on the instrument.
+        """
+        if not 0 <= index <= len(self.__layers):
+            msg = f"Index {index} is out of the range of the session."
+            raise IndexError(msg)
+        self.__layers.insert(index, self.__layer(timed_chord))
+        if index + 1 < len(self.__layers):
+            self.__layers[index + 1].incoming = None
+        self.__forward_valid = min(self.__forward_valid, index)
+        self.__backward_valid = max(self.__backward_valid, index) + 1
+
+    def delete(self, index: int) -> TimedChord:
+        """Deletes the timed chord at index and returns it.
+
+        Raises:
+            IndexError: if index is out of the range of the session.
+        """
+        if not 0 <= index < len(self.__layers):
+            msg = f"Index {index} is out of the range of the session."
+            raise IndexError(msg)
+        layer = self.__layers.pop(index)
+        if index < len(self.__layers):
+            self.__layers[index].incoming = None
+        self.__forward_valid = min(self.__forward_valid, index)
+        self.__backward_valid = max(self.__backward_valid - 1, index)
+        return layer.timed_chord
+
+    def replace(self, index: int, timed_chord: TimedChord) -> TimedChord:
+        """Replaces the timed chord at index and returns the previous one.
+
+        Raises:
+            IndexError: if index is out of the range of the session.
+            ValueError: if the timed chord has no valid position on the instrument.
+        """
+        if not 0 <= index < len(self.__layers):
+            msg = f"Index {index} is out of the range of the session."
+            raise IndexError(msg)
+        previous = self.__layers[index].timed_chord
+        self.__layers[index] = self.__layer(timed_chord)
+        if index + 1 < len(self.__layers):
+            self.__layers[index + 1].incoming = None
+        self.__forward_valid = min(self.__forward_valid, index)
+        self.__backward_valid = max(self.__backward_valid, index + 1)
+        return previous
+
+    def arrangement(self) -> tuple[list[NeckPosition], float]:
+        """Returns the best position of each timed chord and the total cost of the arrangement.
+        The outdated tables are repaired first: the forward tables are extended until they meet
+        the backward ones, and the best path goes through that meeting layer.
+
+        Raises:
+            ValueError: if the session has no timed chords.
+        """
+        if not self.__layers:
+            msg = "No valid positions found for the entire piece."
+            raise ValueError(msg)
+        last = len(self.__layers) - 1
+        if self.__backward_valid > last:
+            self.__solve_backward(last)
+            self.__backward_valid = last
+        while self.__forward_valid <= self.__backward_valid:
+            self.__solve_forward(self.__forward_valid)
+            self.__forward_valid += 1
+        pivot = self.__backward_valid
+
+        totals = self.__layers[pivot].forward + self.__layers[pivot].backward
+        best = int(np.argmin(totals))
+        indexes = [best]
+        for index in range(pivot, 0, -1):
+            indexes.append(int(self.__layers[index].back_pointers[indexes[-1]]))
+        indexes.reverse()
+        for index in range(pivot, last):
+            indexes.append(int(self.__layers[index].next_pointers[indexes[-1]]))
+        positions = [
+            layer.candidates[index] for layer, index in zip(self.__layers, indexes, strict=True)
+        ]
+        return positions, float(totals[best])
+
+    def __layer(self, timed_chord: TimedChord) -> _Layer:
+        """Returns the layer of the valid positions of a timed chord.
+
+        Raises:
+            ValueError: if the timed chord has no valid position on the instrument.
+        """
+        notes = list(timed_chord.chord)
+        candidates = self.instrument.valid_positions(self.instrument.possible_positions(notes))
+        if not candidates:
+            notes_str = ", ".join([num2note(note) for note in notes])
+            msg = f"No valid positions found for notes: {notes_str} for {self.instrument}"
+            raise ValueError(msg)
+        costs = np.array(
+            [self.instrument.position_cost(position, check_valid=False) for position in candidates]
+        )
+        return _Layer(timed_chord, candidates, costs)
+
+    def __transitions(self, index: int) -> FloatArray:
+        """Returns the transition costs from each candidate of the previous layer
+        to each candidate of the layer at index, computed once per pair of layers.
+        The transitions not allowed by the sustained notes of the layer cost infinity
+        (see held_notes)."""
+        layer = self.__layers[index]
+        if layer.incoming is None:
+            previous_candidates = self.__layers[index - 1].candidates
+            layer.incoming = held_transition_costs(
+                np.array(
+                    [
+                        [
+                            self.instrument.transition_cost(previous, position)
+                            for position in layer.candidates
+                        ]
+                        for previous in previous_candidates
+                    ]
+                ),
+                held_transitions(
+                    previous_candidates,
+                    layer.candidates,
+                    layer.timed_chord.sustained,
+                    self.instrument,
+                ),
+            )
+        return layer.incoming
+
+    def __solve_forward(self, index: int) -> None:
+        """Computes the forward table of a layer from the one of the previous layer."""
+        layer = self.__layers[index]
+        if index == 0:
+            layer.forward = layer.costs
+            return
+        totals = self.__layers[index - 1].forward[:, None] + self.__transitions(index)
+        pointers = np.argmin(totals, axis=0)  # first minimum, as layered_shortest_path
+        layer.forward = totals[pointers, np.arange(len(pointers))] + layer.costs
+        layer.back_pointers = pointers
+
+    def __solve_backward(self, index: int) -> None:
+        """Computes the backward table of a layer from the one of the next layer."""
+        layer = self.__layers[index]
+        if index == len(self.__layers) - 1:
+            layer.backward = np.zeros(len(layer.candidates))
+            return
+        next_layer = self.__layers[index + 1]
+        totals = self.__transitions(index + 1) + (next_layer.backward + next_layer.costs)
+        pointers = np.argmin(totals, axis=1)
+        layer.backward = totals[np.arange(len(pointers)), pointers]
+        layer.next_pointers = pointers
@@ -2,55 +2,230 @@
 This module provides the bulding of a position graph for arranging musical pieces.
 """
 
+import numpy as np
+
 from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.instruments.shape_library import shape_library
+from backend.src.music_piece.arrangement.csr_graph import CSRGraph, CSRGraphBuilder
 from backend.src.music_piece.arrangement.graph import Graph
+from backend.src.music_piece.arrangement.held_notes import held_transitions
 from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
 from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.metrics import CANDIDATES_PER_CHORD, GRAPH_EDGES, METRICS
 from backend.src.utils.num2note import num2note
 
 
-def build_position_graph(music_piece: MusicPiece, instrument: NeckInstrument) -> tuple[Graph, str]:
-    """Builds a graph of positions for the given music piece and instrument."""
-    graph = Graph()
-    position_map: list[list[int]] = []
+def build_position_graph(
+    music_piece: MusicPiece, instrument: NeckInstrument
+) -> tuple[Graph, str, list[int]]:
+    """Builds a graph of positions for the given music piece and instrument.
+
+    Returns:
+        tuple[Graph, str, list[int]]: The graph, the errors, and the placement code
+            of each position node (the node ids are indexes of this list,
+            the start and terminal nodes are -1 and -2).
+    """
+    with METRICS.time_stage("graph_build"):
+        graph = Graph()
+        errors, node_codes = _fill_position_graph(graph, music_piece, instrument)
+    if METRICS.enabled:
+        GRAPH_EDGES.observe(sum(len(node.edges) for node in graph.nodes.values()))
+    return graph, errors, node_codes
+
+
+def build_position_csr_graph(
+    music_piece: MusicPiece, instrument: NeckInstrument
+) -> tuple[CSRGraph, str, list[int]]:
+    """Builds the same graph of positions as build_position_graph, in compressed sparse row form."""
+    with METRICS.time_stage("graph_build"):
+        builder = CSRGraphBuilder()
+        errors, node_codes = _fill_position_graph(builder, music_piece, instrument)
+        graph = builder.build()
+    if METRICS.enabled:
+        GRAPH_EDGES.observe(graph.number_of_edges)
+    return graph, errors, node_codes
+
+
+class _ChordCandidates:
+    """The candidates of the distinct chords of a piece, and the transition costs between them.
+    A piece repeats its chords: the candidates of each distinct chord, and the transition costs
+    between two distinct chords, are computed once (the chords are interned by their pitch tuple).
+    """
+
+    def __init__(self, instrument: NeckInstrument) -> None:
+        """Initializes empty caches."""
+        self.instrument = instrument
+        # the transpositions of a chord share their hand shapes, translated along the neck
+        self.__shapes = shape_library(instrument)
+        self.__candidates: dict[tuple[int, ...], tuple[list[int], list[float]]] = {}
+        self.__transitions: dict[tuple[tuple[int, ...], tuple[int, ...]], list[list[float]]] = {}
+        self.__held: dict[
+            tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]], list[tuple[int, int, float]]
+        ] = {}
+
+    def candidates(self, chord: tuple[int, ...]) -> tuple[list[int], list[float]]:
+        """Returns the placement codes of the valid positions of a chord,
+        and their position costs."""
+        if chord not in self.__candidates:
+            candidates = self.__shapes.candidates(chord)
+            self.__candidates[chord] = (
+                [position.to_placement_code() for position, _ in candidates],
+                [cost for _, cost in candidates],
+            )
+        return self.__candidates[chord]
+
+    def transitions(
+        self, previous_chord: tuple[int, ...], chord: tuple[int, ...]
+    ) -> list[list[float]]:
+        """Returns the transition costs between the candidates of two chords."""
+        chord_pair = (previous_chord, chord)
+        if chord_pair not in self.__transitions:
+            self.__transitions[chord_pair] = [
+                [
+                    self.instrument.transition_cost(
+                        NeckPosition.from_placement_code(prev_code),
+                        NeckPosition.from_placement_code(curr_code),
+                    )
+                    for curr_code in self.candidates(chord)[0]
+                ]
+                for prev_code in self.candidates(previous_chord)[0]
+            ]
+        return self.__transitions[chord_pair]
+
+    def held_transitions(
+        self, previous_chord: tuple[int, ...], chord: tuple[int, ...], sustained: tuple[int, ...]
+    ) -> list[tuple[int, int, float]]:
+        """Returns the transitions between the candidates of two chords allowed by the sustained
+        notes (see held_notes), as (previous index, index, transition cost).
+        Only the allowed transitions are costed."""
+        held_key = (previous_chord, chord, sustained)
+        if held_key not in self.__held:
+            previous_positions = [
+                NeckPosition.from_placement_code(code)
+                for code in self.candidates(previous_chord)[0]
+            ]
+            positions = [
+                NeckPosition.from_placement_code(code) for code in self.candidates(chord)[0]
+            ]
+            allowed = held_transitions(previous_positions, positions, sustained, self.instrument)
+            self.__held[held_key] = [
+                (
+                    prev_index,
+                    curr_index,
+                    self.instrument.transition_cost(
+                        previous_positions[prev_index], positions[curr_index]
+                    ),
+                )
+                for prev_index, curr_index in np.argwhere(allowed).tolist()
+            ]
+        return self.__held[held_key]
+
+
+def _fill_position_graph(
+    graph: Graph | CSRGraphBuilder, music_piece: MusicPiece, instrument: NeckInstrument
+) -> tuple[str, list[int]]:
+    """Fills the graph, one layer of positions per timed chord, and returns the errors
+    and the placement code of each node. The nodes of a layer are numbered after
+    the nodes of the previous layers, so the ids don't depend on the length of the piece."""
+    chord_candidates = _ChordCandidates(instrument)
+    node_codes: list[int] = []
     errors: list[str] = []
+    first_ids: list[int] = []
+    layer_ids: dict[int, int] = {}  # the node id of each candidate kept in the last layer
+    previous_chord: tuple[int, ...] = ()
 
     for time_index, timed_chord in enumerate(music_piece.timed_chords):
-        position_map.append([])
-        notes = list(timed_chord.chord)
-        valid_positions = [
-            pos for pos in instrument.possible_positions(notes) if instrument.is_valid_position(pos)
-        ]
+        chord = timed_chord.chord
+        placement_codes, _ = chord_candidates.candidates(chord)
+        if METRICS.enabled:
+            CANDIDATES_PER_CHORD.observe(len(placement_codes), "valid")
 
-        if len(valid_positions) == 0:
-            notes_str = ", ".join([num2note(note) for note in notes])
+        if len(placement_codes) == 0:
+            notes_str = ", ".join([num2note(note) for note in chord])
             errors.append(f"No valid positions found for notes: {notes_str} for {instrument}")
-            continue
-
-        for pos in valid_positions:
-            position_id = pos.to_placement_code() * 1000 + time_index  # unique ID
-            graph.add_node(position_id, cost=instrument.position_cost(pos, check_valid=False))
-            position_map[time_index].append(position_id)
-
-        if time_index > 0:
-            for prev_id in position_map[time_index - 1]:
-                for curr_id in position_map[time_index]:
-                    transition_cost = instrument.transition_cost(
-                        NeckPosition.from_placement_code(prev_id // 1000),
-                        NeckPosition.from_placement_code(curr_id // 1000),
-                    )
-                    graph.add_edge(prev_id, curr_id, edge_cost=transition_cost)
+            layer_ids = {}
+        else:
+            with METRICS.time_stage("costing"):
+                layer_ids = _add_layer(
+                    graph,
+                    chord_candidates,
+                    node_codes,
+                    time_index + 1,
+                    (previous_chord, layer_ids),
+                    timed_chord,
+                )
+        if time_index == 0:
+            first_ids = list(layer_ids.values())
+        previous_chord = chord
 
     # add a start node that connects to all first positions with 0 cost
     # add a terminal node that all last positions connect to with 0 cost
     start_node_id = -1
     terminal_node_id = -2
-    graph.add_node(start_node_id, cost=0.0)
-    graph.add_node(terminal_node_id, cost=0.0)
+    graph.add_node(start_node_id, cost=0.0, layer=0)
+    graph.add_node(terminal_node_id, cost=0.0, layer=len(music_piece.timed_chords) + 1)
 
-    for first_id in position_map[0]:
+    for first_id in first_ids:
         graph.add_edge(start_node_id, first_id, edge_cost=0.0)
-    for last_id in position_map[-1]:
+    for last_id in layer_ids.values():
         graph.add_edge(last_id, terminal_node_id, edge_cost=0.0)
 
-    return graph, "\n".join(errors)
+    return "\n".join(errors), node_codes
+
+
+def _add_layer(
+    graph: Graph | CSRGraphBuilder,
+    chord_candidates: _ChordCandidates,
+    node_codes: list[int],
+    layer: int,
+    previous_layer: tuple[tuple[int, ...], dict[int, int]],
+    timed_chord: TimedChord,
+) -> dict[int, int]:
+    """Adds the nodes of a timed chord, numbered from the number of nodes of the graph,
+    and the edges from the previous layer (its chord, and the node ids of its kept candidates).
+    Returns the node id of each candidate kept in the layer."""
+    previous_chord, previous_ids = previous_layer
+    placement_codes, position_costs = chord_candidates.candidates(timed_chord.chord)
+    indices, edges = _layer_edges(chord_candidates, previous_chord, list(previous_ids), timed_chord)
+    layer_ids: dict[int, int] = {}
+    for index in indices:
+        layer_ids[index] = len(node_codes)
+        graph.add_node(len(node_codes), cost=position_costs[index], layer=layer)
+        node_codes.append(placement_codes[index])
+    for prev_index, curr_index, transition_cost in edges:
+        graph.add_edge(previous_ids[prev_index], layer_ids[curr_index], edge_cost=transition_cost)
+    return layer_ids
+
+
+def _layer_edges(
+    chord_candidates: _ChordCandidates,
+    previous_chord: tuple[int, ...],
+    previous_indices: list[int],
+    timed_chord: TimedChord,
+) -> tuple[list[int], list[tuple[int, int, float]]]:
+    """Returns the indexes of the candidates kept in the layer of a timed chord, and the edges
+    from the candidates kept in the previous layer, as (previous index, index, transition cost).
+    With sustained notes, only the transitions they allow are edges (see held_notes),
+    and the positions reached by none of them are left out of the layer."""
+    chord = timed_chord.chord
+    if previous_indices and timed_chord.sustained:
+        kept_previous = set(previous_indices)
+        edges = [
+            edge
+            for edge in chord_candidates.held_transitions(
+                previous_chord, chord, timed_chord.sustained
+            )
+            if edge[0] in kept_previous
+        ]
+        return sorted({curr_index for _, curr_index, _ in edges}), edges
+    indices = list(range(len(chord_candidates.candidates(chord)[0])))
+    edges = []
+    if previous_indices:
+        transitions = chord_candidates.transitions(previous_chord, chord)
+        edges = [
+            (prev_index, curr_index, transitions[prev_index][curr_index])
+            for prev_index in previous_indices
+            for curr_index in indices
+        ]
+    return indices, edges
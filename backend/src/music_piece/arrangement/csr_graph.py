@@ -0,0 +1,130 @@
+"""
+This module provides a compact graph backend for arranging musical pieces,
+in compressed sparse row (CSR) form backed by NumPy arrays:
+    - node_costs[i]: the cost of node i
+    - row_offsets[i]:row_offsets[i + 1]: the range of the edges leaving node i
+    - col_indices[e], edge_costs[e]: the node reached by edge e and its cost
+An edge takes 8 bytes (int32 target, float32 cost) instead of an Edge object,
+so edge costs are rounded to float32.
+It supports the same node and edge costs as graph.Graph.
+"""
+
+from array import array
+
+import numpy as np
+import numpy.typing as npt
+
+
+class CSRGraph:
+    """Immutable graph in compressed sparse row form, see CSRGraphBuilder to create one.
+    Nodes are identified by their index, node_ids maps them back to the ids given to the builder
+    (a list, as position ids can exceed 64 bits).
+    """
+
+    def __init__(
+        self,
+        node_ids: list[int],
+        node_costs: npt.NDArray[np.float64],
+        layers: npt.NDArray[np.int32],
+        row_offsets: npt.NDArray[np.int64],
+        col_indices: npt.NDArray[np.int32],
+        edge_costs: npt.NDArray[np.float32],
+    ) -> None:
+        """Initializes a graph from its arrays."""
+        self.node_ids = node_ids
+        self.node_costs = node_costs
+        self.layers = layers  # -1 for the nodes without layer
+        self.row_offsets = row_offsets
+        self.col_indices = col_indices
+        self.edge_costs = edge_costs
+        self.index_of = {node_id: index for index, node_id in enumerate(node_ids)}
+
+    def __repr__(self) -> str:
+        """Returns a string representation of the graph."""
+        return f"CSRGraph(nodes={self.number_of_nodes}, edges={self.number_of_edges})"
+
+    @property
+    def number_of_nodes(self) -> int:
+        """Returns the number of nodes."""
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self) -> int:
+        """Returns the number of edges."""
+        return len(self.col_indices)
+
+    def edges(self, node_id: int) -> list[tuple[int, float]]:
+        """Returns the edges leaving a node, as (reached node id, edge cost)."""
+        index = self.index_of[node_id]
+        start, end = self.row_offsets[index], self.row_offsets[index + 1]
+        return [
+            (self.node_ids[target], cost)
+            for target, cost in zip(
+                self.col_indices[start:end].tolist(),
+                self.edge_costs[start:end].tolist(),
+                strict=True,
+            )
+        ]
+
+
+class CSRGraphBuilder:
+    """Collects the nodes and edges of a CSRGraph, in any order.
+    It has the add_node and add_edge methods of graph.Graph, so the same code can fill both,
+    and add_edges to add the edges between two layers at once."""
+
+    def __init__(self) -> None:
+        """Initializes an empty builder."""
+        self.index_of: dict[int, int] = {}
+        self.__node_ids: list[int] = []
+        self.__node_costs = array("d")
+        self.__layers = array("i")
+        self.__sources = array("i")
+        self.__targets = array("i")
+        self.__edge_costs = array("f")
+
+    def add_node(self, node_id: int, cost: float = 0.0, layer: int | None = None) -> int:
+        """Adds a node and returns its index. Adding an existing id replaces its cost and layer."""
+        if node_id in self.index_of:
+            index = self.index_of[node_id]
+            self.__node_costs[index] = cost
+            self.__layers[index] = -1 if layer is None else layer
+            return index
+        index = len(self.__node_ids)
+        self.index_of[node_id] = index
+        self.__node_ids.append(node_id)
+        self.__node_costs.append(cost)
+        self.__layers.append(-1 if layer is None else layer)
+        return index
+
+    def add_edge(self, from_id: int, to_id: int, edge_cost: float = 0.0) -> None:
+        """Adds an edge between two nodes by their ids, ignored if a node doesn't exist."""
+        if from_id in self.index_of and to_id in self.index_of:
+            self.__sources.append(self.index_of[from_id])
+            self.__targets.append(self.index_of[to_id])
+            self.__edge_costs.append(edge_cost)
+
+    def add_edges(self, from_ids: list[int], to_ids: list[int], edge_costs: npt.ArrayLike) -> None:
+        """Adds an edge from each node of from_ids to each node of to_ids,
+        edge_costs[i][j] being the cost from from_ids[i] to to_ids[j]."""
+        costs = np.asarray(edge_costs, dtype=np.float32).reshape(len(from_ids), len(to_ids))
+        sources = [self.index_of[node_id] for node_id in from_ids]
+        targets = [self.index_of[node_id] for node_id in to_ids]
+        self.__sources.frombytes(np.repeat(sources, len(targets)).astype(np.int32).tobytes())
+        self.__targets.frombytes(np.tile(targets, len(sources)).astype(np.int32).tobytes())
+        self.__edge_costs.frombytes(costs.tobytes())
+
+    def build(self) -> CSRGraph:
+        """Returns the graph, the edges of each node keep the order in which they were added."""
+        sources = np.frombuffer(self.__sources, dtype=np.int32)
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=len(self.__node_ids))
+        row_offsets = np.zeros(len(self.__node_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=row_offsets[1:])
+        return CSRGraph(
+            node_ids=list(self.__node_ids),
+            node_costs=np.array(self.__node_costs, dtype=np.float64),
+            layers=np.array(self.__layers, dtype=np.int32),
+            row_offsets=row_offsets,
+            col_indices=np.frombuffer(self.__targets, dtype=np.int32)[order],
+            edge_costs=np.frombuffer(self.__edge_costs, dtype=np.float32)[order],
+        )
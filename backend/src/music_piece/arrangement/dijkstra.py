@@ -1,25 +1,45 @@
 """
 Dijkstra's algorithm for finding the shortest path in a graph with node and edge costs.
+It can stop at a target node, and be directed towards it with an A* heuristic.
 """
 
 import heapq
+from collections.abc import Iterator
 
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.utils.metrics import METRICS, SEARCH_OPERATIONS
+
+from .csr_graph import CSRGraph
 from .graph import Graph
 
 
 class DijkstraResult:
     """
-    Holds the results of Dijkstra's algorithm, including distances and previous nodes.
+    Holds the results of Dijkstra's algorithm, including distances and previous nodes,
+    and the work done: the number of nodes expanded and of heap pushes.
     """
 
-    def __init__(self, distances: dict[int, float], previous: dict[int, int | None]) -> None:
+    def __init__(
+        self,
+        distances: dict[int, float],
+        previous: dict[int, int | None],
+        nodes_expanded: int = 0,
+        heap_pushes: int = 0,
+    ) -> None:
         """Initializes the DijkstraResult with distances and previous nodes."""
         self.distances = distances
         self.previous = previous
+        self.nodes_expanded = nodes_expanded
+        self.heap_pushes = heap_pushes
 
     def __repr__(self) -> str:
         """Returns a string representation of the DijkstraResult."""
-        return f"DijkstraResult(distances={self.distances}, previous={self.previous})"
+        return (
+            f"DijkstraResult(distances={self.distances}, previous={self.previous}, "
+            f"nodes_expanded={self.nodes_expanded}, heap_pushes={self.heap_pushes})"
+        )
 
     def get_path(self, target_id: int | None) -> list[int]:
         """Reconstructs the shortest path to the target node."""
@@ -31,16 +51,76 @@ class DijkstraResult:
         return path[::-1]
 
 
-def dijkstra(graph: Graph, start_id: int) -> DijkstraResult:
+def dijkstra(
+    graph: Graph,
+    start_id: int,
+    target_id: int | None = None,
+    heuristic: dict[int, float] | None = None,
+) -> DijkstraResult:
     """Implements Dijkstra's algorithm to find the shortest paths
-    from the start node to all other nodes in the graph."""
+    from the start node to all other nodes in the graph.
+
+    Args:
+        graph (Graph): The graph, with node and edge costs.
+        start_id (int): The start node.
+        target_id (int | None): If given, the search stops once the target node is expanded,
+            the distances of the other nodes are then upper bounds.
+        heuristic (dict[int, float] | None): If given, an A* search: a lower bound of the cost
+            from each node to the target (see layered_heuristic).
+
+    Stopping at the target gives its shortest distance when the costs are non-negative,
+    or with a consistent heuristic (as layered_heuristic), whatever the signs of the costs.
+    """
+    with METRICS.time_stage("search"):
+        result = _dijkstra(graph, start_id, target_id, heuristic)
+    _record_search(result)
+    return result
+
+
+def csr_dijkstra(
+    graph: CSRGraph,
+    start_id: int,
+    target_id: int | None = None,
+    heuristic: npt.NDArray[np.float64] | None = None,
+) -> DijkstraResult:
+    """Same as dijkstra, on a graph in compressed sparse row form.
+    The heuristic is indexed by node index (see csr_layered_heuristic)."""
+    with METRICS.time_stage("search"):
+        result = _csr_dijkstra(graph, start_id, target_id, heuristic)
+    _record_search(result)
+    return result
+
+
+def _record_search(result: DijkstraResult) -> None:
+    """Exports the counters of a search when metrics are enabled."""
+    if METRICS.enabled:
+        SEARCH_OPERATIONS.inc("node_expanded", amount=result.nodes_expanded)
+        SEARCH_OPERATIONS.inc("heap_push", amount=result.heap_pushes)
+
+
+def _dijkstra(
+    graph: Graph, start_id: int, target_id: int | None, heuristic: dict[int, float] | None
+) -> DijkstraResult:
+    """Runs Dijkstra's algorithm from the start node.
+    The queue is ordered by distance plus heuristic, and holds stale entries of the nodes whose
+    distance improved after they were pushed: these are skipped when popped."""
     distances: dict[int, float] = {node_id: float("inf") for node_id in graph.nodes}
     previous: dict[int, int | None] = dict.fromkeys(graph.nodes)
     distances[start_id] = graph.nodes[start_id].cost
-    queue: list[tuple[float, int]] = [(distances[start_id], start_id)]
+    estimates = heuristic if heuristic is not None else dict.fromkeys(graph.nodes, 0.0)
+    queue: list[tuple[float, float, int]] = [
+        (distances[start_id] + estimates[start_id], distances[start_id], start_id)
+    ]
+    nodes_expanded = 0
+    heap_pushes = 1
 
     while queue:
-        current_dist, current_id = heapq.heappop(queue)
+        _, current_dist, current_id = heapq.heappop(queue)
+        if current_dist > distances[current_id]:
+            continue  # stale entry, the node was pushed again with a shorter distance
+        nodes_expanded += 1
+        if current_id == target_id:
+            break
         current_node = graph.nodes[current_id]
         for edge in current_node.edges:
             neighbor_id = edge.to_node.id
@@ -48,5 +128,139 @@ def dijkstra(graph: Graph, start_id: int) -> DijkstraResult:
             if new_dist < distances[neighbor_id]:
                 distances[neighbor_id] = new_dist
                 previous[neighbor_id] = current_id
-                heapq.heappush(queue, (new_dist, neighbor_id))
-    return DijkstraResult(distances, previous)
+                heapq.heappush(queue, (new_dist + estimates[neighbor_id], new_dist, neighbor_id))
+                heap_pushes += 1
+    return DijkstraResult(distances, previous, nodes_expanded, heap_pushes)
+
+
+def _csr_dijkstra(
+    graph: CSRGraph,
+    start_id: int,
+    target_id: int | None,
+    heuristic: npt.NDArray[np.float64] | None,
+) -> DijkstraResult:
+    """Runs Dijkstra's algorithm from the start node on the arrays of the graph.
+    The edges of an expanded node are relaxed at once, then the improved nodes are pushed."""
+    row_offsets = graph.row_offsets.tolist()
+    distances = np.full(graph.number_of_nodes, np.inf)
+    previous = np.full(graph.number_of_nodes, -1, dtype=np.int64)
+    start, target, estimates = _csr_endpoints(graph, start_id, target_id, heuristic)
+    distances[start] = graph.node_costs[start]
+    queue: list[tuple[float, float, int]] = [
+        (float(distances[start]) + estimates[start], float(distances[start]), start)
+    ]
+    nodes_expanded = 0
+    heap_pushes = 1
+
+    while queue:
+        _, current_dist, current = heapq.heappop(queue)
+        if current_dist > distances[current]:
+            continue  # stale entry, the node was pushed again with a shorter distance
+        nodes_expanded += 1
+        if current == target:
+            break
+        # one by one, as a node can be reached by several edges
+        for neighbor, new_dist in _csr_improved_neighbors(
+            graph, row_offsets, current, current_dist, distances
+        ):
+            if new_dist < distances[neighbor]:
+                distances[neighbor] = new_dist
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_dist + estimates[neighbor], new_dist, neighbor))
+                heap_pushes += 1
+
+    node_ids = graph.node_ids
+    return DijkstraResult(
+        dict(zip(node_ids, distances.tolist(), strict=True)),
+        {
+            node_id: node_ids[index] if index >= 0 else None
+            for node_id, index in zip(node_ids, previous.tolist(), strict=True)
+        },
+        nodes_expanded,
+        heap_pushes,
+    )
+
+
+def _csr_endpoints(
+    graph: CSRGraph,
+    start_id: int,
+    target_id: int | None,
+    heuristic: npt.NDArray[np.float64] | None,
+) -> tuple[int, int, list[float]]:
+    """Returns the index of the start node, the index of the target node (-1 without target
+    or if it is not in the graph) and the heuristic of each node index (0 without heuristic)."""
+    estimates = heuristic.tolist() if heuristic is not None else [0.0] * graph.number_of_nodes
+    target = graph.index_of.get(target_id, -1) if target_id is not None else -1
+    return graph.index_of[start_id], target, estimates
+
+
+def _csr_improved_neighbors(
+    graph: CSRGraph,
+    row_offsets: list[int],
+    current: int,
+    current_dist: float,
+    distances: npt.NDArray[np.float64],
+) -> Iterator[tuple[int, float]]:
+    """Relaxes the edges of a node at once, returns the neighbors whose distance improves
+    through it, with their new distance."""
+    first, last = row_offsets[current], row_offsets[current + 1]
+    neighbors = graph.col_indices[first:last]
+    new_dists = current_dist + graph.edge_costs[first:last] + graph.node_costs[neighbors]
+    improved = new_dists < distances[neighbors]
+    return zip(neighbors[improved].tolist(), new_dists[improved].tolist(), strict=True)
+
+
+def layered_heuristic(graph: Graph) -> dict[int, float]:
+    """Returns an A* heuristic for a layered graph, where every node has a layer
+    and every edge goes from a layer to the next one (as built by build_position_graph).
+
+    The heuristic of a node is the sum, over the following layers, of the cheapest step into
+    the layer: the minimum of edge cost plus node cost over the edges entering it.
+    It never overestimates the cost to the last layer, and it is consistent: the cost of an edge
+    plus the node cost minus the drop of the heuristic is never negative.
+
+    Raises:
+        ValueError: if a node has no layer.
+    """
+    layers: dict[int, int] = {}
+    for node_id, node in graph.nodes.items():
+        if node.layer is None:
+            msg = f"Node {node_id} has no layer, the graph is not layered."
+            raise ValueError(msg)
+        layers[node_id] = node.layer
+
+    cheapest_steps: dict[int, float] = {}
+    for node in graph.nodes.values():
+        for edge in node.edges:
+            layer = layers[edge.to_node.id]
+            step = edge.cost + edge.to_node.cost
+            if step < cheapest_steps.get(layer, float("inf")):
+                cheapest_steps[layer] = step
+
+    remaining: dict[int, float] = {}
+    total = 0.0
+    for layer in sorted(set(layers.values()), reverse=True):
+        remaining[layer] = total
+        total += cheapest_steps.get(layer, 0.0)
+    return {node_id: remaining[layer] for node_id, layer in layers.items()}
+
+
+def csr_layered_heuristic(graph: CSRGraph) -> npt.NDArray[np.float64]:
+    """Same as layered_heuristic, on a graph in compressed sparse row form,
+    indexed by node index.
+
+    Raises:
+        ValueError: if a node has no layer.
+    """
+    if (graph.layers < 0).any():
+        msg = "A node has no layer, the graph is not layered."
+        raise ValueError(msg)
+    number_of_layers = int(graph.layers.max(initial=-1)) + 1
+    steps = graph.edge_costs + graph.node_costs[graph.col_indices]
+    cheapest_steps = np.full(number_of_layers, np.inf)
+    np.minimum.at(cheapest_steps, graph.layers[graph.col_indices], steps)
+    cheapest_steps[np.isinf(cheapest_steps)] = 0.0
+    # remaining[layer] is the sum of the cheapest steps of the following layers
+    remaining = np.zeros(number_of_layers)
+    remaining[:-1] = np.cumsum(cheapest_steps[::-1])[::-1][1:]
+    return remaining[graph.layers]
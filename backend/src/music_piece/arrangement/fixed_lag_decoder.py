@@ -0,0 +1,191 @@
+"""
+This module provides an online arrangement of a stream of chords, with a fixed lag.
+
+The decoder keeps a window of the last chords: each new chord adds a layer of positions,
+whose costs are the cheapest paths reaching them (as in the shortest path of neck_arrangement).
+Once the window holds more than lag chords, the position of its first chord on the cheapest
+path is committed: it becomes the only position of its layer, and the window is costed
+again from it. The work of a chord depends on the lag and the number of positions,
+not on the length of the stream. The sustained notes of a chord keep their string and fret,
+as in the other solvers (see held_notes).
+"""
+
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.instruments.shape_library import shape_library
+from backend.src.music_piece.arrangement.held_notes import held_transition_costs, held_transitions
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.num2note import num2note
+
+MAX_CACHED_CHORDS = 1024  # chords and chord pairs kept in the caches of the decoder
+
+
+class Decision(NamedTuple):
+    """The committed position of a chord of the stream, with its position cost,
+    and the transition cost from the previous committed position."""
+
+    chord_index: int
+    position: NeckPosition
+    position_cost: float
+    transition_cost: float
+
+
+class _Layer:
+    """The positions of a chord of the window, and the costs of the paths reaching them.
+    Once committed, the paths only reach its committed position."""
+
+    __slots__ = ("back_pointers", "candidates", "chord", "index", "path_costs", "sustained")
+
+    def __init__(
+        self,
+        index: int,
+        chord: tuple[int, ...],
+        candidates: list[tuple[NeckPosition, float]],
+        sustained: tuple[int, ...] = (),
+    ) -> None:
+        """Initializes a layer of the window, its costs are computed by the decoder."""
+        self.index = index
+        self.chord = chord
+        self.candidates = candidates
+        self.sustained = sustained
+        self.path_costs = np.zeros(len(candidates))
+        self.back_pointers = np.zeros(len(candidates), dtype=np.int64)
+
+
+class FixedLagDecoder:
+    """Online arrangement of a stream of chords, committing each chord lag chords later."""
+
+    def __init__(self, instrument: NeckInstrument, lag: int = 2) -> None:
+        """Initializes a decoder at the start of a stream.
+
+        Args:
+            instrument (NeckInstrument): The instrument playing the stream.
+            lag (int): The number of later chords seen before committing a chord.
+        """
+        if lag < 0:
+            msg = "The lag must not be negative."
+            raise ValueError(msg)
+        self.instrument = instrument
+        self.lag = lag
+        self.__shapes = shape_library(instrument)
+        self.__candidates: OrderedDict[tuple[int, ...], list[tuple[NeckPosition, float]]]
+        self.__candidates = OrderedDict()
+        self.__transitions: OrderedDict[
+            tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]], npt.NDArray[np.float64]
+        ] = OrderedDict()
+        self.__window: deque[_Layer] = deque()
+        self.__committed: _Layer | None = None  # the last committed chord
+        self.__committed_position = 0  # and the index of its committed position
+        self.__next_index = 0
+
+    def __len__(self) -> int:
+        """Returns the number of chords waiting in the window."""
+        return len(self.__window)
+
+    def push(self, chord: tuple[int, ...], sustained: tuple[int, ...] = ()) -> list[Decision]:
+        """Adds the next chord of the stream, with its notes held from the previous chord,
+        and returns the decisions committed by it.
+
+        Raises:
+            ValueError: if the chord has no valid position, or a sustained note isn't in it
+                (the chord is then skipped).
+        """
+        index = self.__next_index
+        self.__next_index += 1
+        if not set(sustained) <= set(chord):
+            msg = "The sustained notes must be notes of the chord."
+            raise ValueError(msg)
+        candidates = self.__chord_candidates(chord)
+        if not candidates:
+            notes_str = ", ".join([num2note(note) for note in chord])
+            msg = f"No valid positions found for notes: {notes_str} for {self.instrument}"
+            raise ValueError(msg)
+        layer = _Layer(index, chord, candidates, tuple(sorted(sustained)))
+        previous = self.__window[-1] if self.__window else self.__committed
+        self.__cost_layer(previous, layer)
+        self.__window.append(layer)
+        decisions = []
+        while len(self.__window) > self.lag:
+            decisions.append(self.__commit())
+        return decisions
+
+    def flush(self) -> list[Decision]:
+        """Commits the chords of the window, at the end of the stream."""
+        return [self.__commit() for _ in range(len(self.__window))]
+
+    def __commit(self) -> Decision:
+        """Commits the first chord of the window to its position on the cheapest path,
+        and costs the rest of the window again from it."""
+        last = self.__window[-1]
+        best = int(np.argmin(last.path_costs))
+        for layer in reversed(list(self.__window)[1:]):
+            best = int(layer.back_pointers[best])
+        first = self.__window.popleft()
+        position, position_cost = first.candidates[best]
+        transition_cost = 0.0
+        if self.__committed is not None:
+            transition_cost = float(
+                self.__transition_costs(self.__committed, first)[self.__committed_position, best]
+            )
+
+        # the other positions of the committed chord can't be reached anymore
+        first.path_costs = np.full(len(first.candidates), np.inf)
+        first.path_costs[best] = 0.0
+        self.__committed, self.__committed_position = first, best
+        previous = first
+        for layer in self.__window:
+            self.__cost_layer(previous, layer)
+            previous = layer
+        return Decision(first.index, position, position_cost, transition_cost)
+
+    def __cost_layer(self, previous: _Layer | None, layer: _Layer) -> None:
+        """Computes the costs of the cheapest paths reaching the positions of a layer."""
+        position_costs = np.array([cost for _, cost in layer.candidates])
+        if previous is None:
+            layer.path_costs = position_costs
+            return
+        totals = previous.path_costs[:, None] + self.__transition_costs(previous, layer)
+        layer.back_pointers = np.argmin(totals, axis=0)
+        layer.path_costs = totals[layer.back_pointers, np.arange(len(layer.candidates))]
+        layer.path_costs += position_costs
+
+    def __chord_candidates(self, chord: tuple[int, ...]) -> list[tuple[NeckPosition, float]]:
+        """Returns the valid positions of a chord with their costs, cached."""
+        if chord in self.__candidates:
+            self.__candidates.move_to_end(chord)
+        else:
+            self.__candidates[chord] = self.__shapes.candidates(chord)
+            if len(self.__candidates) > MAX_CACHED_CHORDS:
+                self.__candidates.popitem(last=False)
+        return self.__candidates[chord]
+
+    def __transition_costs(self, previous: _Layer, layer: _Layer) -> npt.NDArray[np.float64]:
+        """Returns the matrix of the transition costs between the positions of two layers,
+        infinite for the transitions not allowed by the sustained notes of the layer,
+        cached by pair of chords and sustained notes."""
+        key = (previous.chord, layer.chord, layer.sustained)
+        if key in self.__transitions:
+            self.__transitions.move_to_end(key)
+        else:
+            previous_positions = [position for position, _ in previous.candidates]
+            positions = [position for position, _ in layer.candidates]
+            self.__transitions[key] = held_transition_costs(
+                np.array(
+                    [
+                        [
+                            self.instrument.transition_cost(position, next_position)
+                            for next_position in positions
+                        ]
+                        for position in previous_positions
+                    ]
+                ),
+                held_transitions(previous_positions, positions, layer.sustained, self.instrument),
+            )
+            if len(self.__transitions) > MAX_CACHED_CHORDS:
+                self.__transitions.popitem(last=False)
+        return self.__transitions[key]
@@ -20,17 +20,19 @@ class Edge:
 class Node:
     """Class representing a node in the arrangement graph.
     Each node corresponds to a specific musical position or state.
-    Node has a cost, and outgoing edges with their own costs."""
+    Node has a cost, and outgoing edges with their own costs.
+    In a layered graph, the node also knows its layer (e.g. the time index of its chord)."""
 
-    def __init__(self, node_id: int, cost: float = 0.0) -> None:
-        """Initializes a Node with a unique ID and an associated cost."""
+    def __init__(self, node_id: int, cost: float = 0.0, layer: int | None = None) -> None:
+        """Initializes a Node with a unique ID, an associated cost and an optional layer."""
         self.id = node_id
         self.cost = cost
+        self.layer = layer
         self.edges: list[Edge] = []
 
     def __repr__(self) -> str:
         """Returns a string representation of the node."""
-        return f"Node(id={self.id}, cost={self.cost}, edges={len(self.edges)})"
+        return f"Node(id={self.id}, cost={self.cost}, layer={self.layer}, edges={len(self.edges)})"
 
     def add_edge(self, to_node: "Node", edge_cost: float = 0.0) -> None:
         """Adds a directed edge to another node with a specified cost."""
@@ -48,9 +50,9 @@ class Graph:
         """Returns a string representation of the graph."""
         return f"Graph(nodes={list(self.nodes.keys())})"
 
-    def add_node(self, position_id: int, cost: float = 0.0) -> Node:
+    def add_node(self, position_id: int, cost: float = 0.0, layer: int | None = None) -> Node:
         """Adds a node to the graph and returns it."""
-        node = Node(position_id, cost)
+        node = Node(position_id, cost, layer)
         self.nodes[position_id] = node
         return node
 
@@ -0,0 +1,60 @@
+"""
+This module provides the rule of the sustained notes, shared by the arrangement solvers.
+
+The sustained notes of a timed chord (see TimedChord.sustained) are held from the previous
+chord: they keep their string and fret. From a position of the previous chord, only the
+positions placing its sustained notes on the same strings and frets can follow. If no position
+of the chord can, the hand is free to move from that position (the held notes are played again).
+The rule only depends on the two chords, so each solver applies it to its transition costs,
+and every position of the previous chord can still be followed.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.positions.neck_position import NeckPosition
+
+
+def held_places(
+    position: NeckPosition, sustained: tuple[int, ...], instrument: NeckInstrument
+) -> tuple[tuple[int, int], ...]:
+    """Returns the (string, fret) places of the sustained notes in a position, sorted."""
+    held_notes = set(sustained)
+    return tuple(
+        sorted(
+            (string, fret)
+            for string, fret in zip(position.strings, position.frets, strict=True)
+            if instrument.open_strings[string - 1] + fret in held_notes
+        )
+    )
+
+
+def held_transitions(
+    previous_positions: list[NeckPosition],
+    positions: list[NeckPosition],
+    sustained: tuple[int, ...],
+    instrument: NeckInstrument,
+) -> npt.NDArray[np.bool_]:
+    """Returns the transitions allowed by the sustained notes: the entry [i, j] is True
+    if the position j can follow the previous position i. Every transition is allowed
+    without sustained notes."""
+    allowed = np.ones((len(previous_positions), len(positions)), dtype=np.bool_)
+    if not sustained:
+        return allowed
+    groups: dict[tuple[tuple[int, int], ...], list[int]] = {}
+    for index, position in enumerate(positions):
+        groups.setdefault(held_places(position, sustained, instrument), []).append(index)
+    for previous_index, previous in enumerate(previous_positions):
+        followers = groups.get(held_places(previous, sustained, instrument))
+        if followers:
+            allowed[previous_index] = False
+            allowed[previous_index, followers] = True
+    return allowed
+
+
+def held_transition_costs(
+    transition_costs: npt.NDArray[np.float64], allowed: npt.NDArray[np.bool_]
+) -> npt.NDArray[np.float64]:
+    """Returns the transition costs with an infinite cost for the transitions not allowed."""
+    return np.where(allowed, transition_costs, np.inf)
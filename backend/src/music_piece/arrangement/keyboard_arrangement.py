@@ -0,0 +1,40 @@
+"""
+This module provides functionality for arranging musical pieces on keyboard instruments.
+The candidate fingerings of each chord form one layer of a layered shortest path problem.
+"""
+
+from backend.src.instruments.keyboard_instrument import KeyboardInstrument
+from backend.src.music_piece.arrangement.layered_solver import layered_shortest_path_batch
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.positions.position import Position
+from backend.src.utils.num2note import num2note
+
+
+def keyboard_arrangement(music_piece: MusicPiece, instrument: KeyboardInstrument) -> list[Position]:
+    """Arranges the music piece for the specified keyboard instrument.
+    Taking into account:
+        - position cost
+        - transition cost
+    Each layer of candidates is scored at once in slot form.
+    """
+    layers: list[list[Position]] = []
+    errors: list[str] = []
+    for timed_chord in music_piece.timed_chords:
+        candidates = instrument.possible_positions(list(timed_chord.chord))
+        if len(candidates) == 0:
+            notes_str = ", ".join([num2note(note) for note in timed_chord.chord])
+            errors.append(f"No valid positions found for notes: {notes_str} for {instrument}")
+        layers.append(candidates)
+
+    if len(layers) == 0:
+        msg = "No valid positions found for the entire piece."
+        raise ValueError(msg)
+    if errors:
+        raise ValueError("Errors found during keyboard arrangement:\n" + "\n\t".join(errors))
+
+    path_indexes, _ = layered_shortest_path_batch(
+        [instrument.positions_to_slots(candidates) for candidates in layers],
+        instrument.position_costs,
+        instrument.transition_costs,
+    )
+    return [candidates[index] for candidates, index in zip(layers, path_indexes, strict=True)]
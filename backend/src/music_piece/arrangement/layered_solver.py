@@ -0,0 +1,101 @@
+"""
+This module provides a layered shortest path solver for arranging musical pieces.
+Each layer holds the candidate positions of one timed chord,
+and every candidate of a layer can follow every candidate of the previous layer.
+"""
+
+import itertools
+from collections.abc import Callable
+from typing import TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+T = TypeVar("T")
+L = TypeVar("L")
+
+
+def layered_shortest_path(
+    layers: list[list[T]],
+    node_cost: Callable[[T], float],
+    transition_cost: Callable[[T, T], float],
+) -> tuple[list[T], float]:
+    """Finds the sequence of one candidate per layer of minimum total cost,
+    the sum of the node costs and of the transition costs between consecutive candidates.
+    Dynamic programming layer by layer: O(sum of |layer i| * |layer i+1|) transition costs.
+    Ties resolve to the first candidate of a layer.
+
+    Returns:
+        tuple[list[T], float]: the best candidate of each layer and the total cost
+
+    Raises:
+        ValueError: if there are no layers, or a layer has no candidates.
+    """
+    if not layers or any(len(layer) == 0 for layer in layers):
+        msg = "Every layer needs at least one candidate."
+        raise ValueError(msg)
+
+    costs = [node_cost(candidate) for candidate in layers[0]]
+    back_pointers: list[list[int]] = []
+    for previous_layer, layer in itertools.pairwise(layers):
+        new_costs = []
+        pointers = []
+        for candidate in layer:
+            best_index = 0
+            best_cost = float("inf")
+            for index, previous in enumerate(previous_layer):
+                cost = costs[index] + transition_cost(previous, candidate)
+                if cost < best_cost:
+                    best_index, best_cost = index, cost
+            new_costs.append(best_cost + node_cost(candidate))
+            pointers.append(best_index)
+        costs = new_costs
+        back_pointers.append(pointers)
+
+    best_last = min(range(len(costs)), key=costs.__getitem__)
+    path_indexes = [best_last]
+    for pointers in reversed(back_pointers):
+        path_indexes.append(pointers[path_indexes[-1]])
+    path_indexes.reverse()
+    return [layers[i][index] for i, index in enumerate(path_indexes)], costs[best_last]
+
+
+def layered_shortest_path_batch(
+    layers: list[L],
+    node_costs: Callable[[L], npt.NDArray[np.float64]],
+    transition_costs: Callable[[L, L], npt.NDArray[np.float64]],
+) -> tuple[list[int], float]:
+    """Same as layered_shortest_path, with costs scored a whole layer at a time.
+    node_costs returns the cost of each candidate of a layer, transition_costs the matrix
+    of the transition costs from each candidate of a layer to each candidate of the next one.
+
+    Returns:
+        tuple[list[int], float]: the index of the best candidate of each layer and the total cost
+
+    Raises:
+        ValueError: if there are no layers, or a layer has no candidates.
+    """
+    if not layers:
+        msg = "Every layer needs at least one candidate."
+        raise ValueError(msg)
+
+    costs = node_costs(layers[0])
+    back_pointers: list[npt.NDArray[np.intp]] = []
+    for previous_layer, layer in itertools.pairwise(layers):
+        layer_costs = node_costs(layer)
+        if len(costs) == 0 or len(layer_costs) == 0:
+            msg = "Every layer needs at least one candidate."
+            raise ValueError(msg)
+        totals = costs[:, None] + transition_costs(previous_layer, layer)
+        pointers = np.argmin(totals, axis=0)  # first minimum, as layered_shortest_path
+        costs = totals[pointers, np.arange(len(layer_costs))] + layer_costs
+        back_pointers.append(pointers)
+    if len(costs) == 0:
+        msg = "Every layer needs at least one candidate."
+        raise ValueError(msg)
+
+    path_indexes = [int(np.argmin(costs))]
+    for pointers in reversed(back_pointers):
+        path_indexes.append(int(pointers[path_indexes[-1]]))
+    path_indexes.reverse()
+    return path_indexes, float(costs[path_indexes[-1]])
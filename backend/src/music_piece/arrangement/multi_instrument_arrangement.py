@@ -0,0 +1,116 @@
+"""
+This module provides the arrangement of one music piece for several neck instruments at once.
+
+The piece is ingested once: its chords are interned by pitch tuple, and only the distinct chords
+and the index of the chord of each timed chord are sent to the worker processes,
+which solve one instrument each (a long-lived server passes its own pool, see
+get_instrument_comparison). The total costs of the arrangements are then compared,
+to find the easiest instrument to play the piece on.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import NamedTuple
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.music_piece.arrangement.neck_arrangement import arrangement_cost, neck_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.positions.neck_position import NeckPosition
+
+
+class InternedPiece(NamedTuple):
+    """A music piece with its chords interned: each distinct pitch tuple is stored once."""
+
+    title: str
+    chords: list[tuple[int, ...]]
+    chord_indices: list[int]
+    start_times: list[float]
+    durations: list[float]
+    sustained: list[tuple[int, ...]]
+
+    @classmethod
+    def from_music_piece(cls, music_piece: MusicPiece) -> "InternedPiece":
+        """Interns the chords of a music piece."""
+        chord_index: dict[tuple[int, ...], int] = {}
+        for timed_chord in music_piece.timed_chords:
+            chord_index.setdefault(timed_chord.chord, len(chord_index))
+        return cls(
+            title=music_piece.title,
+            chords=list(chord_index),
+            chord_indices=[chord_index[tc.chord] for tc in music_piece.timed_chords],
+            start_times=music_piece.start_times.tolist(),
+            durations=music_piece.durations.tolist(),
+            sustained=[tc.sustained for tc in music_piece.timed_chords],
+        )
+
+    def to_music_piece(self) -> MusicPiece:
+        """Returns the music piece of the interned chords."""
+        music_piece = MusicPiece(title=self.title)
+        for index, start_time, duration, sustained in zip(
+            self.chord_indices, self.start_times, self.durations, self.sustained, strict=True
+        ):
+            music_piece.add_timed_chord(
+                TimedChord(
+                    chord=self.chords[index],
+                    start_time=start_time,
+                    duration=duration,
+                    sustained=sustained,
+                )
+            )
+        return music_piece
+
+
+class InstrumentArrangement(NamedTuple):
+    """The arrangement of a piece for one instrument, or the reason why there is none."""
+
+    positions: list[NeckPosition]
+    total_cost: float
+    error: str | None = None
+
+
+def _arrange(piece: InternedPiece, instrument: NeckInstrument) -> InstrumentArrangement:
+    """Arranges an interned piece for an instrument (run in a worker process)."""
+    try:
+        positions = neck_arrangement(piece.to_music_piece(), instrument)
+    except ValueError as error:
+        return InstrumentArrangement(positions=[], total_cost=float("inf"), error=str(error))
+    return InstrumentArrangement(
+        positions=positions, total_cost=arrangement_cost(positions, instrument)
+    )
+
+
+def multi_instrument_arrangement(
+    music_piece: MusicPiece,
+    instruments: dict[str, NeckInstrument],
+    max_workers: int | None = None,
+    executor: Executor | None = None,
+) -> dict[str, InstrumentArrangement]:
+    """Arranges the music piece for each instrument, in parallel worker processes.
+
+    Args:
+        music_piece (MusicPiece): The music piece to arrange.
+        instruments (dict[str, NeckInstrument]): The instruments, by name.
+        max_workers (int | None): The number of worker processes, 1 to arrange in this process,
+            None for one per CPU (at most one per instrument).
+        executor (Executor | None): The pool of worker processes to use instead of creating
+            one for the call (max_workers is then only checked for 1).
+
+    Returns:
+        dict[str, InstrumentArrangement]: The arrangements by instrument name,
+            from the cheapest total cost. Instruments that can't play the piece come last,
+            with an infinite cost and the error.
+    """
+    piece = InternedPiece.from_music_piece(music_piece)
+    names = list(instruments)
+    if max_workers == 1 or len(names) <= 1:
+        results = [_arrange(piece, instruments[name]) for name in names]
+    elif executor is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return multi_instrument_arrangement(music_piece, instruments, executor=pool)
+    else:
+        results = list(
+            executor.map(_arrange, [piece] * len(names), [instruments[name] for name in names])
+        )
+    return dict(
+        sorted(zip(names, results, strict=True), key=lambda name_result: name_result[1].total_cost)
+    )
@@ -4,12 +4,17 @@ The idea is to create a playable arrangement of a music piece
 based on the positions available for a given neck instrument.
 """
 
+import itertools
+
 from backend.src.instruments.neck_instrument import NeckInstrument
-from backend.src.music_piece.arrangement.build_position_graph import build_position_graph
-from backend.src.music_piece.arrangement.dijkstra import dijkstra
+from backend.src.music_piece.arrangement.build_position_graph import build_position_csr_graph
+from backend.src.music_piece.arrangement.dijkstra import csr_dijkstra, csr_layered_heuristic
 from backend.src.music_piece.music_piece import MusicPiece
 from backend.src.positions.neck_position import NeckPosition
 
+# bump when a change of the solver or of the costs changes the arrangements (see arrangement_cache)
+SOLVER_VERSION = "2"
+
 
 def neck_arrangement(music_piece: MusicPiece, instrument: NeckInstrument) -> list[NeckPosition]:
     """Arranges the music piece for the specified instrument.
@@ -17,8 +22,8 @@ def neck_arrangement(music_piece: MusicPiece, instrument: NeckInstrument) -> lis
         - position cost
         - transition cost
     """
-    graph, errors = build_position_graph(music_piece, instrument)
-    if len(graph.nodes) == 0:
+    graph, errors, node_codes = build_position_csr_graph(music_piece, instrument)
+    if graph.number_of_nodes == 0:
         msg = "No valid positions found for the entire piece."
         raise ValueError(msg)
     if errors:
@@ -28,7 +33,9 @@ def neck_arrangement(music_piece: MusicPiece, instrument: NeckInstrument) -> lis
 
     start_node_id = -1
     terminal_node_id = -2
-    result = dijkstra(graph, start_node_id)
+    result = csr_dijkstra(
+        graph, start_node_id, target_id=terminal_node_id, heuristic=csr_layered_heuristic(graph)
+    )
     if terminal_node_id not in result.distances or result.distances[terminal_node_id] == float(
         "inf"
     ):
@@ -37,7 +44,36 @@ def neck_arrangement(music_piece: MusicPiece, instrument: NeckInstrument) -> lis
 
     path_ids = result.get_path(terminal_node_id)
     return [
-        NeckPosition.from_placement_code(node_id // 1000)  # last three digits are time index
+        NeckPosition.from_placement_code(node_codes[node_id])
         for node_id in path_ids
         if node_id not in (start_node_id, terminal_node_id)
     ]
+
+
+def explain_arrangement(
+    positions: list[NeckPosition], instrument: NeckInstrument
+) -> list[dict[str, dict[str, float]]]:
+    """Explains the cost of an arrangement, position by position.
+    Each entry holds the breakdown of the position cost,
+    and of the transition cost from the previous position (empty for the first one)."""
+    return [
+        {
+            "position_cost": instrument.explain_position_cost(position, check_valid=False),
+            "transition_cost": (
+                instrument.explain_transition_cost(positions[index - 1], position)
+                if index > 0
+                else {}
+            ),
+        }
+        for index, position in enumerate(positions)
+    ]
+
+
+def arrangement_cost(positions: list[NeckPosition], instrument: NeckInstrument) -> float:
+    """Returns the total cost of an arrangement: its position costs and its transition costs."""
+    return sum(
+        instrument.position_cost(position, check_valid=False) for position in positions
+    ) + sum(
+        instrument.transition_cost(previous, position)
+        for previous, position in itertools.pairwise(positions)
+    )
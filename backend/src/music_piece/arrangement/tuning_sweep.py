@@ -0,0 +1,305 @@
+"""
+This module provides a sweep over the capo positions and open tunings of a neck instrument,
+to find the one making a music piece the easiest to play.
+
+A capo is a uniform offset of the open strings (and removes as many frets),
+a retuned string is an offset of one open string. The placements of each distinct chord
+of the piece on distinct strings are enumerated once, with their frets in the standard tuning,
+with the features of their cost that don't depend on the frets. A tuning subtracts its offsets
+from these frets (a capo shifts all of them, a retuned string only its own), keeps the
+placements within the neck and the reach of the hand, and scores them from the shared features.
+The tunings are ranked by this cheap estimate, the score of the best placement of each
+distinct chord weighted by its number of occurrences (transitions are ignored),
+and the exact arrangement is only computed for the best few.
+"""
+
+import copy
+import itertools
+from collections import Counter
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.src.instruments.neck_instrument import NeckInstrument
+from backend.src.instruments.neck_validity import NeckValidityModel
+from backend.src.music_piece.arrangement.multi_instrument_arrangement import (
+    multi_instrument_arrangement,
+)
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.positions.neck_position import NeckPosition
+from backend.src.utils.constants import MAX_FINGERS
+from backend.src.utils.note2num import note2num
+
+# open tunings of the guitar, from the first (highest) string
+GUITAR_TUNINGS = {
+    "Standard": ["E4", "B3", "G3", "D3", "A2", "E2"],
+    "Drop D": ["E4", "B3", "G3", "D3", "A2", "D2"],
+    "Open G": ["D4", "B3", "G3", "D3", "G2", "D2"],
+    "Open D": ["D4", "A3", "F#3", "D3", "A2", "D2"],
+    "DADGAD": ["D4", "A3", "G3", "D3", "A2", "D2"],
+}
+
+
+class Tuning(NamedTuple):
+    """A tuning of a neck instrument: the offsets of its open strings, in semitones,
+    and the fret of the capo (0 without capo)."""
+
+    name: str
+    string_offsets: tuple[int, ...]
+    capo: int = 0
+
+    @classmethod
+    def from_open_strings(
+        cls, name: str, instrument: NeckInstrument, open_strings: list[str], capo: int = 0
+    ) -> "Tuning":
+        """Returns the tuning of an instrument giving these open strings (before the capo)."""
+        if len(open_strings) != len(instrument.open_strings):
+            msg = f"{len(open_strings)} open strings given for {len(instrument.open_strings)}."
+            raise ValueError(msg)
+        return cls(
+            name,
+            tuple(
+                note2num(note) - open_note
+                for note, open_note in zip(open_strings, instrument.open_strings, strict=True)
+            ),
+            capo,
+        )
+
+
+class ChordPlacements(NamedTuple):
+    """The placements on distinct strings of the chords with the same number of notes,
+    shared by the tunings: the placements are the same for every chord of the group,
+    one per ordered choice of strings, and their notes are in the order of the chord."""
+
+    occurrences: npt.NDArray[np.int64]  # of each chord in the piece, shape (chords,)
+    string_indices: npt.NDArray[np.int64]  # from 0, shape (placements, notes)
+    standard_frets: npt.NDArray[np.int64]  # shape (chords, placements, notes), may be off the neck
+    in_between_strings: npt.NDArray[np.float64]  # the cost of the strings not played
+    string_distances: npt.NDArray[np.int64]  # of each pair of notes, shape (placements, pairs)
+    pairs: tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]  # the notes of each pair
+
+
+class TuningResult(NamedTuple):
+    """The result of a tuning in a sweep: its estimated cost, and for the best tunings,
+    the exact arrangement and its total cost (None when it wasn't computed)."""
+
+    tuning: Tuning
+    estimated_cost: float
+    positions: list[NeckPosition] | None = None
+    total_cost: float | None = None
+
+
+def capo_tunings(instrument: NeckInstrument, max_capo: int = 7) -> list[Tuning]:
+    """Returns the tunings of an instrument with a capo on each fret up to max_capo,
+    and before the last fret (a capo on it would leave no fret)."""
+    no_offsets = (0,) * len(instrument.open_strings)
+    return [
+        Tuning("No capo" if capo == 0 else f"Capo {capo}", no_offsets, capo)
+        for capo in range(min(max_capo, instrument.number_of_frets - 1) + 1)
+    ]
+
+
+def retuned_instrument(
+    instrument: NeckInstrument,
+    tuning: Tuning,
+    validity_models: dict[int, NeckValidityModel] | None = None,
+) -> NeckInstrument:
+    """Returns a copy of the instrument in a tuning, with the same cost weights.
+    With a capo, the frets are counted from the capo.
+
+    Args:
+        instrument (NeckInstrument): The instrument in its standard tuning.
+        tuning (Tuning): The tuning.
+        validity_models (dict[int, NeckValidityModel] | None): The validity models shared
+            by the tunings, by number of frets (only the capo changes it).
+    """
+    if len(tuning.string_offsets) != len(instrument.open_strings):
+        msg = f"Tuning {tuning.name} doesn't have one offset per string."
+        raise ValueError(msg)
+    if not 0 <= tuning.capo < instrument.number_of_frets:
+        msg = f"Capo {tuning.capo} is out of the neck."
+        raise ValueError(msg)
+    retuned = copy.copy(instrument)
+    retuned.name = f"{instrument.name} ({tuning.name})"
+    retuned.open_strings = [
+        open_note + offset + tuning.capo
+        for open_note, offset in zip(instrument.open_strings, tuning.string_offsets, strict=True)
+    ]
+    retuned.number_of_frets = instrument.number_of_frets - tuning.capo
+    retuned.range = (
+        min(retuned.open_strings),
+        max(retuned.open_strings) + retuned.number_of_frets,
+    )
+    if tuning.capo > 0:
+        if validity_models is None:
+            validity_models = {}
+        if retuned.number_of_frets not in validity_models:
+            validity_models[retuned.number_of_frets] = NeckValidityModel(
+                len(retuned.open_strings), retuned.number_of_frets, list(retuned.fingers)
+            )
+        retuned.validity_model = validity_models[retuned.number_of_frets]
+    return retuned
+
+
+def tuning_sweep(
+    music_piece: MusicPiece,
+    instrument: NeckInstrument,
+    tunings: list[Tuning],
+    exact_count: int = 3,
+    max_workers: int | None = None,
+) -> list[TuningResult]:
+    """Ranks the tunings of an instrument for a music piece, from the easiest.
+
+    Args:
+        music_piece (MusicPiece): The music piece.
+        instrument (NeckInstrument): The instrument in its standard tuning.
+        tunings (list[Tuning]): The tunings to compare.
+        exact_count (int): The number of best estimated tunings arranged exactly.
+        max_workers (int | None): The number of worker processes of the exact arrangements.
+
+    Returns:
+        list[TuningResult]: The tunings arranged exactly, by total cost,
+            then the others by estimated cost. Tunings that can't play the piece
+            have an infinite estimated cost.
+    """
+    if len({tuning.name for tuning in tunings}) != len(tunings):
+        msg = "The names of the tunings must be different."
+        raise ValueError(msg)
+    estimates = _ranked_estimates(music_piece, instrument, tunings)
+
+    exact = [
+        (tuning, retuned)
+        for estimate, tuning, retuned in estimates[:exact_count]
+        if estimate != float("inf")
+    ]
+    arrangements = multi_instrument_arrangement(
+        music_piece, {tuning.name: retuned for tuning, retuned in exact}, max_workers
+    )
+    estimated_costs = {tuning.name: estimate for estimate, tuning, _ in estimates}
+    results = sorted(
+        (
+            TuningResult(
+                tuning,
+                estimated_costs[tuning.name],
+                None if arrangement.error is not None else arrangement.positions,
+                arrangement.total_cost,
+            )
+            for tuning, _ in exact
+            for arrangement in [arrangements[tuning.name]]
+        ),
+        key=lambda result: arrangements[result.tuning.name].total_cost,
+    )
+    arranged = {result.tuning.name for result in results}
+    results.extend(
+        TuningResult(tuning, estimate)
+        for estimate, tuning, _ in estimates
+        if tuning.name not in arranged
+    )
+    return results
+
+
+def _ranked_estimates(
+    music_piece: MusicPiece, instrument: NeckInstrument, tunings: list[Tuning]
+) -> list[tuple[float, Tuning, NeckInstrument]]:
+    """Returns the estimated cost of each tuning with its retuned instrument, from the cheapest.
+    A tuning that can't play a chord of the piece has an infinite cost."""
+    chord_counts = Counter(timed_chord.chord for timed_chord in music_piece.timed_chords)
+    notes = sorted({note for chord in chord_counts for note in chord})
+    # shared by all tunings: the fret of each note on each string in the standard tuning
+    standard_frets = np.array(notes, dtype=np.int64)[:, None] - np.array(
+        instrument.open_strings, dtype=np.int64
+    )
+    note_rows = {note: row for row, note in enumerate(notes)}
+    chords_by_size: dict[int, list[tuple[int, ...]]] = {}
+    for chord in chord_counts:
+        chords_by_size.setdefault(len(chord), []).append(chord)
+    if any(size > len(instrument.open_strings) for size in chords_by_size):
+        groups = None  # a chord has more notes than strings, in every tuning
+    else:
+        groups = [
+            _chord_placements(
+                [[note_rows[note] for note in chord] for chord in chords],
+                [chord_counts[chord] for chord in chords],
+                standard_frets,
+                instrument,
+            )
+            for chords in chords_by_size.values()
+        ]
+    validity_models = {instrument.number_of_frets: instrument.validity_model}
+
+    estimates: list[tuple[float, Tuning, NeckInstrument]] = []
+    for tuning in tunings:
+        retuned = retuned_instrument(instrument, tuning, validity_models)
+        estimate = float("inf") if groups is None else _estimated_cost(groups, tuning, retuned)
+        estimates.append((estimate, tuning, retuned))
+    estimates.sort(key=lambda estimate: estimate[0])
+    return estimates
+
+
+def _chord_placements(
+    chord_rows: list[list[int]],
+    occurrences: list[int],
+    standard_frets: npt.NDArray[np.int64],
+    instrument: NeckInstrument,
+) -> ChordPlacements:
+    """Enumerates the placements of chords with the same number of notes (given by their rows
+    in the standard fret table), with the cost features not depending on the tuning."""
+    size = len(chord_rows[0])
+    string_indices = np.array(
+        list(itertools.permutations(range(len(instrument.open_strings)), size)), dtype=np.int64
+    ).reshape(-1, size)
+    strings = string_indices + 1
+    # the strings not played between the played ones, as in NeckInstrument.position_cost
+    gaps = np.zeros(len(strings), dtype=np.int64)
+    if size > 3:
+        gaps = (strings[:, 1:-1] != strings[:, 2:] + 1).sum(axis=1)
+    first, second = np.triu_indices(size, k=1)
+    # frets[c, a, n] = standard_frets[row of the note n of the chord c, string of n in a]
+    rows = np.array(chord_rows, dtype=np.int64)
+    return ChordPlacements(
+        occurrences=np.array(occurrences, dtype=np.int64),
+        string_indices=string_indices,
+        standard_frets=standard_frets[rows[:, None, :], string_indices[None, :, :]],
+        in_between_strings=(gaps * instrument.in_between_strings_cost).astype(np.float64),
+        string_distances=np.abs(strings[:, first] - strings[:, second]),
+        pairs=(first.astype(np.int64), second.astype(np.int64)),
+    )
+
+
+def _estimated_cost(
+    groups: list[ChordPlacements], tuning: Tuning, instrument: NeckInstrument
+) -> float:
+    """Returns the sum of the scores of the best placements of the chords in a tuning,
+    by number of occurrences, infinite if a chord can't be played.
+
+    The score of a placement follows position_cost without fingering it: the in between
+    strings, the lowest string gap cost (min factor for the fretted notes on different frets)
+    and the hand placement of the default fingering (its lowest fret minus 1, -1 if open)."""
+    offsets = np.array(tuning.string_offsets, dtype=np.int64) + tuning.capo
+    min_factor = min(instrument.string_gap_dificulty_factor.values(), default=0.0)
+    estimate = 0.0
+    for group in groups:
+        frets = group.standard_frets - offsets[group.string_indices]
+        fretted = frets > 0
+        highest = np.where(fretted, frets, 0).max(axis=2)
+        lowest = np.where(fretted, frets, instrument.number_of_frets + 1).min(axis=2)
+        playable = ((frets >= 0) & (frets <= instrument.number_of_frets)).all(axis=2) & (
+            highest - lowest <= MAX_FINGERS
+        )
+        first, second = group.pairs
+        string_gaps = (
+            fretted[:, :, first]
+            & fretted[:, :, second]
+            & (frets[:, :, first] != frets[:, :, second])
+        ) * group.string_distances
+        scores = (
+            group.in_between_strings
+            + min_factor * string_gaps.sum(axis=2)
+            + np.where(fretted.any(axis=2), lowest - 1, -1)
+        )
+        best = np.where(playable, scores, np.inf).min(axis=1)
+        if np.isinf(best).any():
+            return float("inf")
+        estimate += float(group.occurrences @ best)
+    return estimate
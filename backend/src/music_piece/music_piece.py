@@ -1,12 +1,41 @@
 """
 This module provides functionality for working with music pieces, including
 representation, and manipulation.
+
+A music piece is stored in columns: the start times and durations of its timed chords,
+and the pitches of all its chords in one flat array, the chord of a timed chord being
+the pitches between its offset and the next one (a flag of each pitch tells if it is sustained).
+The timed chords are views created on demand.
+The columns are saved in one file, which is memory-mapped when loaded.
 """
 
+import itertools
+import json
+import os
+import tempfile
+from collections.abc import Iterator, Sequence
 from pathlib import Path
+from typing import Literal, NamedTuple, overload
+
+import numpy as np
+import numpy.typing as npt
 
 from backend.src.music_piece.piano_roll import PianoRoll
 from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.utils.metrics import INGESTED_CHORDS, METRICS
+
+Segmentation = Literal["changes", "onsets"]
+
+FILE_MAGIC = b"OMFPIECE"  # the first bytes of a saved music piece
+FILE_VERSION = 2
+COLUMN_ALIGNMENT = 8  # the columns of a saved music piece start on multiples of it
+COLUMN_DTYPES: dict[str, np.dtype] = {
+    "start_times": np.dtype("<f8"),
+    "durations": np.dtype("<f8"),
+    "pitch_offsets": np.dtype("<i8"),
+    "pitches": np.dtype("<i2"),
+    "sustained": np.dtype("?"),
+}
 
 
 class MusicPiece:
@@ -25,55 +54,102 @@ class MusicPiece:
             title (str): The title of the music piece.
         """
         self.__title = title
-        self.__timed_chords: list[TimedChord] = []
+        self.__set_columns(
+            {
+                name: np.zeros(1 if name == "pitch_offsets" else 0, dtype=dtype)
+                for name, dtype in COLUMN_DTYPES.items()
+            },
+            None,
+        )
+
+    def __set_columns(
+        self, columns: dict[str, npt.NDArray], ingestion_report: "IngestionReport | None"
+    ) -> None:
+        """Sets the columns of the music piece, holding exactly its timed chords,
+        and its ingestion report (the pieces are built through it)."""
+        self.__size = len(columns["start_times"])  # the number of timed chords
+        # the columns grow by doubling (see add_timed_chord): they may be longer than the size
+        self.__start_times = columns["start_times"]
+        self.__durations = columns["durations"]
+        self.__pitch_offsets = columns["pitch_offsets"]
+        self.__pitches = columns["pitches"]
+        self.__sustained = columns["sustained"]
+        self.__ingestion_report = ingestion_report
 
     @classmethod
-    def from_roll(cls, roll: PianoRoll, title: str = "") -> "MusicPiece":
+    def from_roll(
+        cls,
+        roll: PianoRoll,
+        title: str = "",
+        merging: "ChordMerging | None" = None,
+        segmentation: Segmentation = "changes",
+    ) -> "MusicPiece":
         """Creates a MusicPiece object from a piano roll.
 
+        With the "changes" segmentation, a timed chord starts whenever the set of notes played
+        changes. With a chord merging, the chords caused by staggered onsets and releases,
+        and the too short chords, are merged into their neighbors (see ChordMerging).
+        With the "onsets" segmentation, a timed chord only starts when a note starts:
+        the notes held from the previous timed chord are its sustained notes,
+        and a release doesn't start a timed chord.
+
         Args:
             roll (PianoRoll): The piano roll representation.
             title (str): The title of the music piece.
+            merging (ChordMerging | None): The tolerances of the chord merging, None to keep
+                every change of notes.
+            segmentation (Segmentation): "changes" or "onsets".
 
         Returns:
-            MusicPiece: An instance of MusicPiece created from the piano roll.
-        """
-        music_piece = cls(title=title)
+            MusicPiece: An instance of MusicPiece created from the piano roll,
+                with its ingestion_report.
 
-        # Create timed chords from the piano roll
-        previous_timed_chord = TimedChord(chord=(), start_time=0, duration=0)
+        Raises:
+            ValueError: if a chord merging is given with the "onsets" segmentation.
+        """
+        segments = _frame_segments(roll)
+        frame_chords = len(segments)
+        if segmentation == "onsets":
+            if merging is not None:
+                msg = "The chord merging only applies to the changes segmentation."
+                raise ValueError(msg)
+            segments = _onset_segments(roll)
+        elif merging is not None:
+            segments = merging.merge(segments, roll.frame_rate)
 
-        for index, column in enumerate(roll.transposed_roll):
-            current_chord = tuple(pitch for pitch, is_on in enumerate(column) if is_on)
-            if not current_chord:
-                continue
-            current_timed_chord = TimedChord(
-                chord=current_chord,
-                start_time=index / roll.frame_rate,
-                duration=1 / roll.frame_rate,
+        music_piece = cls(title=title)
+        for segment in segments:
+            music_piece.add_timed_chord(
+                TimedChord(
+                    chord=segment.chord,
+                    start_time=segment.start / roll.frame_rate,
+                    duration=segment.frames / roll.frame_rate,
+                    sustained=segment.sustained,
+                )
             )
-            if previous_timed_chord.chord == current_timed_chord.chord:
-                # if chords are the same, extend the duration of the previous chord
-                current_timed_chord = previous_timed_chord
-                current_timed_chord.duration += 1 / roll.frame_rate
-            elif previous_timed_chord.is_not_empty():
-                # if chords are different and a previous chord exists, add it to the music piece
-                music_piece.add_timed_chord(previous_timed_chord)
-            previous_timed_chord = current_timed_chord
-
-        # Add the last timed chord if it exists at the last index
-        if current_timed_chord.is_not_empty():
-            music_piece.add_timed_chord(current_timed_chord)
-
+        music_piece.__set_columns(
+            music_piece.__columns(), IngestionReport(frame_chords, len(segments))
+        )
+        if METRICS.enabled:
+            INGESTED_CHORDS.inc("frame", amount=frame_chords)
+            INGESTED_CHORDS.inc("merged", amount=len(segments))
         return music_piece
 
     @classmethod
-    def from_midi(cls, midi_path: Path, fs: int = 20) -> "MusicPiece":
+    def from_midi(
+        cls,
+        midi_path: Path,
+        fs: int = 20,
+        merging: "ChordMerging | None" = None,
+        segmentation: Segmentation = "changes",
+    ) -> "MusicPiece":
         """Creates a MusicPiece object from a MIDI file.
 
         Args:
             midi_file (Path): The path to the MIDI file.
             fs (int): The frame rate.
+            merging (ChordMerging | None): The tolerances of the chord merging (see from_roll).
+            segmentation (Segmentation): "changes" or "onsets" (see from_roll).
 
         Returns:
             MusicPiece: An instance of MusicPiece created from the MIDI file.
@@ -81,7 +157,27 @@ class MusicPiece:
         # Create a piano roll from the MIDI file
         piano_roll = PianoRoll.from_midi(midi_path, fs=fs)
         # Convert the piano roll to timed chords
-        return cls.from_roll(piano_roll, title=midi_path.stem)
+        return cls.from_roll(
+            piano_roll, title=midi_path.stem, merging=merging, segmentation=segmentation
+        )
+
+    @classmethod
+    def from_chords(cls, chords: list[list[int]], title: str = "") -> "MusicPiece":
+        """Creates a MusicPiece object playing chords one after the other, one per second.
+
+        Args:
+            chords (list[list[int]]): The chords, as MIDI note numbers.
+            title (str): The title of the music piece.
+
+        Returns:
+            MusicPiece: An instance of MusicPiece with a timed chord per chord.
+        """
+        music_piece = cls(title=title)
+        for index, chord in enumerate(chords):
+            music_piece.add_timed_chord(
+                TimedChord(chord=tuple(sorted(chord)), start_time=float(index), duration=1.0)
+            )
+        return music_piece
 
     def __str__(self) -> str:
         """Returns a string representation of the music piece."""
@@ -97,10 +193,370 @@ class MusicPiece:
         return self.__title
 
     @property
-    def timed_chords(self) -> list[TimedChord]:
+    def ingestion_report(self) -> "IngestionReport | None":
+        """Returns the report of the chord merging, None if the piece wasn't created
+        from a piano roll."""
+        return self.__ingestion_report
+
+    @property
+    def timed_chords(self) -> "TimedChords":
         """Returns the timed chords of the music piece."""
-        return self.__timed_chords
+        return TimedChords(self)
+
+    @property
+    def start_times(self) -> npt.NDArray[np.float64]:
+        """Returns the start times of the timed chords (read-only)."""
+        return _read_only(self.__start_times[: self.__size])
+
+    @property
+    def durations(self) -> npt.NDArray[np.float64]:
+        """Returns the durations of the timed chords (read-only)."""
+        return _read_only(self.__durations[: self.__size])
+
+    @property
+    def pitch_offsets(self) -> npt.NDArray[np.int64]:
+        """Returns the offsets of the chords in the pitches, with the end of the last chord
+        (read-only)."""
+        return _read_only(self.__pitch_offsets[: self.__size + 1])
+
+    @property
+    def pitches(self) -> npt.NDArray[np.int16]:
+        """Returns the pitches of all the chords, one after the other (read-only)."""
+        return _read_only(self.__pitches[: self.__pitch_offsets[self.__size]])
+
+    @property
+    def sustained(self) -> npt.NDArray[np.bool_]:
+        """Returns the flags of the sustained pitches, aligned with the pitches (read-only)."""
+        return _read_only(self.__sustained[: self.__pitch_offsets[self.__size]])
 
     def add_timed_chord(self, timed_chord: TimedChord) -> None:
         """Adds a timed chord to the music piece."""
-        self.__timed_chords.append(timed_chord)
+        size = self.__size
+        end = int(self.__pitch_offsets[size])
+        new_end = end + len(timed_chord.chord)
+        if size == len(self.__start_times):
+            capacity = max(2 * size, 16)
+            self.__start_times = _grown(self.__start_times, size, capacity)
+            self.__durations = _grown(self.__durations, size, capacity)
+            self.__pitch_offsets = _grown(self.__pitch_offsets, size + 1, capacity + 1)
+        if new_end > len(self.__pitches):
+            capacity = max(2 * end, new_end, 64)
+            self.__pitches = _grown(self.__pitches, end, capacity)
+            self.__sustained = _grown(self.__sustained, end, capacity)
+        self.__start_times[size] = timed_chord.start_time
+        self.__durations[size] = timed_chord.duration
+        self.__pitches[end:new_end] = timed_chord.chord
+        self.__sustained[end:new_end] = [
+            note in timed_chord.sustained for note in timed_chord.chord
+        ]
+        self.__pitch_offsets[size + 1] = new_end
+        self.__size = size + 1
+
+    def __columns(self) -> dict[str, npt.NDArray]:
+        """Returns the columns of the music piece, trimmed to its timed chords (read-only)."""
+        return {
+            "start_times": self.start_times,
+            "durations": self.durations,
+            "pitch_offsets": self.pitch_offsets,
+            "pitches": self.pitches,
+            "sustained": self.sustained,
+        }
+
+    def save(self, path: Path) -> None:
+        """Saves the music piece to a file, which can be memory-mapped by load.
+
+        The file starts with FILE_MAGIC, the length of a JSON header (8 bytes, little-endian)
+        and the header: the title, the ingestion report, and the dtype, offset and length
+        of each column in the file. The file is written next to the path then moved to it,
+        so a piece memory-mapped from the path can be saved back to it.
+        """
+        columns = self.__columns()
+        header: dict = {
+            "version": FILE_VERSION,
+            "title": self.__title,
+            "ingestion_report": self.__ingestion_report,
+            "columns": {},
+        }
+        # the offsets of the columns depend on the length of the header, which contains them:
+        # they are computed for a header padded to a fixed length
+        header_length = 0
+        while True:
+            offset = _aligned(len(FILE_MAGIC) + 8 + header_length)
+            for name, column in columns.items():
+                header["columns"][name] = [column.dtype.str, offset, len(column)]
+                offset = _aligned(offset + column.nbytes)
+            encoded = json.dumps(header).encode()
+            if len(encoded) <= header_length:
+                break
+            header_length = _aligned(len(encoded))
+        descriptor, temporary_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        temporary_path = Path(temporary_name)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(FILE_MAGIC)
+                file.write(header_length.to_bytes(8, "little"))
+                file.write(encoded.ljust(header_length))
+                for name, column in columns.items():
+                    file.seek(header["columns"][name][1])
+                    file.write(column.tobytes())
+            temporary_path.chmod(0o644)  # mkstemp creates it readable by its owner only
+            temporary_path.replace(path)
+        except BaseException:
+            temporary_path.unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path, *, mmap: bool = True) -> "MusicPiece":
+        """Loads a music piece saved by save.
+
+        Args:
+            path (Path): The path to the file.
+            mmap (bool): If True, the columns are memory-mapped from the file (read only until
+                a timed chord is added), else they are read in memory.
+
+        Returns:
+            MusicPiece: The music piece.
+
+        Raises:
+            ValueError: if the file isn't a saved music piece.
+        """
+        with path.open("rb") as file:
+            magic = file.read(len(FILE_MAGIC))
+            header_length = int.from_bytes(file.read(8), "little")
+            header = json.loads(file.read(header_length)) if magic == FILE_MAGIC else None
+        if header is None or header.get("version") != FILE_VERSION:
+            msg = f"{path} is not a saved music piece."
+            raise ValueError(msg)
+        columns: dict[str, npt.NDArray] = {}
+        for name, (dtype, offset, length) in header["columns"].items():
+            if dtype != COLUMN_DTYPES[name].str:
+                msg = f"Column {name} of {path} has dtype {dtype}."
+                raise ValueError(msg)
+            if mmap and length > 0:
+                columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=length)
+            else:
+                columns[name] = np.fromfile(path, dtype=dtype, count=length, offset=offset)
+        ingestion_report = header.get("ingestion_report")
+        music_piece = cls(title=header["title"])
+        music_piece.__set_columns(
+            columns, None if ingestion_report is None else IngestionReport(*ingestion_report)
+        )
+        return music_piece
+
+
+class IngestionReport(NamedTuple):
+    """The number of chords of a piano roll, before and after the chord merging."""
+
+    frame_chords: int
+    timed_chords: int
+
+    @property
+    def reduction_ratio(self) -> float:
+        """Returns the number of chords before merging divided by after (1.0 without merging):
+        the factor by which the layers of the arrangement graph are reduced."""
+        return self.frame_chords / self.timed_chords if self.timed_chords else 1.0
+
+
+class _Segment:
+    """A run of frames of a piano roll playing the same chord."""
+
+    __slots__ = ("chord", "frames", "start", "sustained")
+
+    def __init__(
+        self, chord: tuple[int, ...], start: int, frames: int, sustained: tuple[int, ...] = ()
+    ) -> None:
+        """Initializes a segment from its first frame and its number of frames,
+        with the notes held from the previous segment."""
+        self.chord = chord
+        self.start = start
+        self.frames = frames
+        self.sustained = sustained
+
+    @property
+    def end(self) -> int:
+        """Returns the frame after the segment."""
+        return self.start + self.frames
+
+
+class ChordMerging(NamedTuple):
+    """The tolerances of the merging of the chords of a piano roll, in seconds.
+
+    onset_tolerance: a chord whose notes are all in the next chord is merged into it when the
+        notes of the next chord start within this tolerance (staggered onsets)
+    offset_tolerance: a chord whose notes are all in the previous chord is merged into it when
+        the notes of the previous chord end within this tolerance (staggered releases)
+    min_duration: a shorter chord is then merged into the previous chord (the next one for the
+        first chord)
+    """
+
+    onset_tolerance: float = 0.05
+    offset_tolerance: float = 0.05
+    min_duration: float = 0.0
+
+    def merge(self, segments: list[_Segment], frame_rate: int) -> list[_Segment]:
+        """Returns the segments of a piano roll after merging, the neighbors playing the same
+        chord joined."""
+        onset_frames = self.onset_tolerance * frame_rate + 1e-9
+        offset_frames = self.offset_tolerance * frame_rate + 1e-9
+        min_frames = self.min_duration * frame_rate - 1e-9
+
+        # from the end, the onsets of a chord are merged into it, up to its first onset
+        merged: list[_Segment] = []
+        onset = 0  # the start of the last merged chord before any merging
+        for segment in reversed(segments):
+            if (
+                merged
+                and set(segment.chord) < set(merged[-1].chord)
+                and onset - segment.start <= onset_frames
+            ):
+                merged[-1].start = segment.start
+                merged[-1].frames += segment.frames
+            else:
+                merged.append(_Segment(segment.chord, segment.start, segment.frames))
+                onset = segment.start
+        merged.reverse()
+
+        # from the start, the releases of a chord are merged into it, up to its last release
+        released: list[_Segment] = []
+        release = 0  # the end of the last chord before any release was merged
+        for segment in merged:
+            if (
+                released
+                and set(segment.chord) < set(released[-1].chord)
+                and segment.end - release <= offset_frames
+            ):
+                released[-1].frames += segment.frames
+            else:
+                released.append(segment)
+                release = segment.end
+
+        result: list[_Segment] = []
+        pending: _Segment | None = None  # short chords at the start, merged into the next one
+        for segment in released:
+            if pending is not None:
+                segment.start = pending.start
+                segment.frames += pending.frames
+                pending = None
+            if segment.frames < min_frames:
+                if result:
+                    result[-1].frames += segment.frames
+                else:
+                    pending = segment
+                continue
+            if result and result[-1].chord == segment.chord:
+                result[-1].frames += segment.frames
+            else:
+                result.append(segment)
+        if pending is not None:  # every chord is too short
+            result.append(pending)
+        return result
+
+
+def _frame_segments(roll: PianoRoll) -> list[_Segment]:
+    """Returns the segments of a piano roll: a new segment starts whenever the chord played
+    changes. Silent frames are skipped, a chord played again after a silence continues."""
+    segments: list[_Segment] = []
+    for index, column in enumerate(roll.transposed_roll):
+        chord = tuple(pitch for pitch, is_on in enumerate(column) if is_on)
+        if not chord:
+            continue
+        if segments and segments[-1].chord == chord:
+            segments[-1].frames += 1
+        else:
+            segments.append(_Segment(chord, index, 1))
+    return segments
+
+
+def _onset_segments(roll: PianoRoll) -> list[_Segment]:
+    """Returns the segments of a piano roll starting at the onsets of notes: a segment plays
+    the notes on at its first frame, those already on at the frame before are sustained.
+    A note played again right after its release can't be told from a held note in the roll."""
+    segments: list[_Segment] = []
+    previous: set[int] = set()
+    for index, column in enumerate(roll.transposed_roll):
+        notes = {pitch for pitch, is_on in enumerate(column) if is_on}
+        if notes - previous:
+            segments.append(
+                _Segment(tuple(sorted(notes)), index, 1, tuple(sorted(notes & previous)))
+            )
+        elif notes and segments:
+            segments[-1].frames += 1
+        previous = notes
+    return segments
+
+
+class TimedChords(Sequence[TimedChord]):
+    """The timed chords of a music piece, created on demand from its columns."""
+
+    __slots__ = ("__music_piece",)
+
+    def __init__(self, music_piece: MusicPiece) -> None:
+        """Initializes a view of the timed chords of a music piece."""
+        self.__music_piece = music_piece
+
+    def __len__(self) -> int:
+        """Returns the number of timed chords."""
+        return len(self.__music_piece.start_times)
+
+    @overload
+    def __getitem__(self, index: int) -> TimedChord: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[TimedChord]: ...
+
+    def __getitem__(self, index: int | slice) -> TimedChord | list[TimedChord]:
+        """Returns the timed chord at index, or the list of timed chords of a slice."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        music_piece = self.__music_piece
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            msg = "Timed chord index out of range."
+            raise IndexError(msg)
+        start, end = music_piece.pitch_offsets[index : index + 2].tolist()
+        chord = tuple(music_piece.pitches[start:end].tolist())
+        return TimedChord(
+            chord=chord,
+            start_time=float(music_piece.start_times[index]),
+            duration=float(music_piece.durations[index]),
+            sustained=tuple(itertools.compress(chord, music_piece.sustained[start:end])),
+        )
+
+    def __iter__(self) -> Iterator[TimedChord]:
+        """Iterates over the timed chords, reading each column once."""
+        music_piece = self.__music_piece
+        pitches = music_piece.pitches.tolist()
+        sustained = music_piece.sustained.tolist()
+        offsets = music_piece.pitch_offsets.tolist()
+        for index, (start_time, duration) in enumerate(
+            zip(music_piece.start_times.tolist(), music_piece.durations.tolist(), strict=True)
+        ):
+            start, end = offsets[index], offsets[index + 1]
+            chord = tuple(pitches[start:end])
+            flags = sustained[start:end]
+            yield TimedChord(
+                chord=chord,
+                start_time=start_time,
+                duration=duration,
+                sustained=tuple(itertools.compress(chord, flags)) if True in flags else (),
+            )
+
+
+def _grown(column: npt.NDArray, length: int, capacity: int) -> npt.NDArray:
+    """Returns a writable copy of the first length values of a column, with a larger capacity."""
+    grown = np.zeros(capacity, dtype=column.dtype)
+    grown[:length] = column[:length]
+    return grown
+
+
+def _read_only(column: npt.NDArray) -> npt.NDArray:
+    """Returns a read-only view of a column."""
+    view = column.view()
+    view.flags.writeable = False
+    return view
+
+
+def _aligned(offset: int) -> int:
+    """Returns the first multiple of COLUMN_ALIGNMENT from offset."""
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
@@ -5,8 +5,6 @@ This module provides functionality for working with piano rolls.
 from collections.abc import Iterable
 from pathlib import Path
 
-import pretty_midi
-
 
 class PianoRoll:
     """
@@ -26,6 +24,9 @@ class PianoRoll:
         """
         Creates a PianoRoll object from a MIDI file.
         """
+        # slow to import, only needed to read MIDI files
+        import pretty_midi  # noqa: PLC0415  # pylint: disable=import-outside-toplevel
+
         midi_data = pretty_midi.PrettyMIDI(midi_path.as_posix())
 
         # Merge all instruments into one piano roll
@@ -6,26 +6,48 @@ This module provides the TimedChord class, which represents a chord with its tim
 class TimedChord:
     """
     Class representing a chord with its timing information.
+
+    The timed chords of a music piece are created on demand from its columns:
+    the attributes are slotted, so a timed chord holds no __dict__.
     """
 
-    def __init__(self, chord: tuple[int, ...], start_time: float, duration: float) -> None:
+    __slots__ = ("__chord", "__duration", "__start_time", "__sustained")
+    __hash__ = None  # type: ignore[assignment]  # mutable: the times have setters
+
+    def __init__(
+        self,
+        chord: tuple[int, ...],
+        start_time: float,
+        duration: float,
+        sustained: tuple[int, ...] = (),
+    ) -> None:
         """Initializes a TimedChord object.
 
         Args:
             chord (tuple[int, ...]): The chord being played, as a tuple of MIDI note numbers.
             start_time (float): The start time of the chord.
             duration (float): The duration of the chord.
+            sustained (tuple[int, ...]): The notes of the chord held from the previous
+                timed chord, not played again.
+
+        Raises:
+            ValueError: if a sustained note is not a note of the chord.
         """
+        if not set(sustained) <= set(chord):
+            msg = f"The sustained notes {sustained} are not all in the chord {chord}."
+            raise ValueError(msg)
         self.__chord = chord
         self.__start_time = start_time
         self.__duration = duration
+        self.__sustained = sustained
 
     def __str__(self) -> str:
         """Returns a string representation of the timed chord."""
         return (
             f"TimedChord(chord={self.__chord}, "
             f"start_time={self.__start_time}, "
-            f"duration={self.__duration})"
+            f"duration={self.__duration}, "
+            f"sustained={self.__sustained})"
         )
 
     def __repr__(self) -> str:
@@ -33,7 +55,19 @@ class TimedChord:
         return (
             f"TimedChord(chord={self.__chord!r}, "
             f"start_time={self.__start_time!r}, "
-            f"duration={self.__duration!r})"
+            f"duration={self.__duration!r}, "
+            f"sustained={self.__sustained!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        """Returns True if the other timed chord plays the same chord at the same time."""
+        if not isinstance(other, TimedChord):
+            return NotImplemented
+        return (self.__chord, self.__start_time, self.__duration, self.__sustained) == (
+            other.chord,
+            other.start_time,
+            other.duration,
+            other.sustained,
         )
 
     @property
@@ -41,6 +75,11 @@ class TimedChord:
         """Returns the chord being played."""
         return self.__chord
 
+    @property
+    def sustained(self) -> tuple[int, ...]:
+        """Returns the notes of the chord held from the previous timed chord."""
+        return self.__sustained
+
     @property
     def start_time(self) -> float:
         """Returns the start time of the chord."""
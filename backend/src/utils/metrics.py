@@ -0,0 +1,228 @@
+"""
+This module provides lightweight metrics for the fingering and arrangement pipeline,
+exposed in the Prometheus text format.
+
+Metrics are disabled by default, set the environment variable OMF_METRICS to 1
+or METRICS.enabled to True to record them. When disabled, an instrumentation point costs
+a single attribute check.
+"""
+
+import os
+import time
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+
+LabelValues = tuple[str, ...]
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 100000)
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    """Formats the labels of a sample, e.g. {stage="search",le="0.1"}"""
+    labels = [f'{name}="{value}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value, integers without decimals."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing value, per label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        """Initializes a counter with its name, help text and label names."""
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """Increments the counter of the given label values."""
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        """Returns the lines of the counter in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.values.items())
+        )
+        return lines
+
+    def reset(self) -> None:
+        """Forgets all the recorded values."""
+        self.values.clear()
+
+
+class Histogram:
+    """A distribution of observed values in cumulative buckets, per label values."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        """Initializes a histogram with its name, help text, label names and bucket bounds."""
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # per label values: [count per bucket (+Inf last), sum]
+        self.values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Records one observation for the given label values."""
+        if label_values not in self.values:
+            self.values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = self.values[label_values]
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        counts[index] += 1
+        total[0] += value
+
+    def count(self, *label_values: str) -> int:
+        """Returns the number of observations for the given label values."""
+        if label_values not in self.values:
+            return 0
+        return sum(self.values[label_values][0])
+
+    def render(self) -> list[str]:
+        """Returns the lines of the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound) if isinstance(bound, int | float) else bound}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        """Forgets all the recorded observations."""
+        self.values.clear()
+
+
+class MetricsRegistry:
+    """Holds the metrics of the application and renders them for Prometheus."""
+
+    def __init__(self, *, enabled: bool = False) -> None:
+        """Initializes an empty registry."""
+        self.enabled = enabled
+        self.metrics: list[Counter | Histogram] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        """Creates and registers a counter."""
+        counter = Counter(name, documentation, label_names)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Creates and registers a histogram."""
+        histogram = Histogram(name, documentation, label_names, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Registers a function updating metrics at scrape time."""
+        self.collectors.append(collector)
+
+    def register_lru_cache(self, cache_name: str, function: Callable) -> None:
+        """Exports the hits and misses of a functools.lru_cache in CACHE_REQUESTS."""
+
+        def collect() -> None:
+            info = function.cache_info()  # type: ignore[attr-defined]
+            CACHE_REQUESTS.values[(cache_name, "hit")] = info.hits
+            CACHE_REQUESTS.values[(cache_name, "miss")] = info.misses
+
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        """Returns all the metrics in the Prometheus text format."""
+        for collector in self.collectors:
+            collector()
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Forgets all the recorded values."""
+        for metric in self.metrics:
+            metric.reset()
+
+    def time_stage(self, stage: str) -> AbstractContextManager[None]:
+        """Returns a context manager recording its duration in STAGE_SECONDS for the stage,
+        or a no-op one when metrics are disabled."""
+        if not self.enabled:
+            return _NO_OP
+        return _observe_duration(STAGE_SECONDS, stage)
+
+
+@contextmanager
+def _observe_duration(histogram: Histogram, *label_values: str) -> Iterator[None]:
+    """Records the duration of the with block in the histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *label_values)
+
+
+_NO_OP: AbstractContextManager[None] = nullcontext()
+
+METRICS = MetricsRegistry(enabled=os.environ.get("OMF_METRICS", "0") == "1")
+
+STAGE_SECONDS = METRICS.histogram(
+    "omf_stage_seconds",
+    "Time spent in each stage of the fingering and arrangement pipeline.",
+    ("stage",),
+)
+CANDIDATES_PER_CHORD = METRICS.histogram(
+    "omf_candidates_per_chord",
+    "Number of candidate positions per chord, before and after validation.",
+    ("kind",),
+    COUNT_BUCKETS,
+)
+GRAPH_EDGES = METRICS.histogram(
+    "omf_graph_edges",
+    "Number of edges of each arrangement graph.",
+    buckets=COUNT_BUCKETS,
+)
+API_REQUEST_SECONDS = METRICS.histogram(
+    "omf_api_request_seconds", "Latency of the API requests.", ("endpoint",)
+)
+SEARCH_OPERATIONS = METRICS.counter(
+    "omf_search_operations_total",
+    "Work of the shortest path searches, by operation (node_expanded or heap_push).",
+    ("operation",),
+)
+CACHE_REQUESTS = METRICS.counter(
+    "omf_cache_requests_total",
+    "Lookups of each cache, by result (hit or miss).",
+    ("cache", "result"),
+)
+INGESTED_CHORDS = METRICS.counter(
+    "omf_ingested_chords_total",
+    "Chords of the ingested piano rolls, by kind (frame before merging, merged after).",
+    ("kind",),
+)
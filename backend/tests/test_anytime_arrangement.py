@@ -0,0 +1,57 @@
+"""
+This is the test suite for the anytime arrangement.
+"""
+
+import math
+from pathlib import Path
+
+from pytest import raises
+
+from backend.src.instruments.neck_instrument import Guitar, Mandolin
+from backend.src.music_piece.arrangement.anytime_arrangement import anytime_arrangement
+from backend.src.music_piece.arrangement.neck_arrangement import (
+    arrangement_cost,
+    neck_arrangement,
+)
+from backend.src.music_piece.music_piece import MusicPiece
+
+piece = MusicPiece.from_midi(Path("backend/assets/midi_files/test_sample4.mid"))
+
+
+def test_anytime_arrangement_optimal() -> None:
+    """Test that with enough time, the arrangement is proven optimal."""
+    guitar = Guitar()
+    result = anytime_arrangement(piece, guitar, time_budget=60.0)
+    assert result.optimal
+    assert len(result.positions) == len(piece.timed_chords)
+    assert math.isclose(result.total_cost, arrangement_cost(result.positions, guitar))
+    assert math.isclose(
+        result.total_cost, arrangement_cost(neck_arrangement(piece, guitar), guitar)
+    )
+    chords = MusicPiece.from_chords([[67, 71, 74], [69, 72, 76], [67, 71, 74]])
+    mandolin = Mandolin()
+    result = anytime_arrangement(chords, mandolin, time_budget=60.0)
+    assert result.optimal
+    assert math.isclose(
+        result.total_cost, arrangement_cost(neck_arrangement(chords, mandolin), mandolin)
+    )
+
+
+def test_anytime_arrangement_deadline() -> None:
+    """Test that without time, the greedy arrangement is returned."""
+    guitar = Guitar()
+    result = anytime_arrangement(piece, guitar, time_budget=0.0)
+    assert not result.optimal
+    assert result.beam_width == 1
+    assert len(result.positions) == len(piece.timed_chords)
+    assert all(guitar.is_valid_position(position) for position in result.positions)
+    assert math.isclose(result.total_cost, arrangement_cost(result.positions, guitar))
+    assert result.total_cost >= anytime_arrangement(piece, guitar, time_budget=60.0).total_cost
+
+
+def test_anytime_arrangement_errors() -> None:
+    """Test the errors of the anytime arrangement."""
+    with raises(ValueError):
+        anytime_arrangement(MusicPiece(), Guitar(), time_budget=1.0)
+    with raises(ValueError):
+        anytime_arrangement(MusicPiece.from_chords([[60], [12]]), Guitar(), time_budget=1.0)
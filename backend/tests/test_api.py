@@ -49,3 +49,76 @@ def test_get_instrument_details() -> None:
     assert response["range"][0] < response["range"][1]
     assert isinstance(response["description"], str)
     assert isinstance(response["frets"], int)
+
+
+def test_get_voicings_for_chord_symbol() -> None:
+    """Test the retrieval of the voicings of a chord symbol."""
+    response = requests.post(
+        f"{URL}/getVoicingsForChordSymbol",
+        json={
+            "symbol": "Cmaj7",
+            "instrument": "Guitar",
+            "limit": 3,
+        },
+        headers={"Content-Type": "application/json"},
+        timeout=10,
+    )
+    response = response.json()
+    assert len(response) == 3
+    costs = [cost for _, cost in response.values()]
+    assert costs == sorted(costs)
+    assert "strings" in response["0"][0]
+
+
+def test_compare_instruments() -> None:
+    """Test the comparison of the arrangements of chords on several instruments."""
+    response = requests.post(
+        f"{URL}/compareInstruments",
+        json={
+            "chords": [["C3", "E3", "G3"], ["G3", "B3", "D4"]],
+            "instruments": ["Guitar", "Ukulele"],
+            "explain": True,
+        },
+        headers={"Content-Type": "application/json"},
+        timeout=10,
+    )
+    response = response.json()
+    assert list(response) == ["Guitar", "Ukulele"]
+    assert len(response["Guitar"]["positions"]) == 2
+    assert len(response["Guitar"]["cost_breakdown"]) == 2
+
+
+def test_get_all_pos_from_notes_limits() -> None:
+    """Test that a request over the enumeration limit is degraded, and reports it."""
+    response = requests.post(
+        f"{URL}/getAllPosFromNotes",
+        json={
+            "notes": ["C3", "E3", "G3", "C4", "E4"],
+            "instrument": "Guitar",
+            "max_placements": 100,
+        },
+        headers={"Content-Type": "application/json"},
+        timeout=10,
+    )
+    assert response.headers["X-Enumeration-Mode"] == "best_first"
+    assert response.headers["X-Enumeration-Complete"] == "true"
+    assert len(response.json()) > 0
+
+
+def test_arrange_chords() -> None:
+    """Test the arrangement of chords within a time budget."""
+    response = requests.post(
+        f"{URL}/arrangeChords",
+        json={
+            "chords": [["C3", "E3", "G3"], ["G3", "B3", "D4"]],
+            "instrument": "Guitar",
+            "time_budget": 0.5,
+            "explain": True,
+        },
+        headers={"Content-Type": "application/json"},
+        timeout=10,
+    )
+    response = response.json()
+    assert len(response["positions"]) == 2
+    assert response["optimal"]
+    assert response["cost_breakdown"][0]["transition_cost"] == {}
@@ -3,10 +3,15 @@ This is the test suite for the build_position_graph function of the musical arra
 """
 
 from backend.src.instruments.neck_instrument import Guitar
-from backend.src.music_piece.arrangement.build_position_graph import build_position_graph
-from backend.src.music_piece.arrangement.dijkstra import dijkstra
+from backend.src.music_piece.arrangement.build_position_graph import (
+    build_position_csr_graph,
+    build_position_graph,
+)
+from backend.src.music_piece.arrangement.dijkstra import csr_dijkstra, dijkstra
+from backend.src.music_piece.arrangement.neck_arrangement import neck_arrangement
 from backend.src.music_piece.music_piece import MusicPiece
 from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.positions.neck_position import NeckPosition
 
 test_piece = MusicPiece()
 test_piece.add_timed_chord(TimedChord(chord=(48, 52, 55), start_time=0.0, duration=1.0))  # C major
@@ -17,7 +22,7 @@ test_piece.add_timed_chord(TimedChord(chord=(52, 57, 61), start_time=3.0, durati
 def test_build_position_graph() -> None:
     """Test that the position graph is built correctly."""
     guitar = Guitar()
-    graph, _ = build_position_graph(test_piece, guitar)
+    graph, _, _ = build_position_graph(test_piece, guitar)
 
     # Check that nodes are created
     assert len(graph.nodes) >= len(test_piece.timed_chords)
@@ -52,7 +57,7 @@ def test_build_position_graph() -> None:
 def test_dijkstra_on_position_graph() -> None:
     """Test that Dijkstra's algorithm works on the position graph."""
     guitar = Guitar()
-    graph, _ = build_position_graph(test_piece, guitar)
+    graph, _, node_codes = build_position_graph(test_piece, guitar)
 
     # Run Dijkstra's algorithm from the first node
     start_node_id = -1
@@ -74,10 +79,79 @@ def test_dijkstra_on_position_graph() -> None:
             assert path[0] == start_node_id
             assert path[-1] == node_id
 
-    assert result.get_path(-2) == [
-        -1,
-        300040235034000,
-        300050224023001,
-        402130212021002,
-        -2,
-    ]  # terminal node
+    path = result.get_path(-2)  # terminal node
+    assert path[0] == -1
+    assert path[-1] == -2
+    assert [node_codes[node_id] for node_id in path[1:-1]] == [
+        300040235034,
+        300050224023,
+        402130212021,
+    ]
+
+
+def test_build_position_csr_graph() -> None:
+    """Test that the CSR position graph has the nodes and edges of the position graph."""
+    guitar = Guitar()
+    graph, _, _ = build_position_graph(test_piece, guitar)
+    csr_graph, _, _ = build_position_csr_graph(test_piece, guitar)
+    assert sorted(csr_graph.node_ids) == sorted(graph.nodes)
+    assert csr_graph.number_of_edges == sum(len(node.edges) for node in graph.nodes.values())
+    for node_id, node in graph.nodes.items():
+        assert csr_graph.edges(node_id) == [(edge.to_node.id, edge.cost) for edge in node.edges]
+    result = dijkstra(graph, -1)
+    csr_result = csr_dijkstra(csr_graph, -1, target_id=-2)
+    assert csr_result.distances[-2] == result.distances[-2]
+
+
+def test_position_graph_sustained_notes() -> None:
+    """Test that a sustained note keeps its string and fret, and narrows the layer."""
+    guitar = Guitar()
+    free_piece = MusicPiece()
+    free_piece.add_timed_chord(TimedChord(chord=(50, 62), start_time=0.0, duration=1.0))
+    free_piece.add_timed_chord(TimedChord(chord=(50, 64), start_time=1.0, duration=1.0))
+    free_graph, _, _ = build_position_graph(free_piece, guitar)
+    held_piece = MusicPiece()
+    held_piece.add_timed_chord(TimedChord(chord=(50, 62), start_time=0.0, duration=1.0))
+    held_piece.add_timed_chord(
+        TimedChord(chord=(50, 64), start_time=1.0, duration=1.0, sustained=(50,))
+    )
+    graph, _, node_codes = build_position_graph(held_piece, guitar)
+    assert len(graph.nodes) <= len(free_graph.nodes)
+    assert sum(len(node.edges) for node in graph.nodes.values()) < sum(
+        len(node.edges) for node in free_graph.nodes.values()
+    )
+
+    def held_place(position: NeckPosition) -> tuple[int, int]:
+        return next(
+            (string, fret)
+            for string, fret in zip(position.strings, position.frets, strict=True)
+            if guitar.open_strings[string - 1] + fret == 50
+        )
+
+    def node_place(node_id: int) -> tuple[int, int]:
+        return held_place(NeckPosition.from_placement_code(node_codes[node_id]))
+
+    for node_id, node in graph.nodes.items():
+        if node.layer == 1:
+            for edge in node.edges:
+                assert node_place(edge.to_node.id) == node_place(node_id)
+    positions = neck_arrangement(held_piece, guitar)
+    assert held_place(positions[0]) == held_place(positions[1])
+
+
+def test_position_graph_long_piece() -> None:
+    """Test that the node ids of a piece longer than 1000 chords are unique,
+    and that the whole piece is arranged."""
+    guitar = Guitar()
+    long_piece = MusicPiece()
+    for index in range(1500):
+        timed_chord = test_piece.timed_chords[index % len(test_piece.timed_chords)]
+        long_piece.add_timed_chord(
+            TimedChord(chord=timed_chord.chord, start_time=float(index), duration=1.0)
+        )
+    graph, errors, node_codes = build_position_csr_graph(long_piece, guitar)
+    assert not errors
+    assert graph.number_of_nodes == len(node_codes) + 2
+    positions = neck_arrangement(long_piece, guitar)
+    assert len(positions) == 1500
+    assert positions[:3] == neck_arrangement(test_piece, guitar)
@@ -0,0 +1,105 @@
+"""
+This is the test suite for the persistent arrangement cache.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+from backend.src.instruments.neck_instrument import Guitar
+from backend.src.music_piece.arrangement import arrangement_cache
+from backend.src.music_piece.arrangement.arrangement_cache import (
+    ArrangementCache,
+    arrangement_key,
+    cached_neck_arrangement,
+    cached_neck_arrangement_from_midi,
+    piece_hash,
+)
+from backend.src.music_piece.arrangement.neck_arrangement import neck_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+
+midi_path = Path("backend/assets/midi_files/test_sample4.mid")
+
+
+def make_piece(chords: list[tuple[int, ...]]) -> MusicPiece:
+    """Returns a music piece playing the chords, one per second."""
+    music_piece = MusicPiece(title="Test Piece")
+    for index, chord in enumerate(chords):
+        music_piece.add_timed_chord(TimedChord(chord=chord, start_time=float(index), duration=1.0))
+    return music_piece
+
+
+piece = make_piece([(48, 52, 55), (55, 59), (57, 60, 64)])
+
+
+def test_arrangement_cache_keys() -> None:
+    """Test that the keys change with the piece content and the instrument costs."""
+    guitar = Guitar()
+    key = arrangement_key(piece_hash(piece), guitar)
+    assert key == arrangement_key(
+        piece_hash(make_piece([(48, 52, 55), (55, 59), (57, 60, 64)])), Guitar()
+    )
+    assert key != arrangement_key(piece_hash(make_piece([(48, 52, 55), (55, 59)])), guitar)
+    guitar.new_finger_cost += 1
+    assert key != arrangement_key(piece_hash(piece), guitar)
+
+
+def test_cached_neck_arrangement(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Test that a cached arrangement is the computed one, and isn't computed again."""
+    cache = ArrangementCache(tmp_path / "cache.sqlite")
+    expected = neck_arrangement(piece, Guitar())
+    assert cached_neck_arrangement(piece, Guitar(), cache) == expected
+    assert len(cache) == 1
+
+    def fail(*_: object) -> None:
+        raise AssertionError
+
+    monkeypatch.setattr(arrangement_cache, "neck_arrangement", fail)
+    # a new cache on the same file, as in another process
+    assert cached_neck_arrangement(piece, Guitar(), ArrangementCache(cache.path)) == expected
+
+
+def test_cached_neck_arrangement_from_midi(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Test that a cached MIDI file is neither parsed nor arranged again."""
+    cache = ArrangementCache(tmp_path / "cache.sqlite")
+    expected = cached_neck_arrangement_from_midi(midi_path, Guitar(), cache)
+    assert expected == neck_arrangement(MusicPiece.from_midi(midi_path), Guitar())
+
+    def fail(*_: object, **__: object) -> None:
+        raise AssertionError
+
+    monkeypatch.setattr(arrangement_cache, "neck_arrangement", fail)
+    monkeypatch.setattr(MusicPiece, "from_midi", fail)
+    assert cached_neck_arrangement_from_midi(midi_path, Guitar(), cache) == expected
+
+
+def test_arrangement_cache_eviction(tmp_path: Path) -> None:
+    """Test that the least recently used entries are evicted above the size limit."""
+    cache = ArrangementCache(tmp_path / "cache.sqlite", max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "x" * 10)
+    assert cache.get("a") == "x" * 10  # b is now the least recently used
+    cache.put("c", "x" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "x" * 10
+    assert cache.size() == 20
+
+
+def put_entries(path: Path, worker: int) -> None:
+    """Writes entries to the cache, from a worker process."""
+    cache = ArrangementCache(path)
+    for index in range(20):
+        cache.put(f"{worker}:{index}", str(index))
+
+
+def test_arrangement_cache_processes(tmp_path: Path) -> None:
+    """Test that several processes can write to the same cache."""
+    path = tmp_path / "cache.sqlite"
+    ArrangementCache(path)
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(put_entries, [path] * 4, range(4)))
+    cache = ArrangementCache(path)
+    assert len(cache) == 80
+    assert cache.get("3:19") == "19"
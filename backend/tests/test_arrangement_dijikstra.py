@@ -2,7 +2,17 @@
 This is the test suite for the dijkstra module of the musical arrangements.
 """
 
-from backend.src.music_piece.arrangement.dijkstra import dijkstra
+import math
+
+from pytest import raises
+
+from backend.src.music_piece.arrangement.csr_graph import CSRGraphBuilder
+from backend.src.music_piece.arrangement.dijkstra import (
+    csr_dijkstra,
+    csr_layered_heuristic,
+    dijkstra,
+    layered_heuristic,
+)
 from backend.src.music_piece.arrangement.graph import Graph
 
 test_graph = Graph()
@@ -43,3 +53,102 @@ def test_dijkstra_paths() -> None:
     assert result.get_path(7) == [1, 3, 7]
     assert result.get_path(2) == [2]
     assert result.get_path(8) == [8]  # Non-existent node
+
+
+# a layered graph: start (layer 0), two layers of two nodes, terminal (layer 3)
+# with a negative edge cost, as transition costs can be
+layered_graph = Graph()
+layered_graph.add_node(-1, cost=0.0, layer=0)
+layered_graph.add_node(10, cost=3.0, layer=1)
+layered_graph.add_node(11, cost=1.0, layer=1)
+layered_graph.add_node(20, cost=2.0, layer=2)
+layered_graph.add_node(21, cost=1.0, layer=2)
+layered_graph.add_node(-2, cost=0.0, layer=3)
+for first in [10, 11]:
+    layered_graph.add_edge(-1, first, edge_cost=0.0)
+    for second in [20, 21]:
+        layered_graph.add_edge(first, second, edge_cost=1.0)
+    layered_graph.add_edge(20 + first - 10, -2, edge_cost=0.0)
+layered_graph.add_edge(10, 20, edge_cost=-4.0)
+
+
+def test_dijkstra_counters() -> None:
+    """Test the counters of expanded nodes and heap pushes."""
+    result = dijkstra(test_graph, start_id=1)
+    assert result.nodes_expanded == 5  # every reachable node, once
+    assert result.heap_pushes == 6  # node 6 is pushed twice, its first entry is stale
+
+
+def test_dijkstra_target() -> None:
+    """Test that the search stops at the target node."""
+    result = dijkstra(test_graph, start_id=1, target_id=3)
+    assert result.distances[3] == 1.0 + 1.5 + 2.0
+    assert result.get_path(3) == [1, 3]
+    assert result.nodes_expanded < dijkstra(test_graph, start_id=1).nodes_expanded
+
+
+def test_dijkstra_layered_heuristic() -> None:
+    """Test the A* search with the layered heuristic."""
+    heuristic = layered_heuristic(layered_graph)
+    # cheapest steps: layer 1: 1.0, layer 2: -2.0, layer 3: 0.0
+    assert heuristic == {-1: -1.0, 10: -2.0, 11: -2.0, 20: 0.0, 21: 0.0, -2: 0.0}
+    full = dijkstra(layered_graph, start_id=-1)
+    result = dijkstra(layered_graph, start_id=-1, target_id=-2, heuristic=heuristic)
+    assert result.distances[-2] == full.distances[-2] == 3.0 - 4.0 + 2.0
+    assert result.get_path(-2) == [-1, 10, 20, -2]
+    with raises(ValueError):
+        layered_heuristic(test_graph)
+
+
+def to_csr(graph: Graph) -> CSRGraphBuilder:
+    """Returns a builder filled with the nodes and edges of a graph."""
+    builder = CSRGraphBuilder()
+    for node_id, node in graph.nodes.items():
+        builder.add_node(node_id, cost=node.cost, layer=node.layer)
+    for node_id, node in graph.nodes.items():
+        for edge in node.edges:
+            builder.add_edge(node_id, edge.to_node.id, edge_cost=edge.cost)
+    return builder
+
+
+def test_csr_dijkstra() -> None:
+    """Test that dijkstra on the CSR graph gives the results of dijkstra on the graph."""
+    csr_graph = to_csr(test_graph).build()
+    result = dijkstra(test_graph, start_id=1)
+    csr_result = csr_dijkstra(csr_graph, start_id=1)
+    for node_id in test_graph.nodes:
+        assert math.isclose(csr_result.distances[node_id], result.distances[node_id], rel_tol=1e-6)
+        assert csr_result.get_path(node_id) == result.get_path(node_id)
+    assert csr_result.nodes_expanded == result.nodes_expanded
+    assert csr_result.heap_pushes == result.heap_pushes
+    assert csr_dijkstra(csr_graph, start_id=1, target_id=3).nodes_expanded < 5
+
+
+def test_csr_layered_heuristic() -> None:
+    """Test the A* search with the layered heuristic on the CSR graph."""
+    csr_graph = to_csr(layered_graph).build()
+    heuristic = csr_layered_heuristic(csr_graph)
+    assert dict(zip(csr_graph.node_ids, heuristic.tolist(), strict=True)) == (
+        layered_heuristic(layered_graph)
+    )
+    result = csr_dijkstra(csr_graph, start_id=-1, target_id=-2, heuristic=heuristic)
+    assert result.distances[-2] == 1.0
+    assert result.get_path(-2) == [-1, 10, 20, -2]
+    with raises(ValueError):
+        csr_layered_heuristic(to_csr(test_graph).build())
+
+
+def test_csr_graph_builder() -> None:
+    """Test the arrays of a CSR graph."""
+    builder = CSRGraphBuilder()
+    for node_id in [5, 6, 7]:
+        builder.add_node(node_id, cost=float(node_id))
+    builder.add_edges([5, 6], [7], [[1.0], [2.0]])
+    builder.add_edge(5, 6, edge_cost=0.5)
+    builder.add_edge(5, 8)  # unknown node, ignored
+    graph = builder.build()
+    assert graph.number_of_nodes == 3
+    assert graph.row_offsets.tolist() == [0, 2, 3, 3]
+    assert graph.col_indices.tolist() == [2, 1, 2]
+    assert graph.edge_costs.tolist() == [1.0, 0.5, 2.0]
+    assert graph.edges(5) == [(7, 1.0), (6, 0.5)]
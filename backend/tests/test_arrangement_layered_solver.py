@@ -0,0 +1,61 @@
+"""
+This is the test suite for the layered solver of the musical arrangements.
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from backend.src.music_piece.arrangement.layered_solver import (
+    layered_shortest_path,
+    layered_shortest_path_batch,
+)
+
+layers = [[0, 5, 9], [3, 7], [1, 4, 8], [6]]
+
+
+def node_cost(candidate: int) -> float:
+    """Cost of a candidate: its value modulo 3."""
+    return float(candidate % 3)
+
+
+def transition_cost(previous: int, candidate: int) -> float:
+    """Cost of a transition: the distance between the candidates."""
+    return float(abs(candidate - previous))
+
+
+def test_layered_shortest_path_matches_brute_force() -> None:
+    """Test that the solver finds the cheapest sequence of candidates."""
+    path, cost = layered_shortest_path(layers, node_cost, transition_cost)
+
+    def total(sequence: tuple[int, ...]) -> float:
+        return sum(node_cost(c) for c in sequence) + sum(
+            transition_cost(a, b) for a, b in itertools.pairwise(sequence)
+        )
+
+    best = min(itertools.product(*layers), key=total)
+    assert path == list(best)
+    assert cost == total(best)
+
+
+def test_layered_shortest_path_raises() -> None:
+    """Test that empty inputs are rejected."""
+    with pytest.raises(ValueError):
+        layered_shortest_path([], node_cost, transition_cost)
+    with pytest.raises(ValueError):
+        layered_shortest_path([[1], []], node_cost, transition_cost)
+
+
+def test_layered_shortest_path_batch() -> None:
+    """Test that the batch solver finds the same path as the scalar one."""
+    path, cost = layered_shortest_path(layers, node_cost, transition_cost)
+    indexes, batch_cost = layered_shortest_path_batch(
+        [np.array(layer) for layer in layers],
+        lambda layer: (layer % 3).astype(float),
+        lambda previous, layer: np.abs(layer[None, :] - previous[:, None]).astype(float),
+    )
+    assert [layer[index] for layer, index in zip(layers, indexes, strict=True)] == path
+    assert batch_cost == cost
+    with pytest.raises(ValueError):
+        layered_shortest_path_batch([np.array([1]), np.array([])], np.ones_like, np.outer)
@@ -0,0 +1,117 @@
+"""
+This is the test suite for the incremental arrangement session.
+"""
+
+import itertools
+import random
+
+from pytest import raises
+
+from backend.benchmarks.synthetic import random_chord
+from backend.src.instruments.neck_instrument import Guitar
+from backend.src.music_piece.arrangement.arrangement_session import ArrangementSession
+from backend.src.music_piece.arrangement.neck_arrangement import neck_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.positions.neck_position import NeckPosition
+
+guitar = Guitar()
+
+
+def arrangement_cost(positions: list[NeckPosition]) -> float:
+    """Returns the total cost of an arrangement on the guitar."""
+    return sum(guitar.position_cost(position, check_valid=False) for position in positions) + sum(
+        guitar.transition_cost(previous, position)
+        for previous, position in itertools.pairwise(positions)
+    )
+
+
+def playable_timed_chord(rng: random.Random, index: int) -> TimedChord:
+    """Returns a timed chord with at least one valid position on the guitar."""
+    while True:
+        chord = random_chord(guitar, rng.randint(1, 3), rng)
+        if guitar.valid_positions(guitar.possible_positions(list(chord))):
+            return TimedChord(chord=chord, start_time=index * 0.5, duration=0.5)
+
+
+def piece_of(timed_chords: list[TimedChord]) -> MusicPiece:
+    """Returns a music piece of the timed chords."""
+    piece = MusicPiece()
+    for timed_chord in timed_chords:
+        piece.add_timed_chord(timed_chord)
+    return piece
+
+
+def test_arrangement_session_matches_neck_arrangement() -> None:
+    """Test that the session finds arrangements as good as a full re-arrangement after edits."""
+    rng = random.Random(0)
+    session = ArrangementSession(
+        piece_of([playable_timed_chord(rng, i) for i in range(12)]), guitar
+    )
+    for step in range(60):
+        timed_chord = playable_timed_chord(rng, step)
+        edit = step % 3
+        if edit == 0:
+            session.insert(rng.randint(0, len(session)), timed_chord)
+        elif edit == 1:
+            session.delete(rng.randrange(len(session)))
+        else:
+            session.replace(rng.randrange(len(session)), timed_chord)
+        positions, cost = session.arrangement()
+        assert len(positions) == len(session)
+        assert abs(arrangement_cost(positions) - cost) < 1e-9
+        expected = neck_arrangement(piece_of(session.timed_chords), guitar)
+        assert abs(arrangement_cost(expected) - cost) < 1e-9
+
+
+def test_arrangement_session_edits() -> None:
+    """Test the timed chords of the session after edits."""
+    c_major = TimedChord(chord=(48, 52, 55), start_time=0.0, duration=1.0)
+    g_major = TimedChord(chord=(55, 59), start_time=1.0, duration=1.0)
+    a_note = TimedChord(chord=(57,), start_time=2.0, duration=1.0)
+    session = ArrangementSession(piece_of([c_major, g_major]), guitar)
+    session.insert(2, a_note)
+    assert session.replace(0, a_note) == c_major
+    assert session.delete(1) == g_major
+    assert session.timed_chords == [a_note, a_note]
+    positions, _ = session.arrangement()
+    assert positions[0] == positions[1]
+
+
+def test_arrangement_session_raises() -> None:
+    """Test the errors of the session."""
+    unplayable = TimedChord(chord=(20,), start_time=0.0, duration=1.0)
+    with raises(ValueError):
+        ArrangementSession(piece_of([unplayable]), guitar)
+    session = ArrangementSession(MusicPiece(), guitar)
+    with raises(ValueError):
+        session.arrangement()
+    with raises(ValueError):
+        session.insert(0, unplayable)
+    with raises(IndexError):
+        session.insert(1, TimedChord(chord=(57,), start_time=0.0, duration=1.0))
+    assert len(session) == 0
+
+
+def test_arrangement_session_index_range() -> None:
+    """Test that the edits out of the range of the session, negative indexes included,
+    raise before changing the session."""
+    c_major = TimedChord(chord=(48, 52, 55), start_time=0.0, duration=1.0)
+    g_major = TimedChord(chord=(55, 59), start_time=1.0, duration=1.0)
+    a_note = TimedChord(chord=(57,), start_time=2.0, duration=1.0)
+    piece = piece_of([c_major, g_major, c_major])
+    session = ArrangementSession(piece, guitar)
+    expected = session.arrangement()
+    for index in [-1, -3, 3]:
+        with raises(IndexError, match="out of the range"):
+            session.delete(index)
+        with raises(IndexError, match="out of the range"):
+            session.replace(index, a_note)
+    with raises(IndexError, match="out of the range"):
+        session.insert(-1, a_note)
+    assert session.timed_chords == [c_major, g_major, c_major]
+    assert session.arrangement() == expected
+    session.replace(2, a_note)
+    assert session.arrangement()[0] == neck_arrangement(
+        piece_of([c_major, g_major, a_note]), guitar
+    )
@@ -5,7 +5,15 @@ It tests the functionality of chord naming based on musical notes.
 
 import pytest
 
-from backend.src.autochord.name_chord import name_chord
+from backend.src.autochord import name_chord as name_chord_module
+from backend.src.autochord.chord_symbol import (
+    chord_symbol_pitch_classes,
+    parse_chord_symbol,
+    vocabulary_pitch_classes,
+)
+from backend.src.autochord.name_chord import load_chord_data, name_chord, name_chords
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
 
 
 def test_name_chord() -> None:
@@ -31,6 +39,8 @@ def test_name_chord_with_midi_numbers() -> None:
     assert name_chord([60, 64, 67, 70]) == "C7"
     assert name_chord([60, 64, 67, 70, 73]) == "C7b9"
     assert name_chord([60, 64, 67, 74, 76]) == "C9"
+    assert name_chord([60, 63, 67, 75]) == "Cm"
+    assert name_chord([62, 65, 69, 72, 74, 77]) == "Dm7"
 
 
 def test_name_chord_raises() -> None:
@@ -41,3 +51,49 @@ def test_name_chord_raises() -> None:
         name_chord(["C4", "E4", "G4", "H4"])
     with pytest.raises(ValueError):
         name_chord(["C4", "E4"])
+    with pytest.raises(ValueError):
+        name_chord([120, 124, 131])
+
+
+def test_name_chords() -> None:
+    """Test the naming of every chord of a music piece."""
+    music_piece = MusicPiece()
+    chords = [(60, 64, 67), (60,), (67, 71, 74, 77), (60, 64), (48, 52, 55, 58, 61)]
+    for index, chord in enumerate(chords):
+        music_piece.add_timed_chord(TimedChord(chord=chord, start_time=index, duration=1))
+    assert name_chords(music_piece) == ["C", None, "G7", None, "C7b9"]
+    assert name_chords(MusicPiece()) == []
+
+
+def test_parse_chord_symbol() -> None:
+    """Test the parsing of chord symbols."""
+    assert parse_chord_symbol("C") == (0, [0, 4, 7])
+    assert parse_chord_symbol("Cmaj7") == (0, [0, 4, 7, 11])
+    assert parse_chord_symbol("F#m7b5") == (6, [0, 3, 6, 10])
+    assert parse_chord_symbol("Ebsus4") == (3, [0, 5, 7])
+    assert parse_chord_symbol("Cb7") == (11, [0, 4, 7, 10])
+    assert parse_chord_symbol("Cb511") == (0, [0, 4, 6, 17])
+    assert chord_symbol_pitch_classes("D7sus4") == frozenset({2, 7, 9, 0})
+    for notes in ([60, 64, 67, 71], [66, 69, 73, 76], [62, 67, 69, 72], [60, 64, 67, 70, 73]):
+        assert chord_symbol_pitch_classes(name_chord(notes)) == {note % 12 for note in notes}
+    vocabulary = vocabulary_pitch_classes()
+    assert len(vocabulary) == len(set(vocabulary))
+    for symbol in ["C", "Cmaj7", "F#m7b5", "Ebsus4", "D7sus4", "Bbm9b13", "Asus2sus4"]:
+        assert chord_symbol_pitch_classes(symbol) in vocabulary
+
+
+def test_parse_chord_symbol_raises() -> None:
+    """Test the parsing of chord symbols raises errors for symbols out of the vocabulary."""
+    for symbol in ["", "H7", "Cdim", "C#maj8"]:
+        with pytest.raises(ValueError):
+            parse_chord_symbol(symbol)
+
+
+def test_chord_data_on_first_use() -> None:
+    """Test that the chord data is read once, and still exposed as chord_data."""
+    load_chord_data.cache_clear()
+    assert name_chord_module.chord_data is load_chord_data()
+    assert load_chord_data.cache_info().misses == 1
+    assert name_chord([60, 64, 67]) == "C"
+    with pytest.raises(AttributeError):
+        _ = name_chord_module.chord_table
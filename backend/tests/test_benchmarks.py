@@ -0,0 +1,44 @@
+"""
+This is the test suite for the benchmark suite: synthetic inputs and baseline comparison.
+"""
+
+from backend.benchmarks.run_benchmarks import IMPORT_BUDGETS, compare_results, import_time
+from backend.benchmarks.synthetic import random_chords, random_piece, random_roll
+from backend.src.instruments.neck_instrument import Guitar, Ukulele
+from backend.src.music_piece.music_piece import MusicPiece
+
+
+def test_random_chords_are_seeded_and_playable() -> None:
+    """Test that the synthetic chords are reproducible and have candidate positions."""
+    guitar = Guitar()
+    chords = random_chords(guitar, size=3, count=10, seed=42)
+    assert chords == random_chords(guitar, size=3, count=10, seed=42)
+    for chord in chords:
+        assert len(chord) == 3
+        assert len(guitar.possible_positions(list(chord))) > 0
+
+
+def test_random_piece_and_roll() -> None:
+    """Test the synthetic music pieces and piano rolls."""
+    piece = random_piece(Ukulele(), length=25, seed=1)
+    assert len(piece.timed_chords) == 25
+    assert all(1 <= len(timed_chord.chord) <= 3 for timed_chord in piece.timed_chords)
+    roll = random_roll(length=30, seed=1)
+    assert len(MusicPiece.from_roll(roll).timed_chords) == 30
+
+
+def test_compare_results() -> None:
+    """Test that only the benchmarks slower than the threshold are flagged."""
+    baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}}
+    current = {"a": {"median": 1.05}, "b": {"median": 1.5}, "d": {"median": 9.0}}
+    assert compare_results(baseline, current, threshold=0.1) == ["b"]
+
+
+def test_import_budgets() -> None:
+    """Test that the budgeted modules import without their lazy dependencies.
+    The time budgets themselves are checked by the import benchmark (run_benchmarks run),
+    a wall-clock limit depends too much on the machine running the tests."""
+    for module in IMPORT_BUDGETS:
+        seconds, lazy_modules = import_time(module)
+        assert not lazy_modules
+        assert seconds > 0
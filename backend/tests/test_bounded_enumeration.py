@@ -0,0 +1,69 @@
+"""
+This is the test suite for the admission control of the enumeration of positions.
+"""
+
+import math
+
+from backend.src.instruments.bounded_enumeration import (
+    EnumerationLimits,
+    best_first_positions,
+    bounded_positions,
+    enumeration_size,
+)
+from backend.src.instruments.neck_instrument import Guitar
+
+guitar = Guitar()
+big_chord = [48, 52, 55, 60, 64]
+limits = EnumerationLimits(max_placements=100)
+
+
+def test_enumeration_size() -> None:
+    """Test that the estimate is the product of the places of each note."""
+    assert enumeration_size(guitar, []) == 0
+    assert enumeration_size(guitar, [60]) == 3
+    assert enumeration_size(guitar, big_chord) == math.prod(
+        len(guitar.possible_places_one_note(note)) for note in big_chord
+    )
+    assert enumeration_size(guitar, big_chord) > limits.max_placements
+
+
+def test_best_first_positions() -> None:
+    """Test that the best-first search finds the cheapest positions, from the cheapest."""
+    for notes in [[60], [48, 52, 55], [52, 57, 61], [40, 47, 52, 56]]:
+        expected = sorted(
+            guitar.position_cost(position, check_valid=False)
+            for position in guitar.valid_positions(guitar.possible_positions(notes))
+        )
+        positions_costs, complete = best_first_positions(guitar, notes, 5, 10_000)
+        assert complete
+        assert [cost for _, cost in positions_costs] == expected[:5]
+        for position, cost in positions_costs:
+            assert guitar.is_valid_position(position)
+            assert guitar.position_cost(position) == cost
+    best, _ = best_first_positions(guitar, [48, 52, 55], 1, 10_000)
+    best_position = guitar.best_position([48, 52, 55])
+    assert best_position is not None
+    assert best[0][1] == guitar.position_cost(best_position)
+    assert best_first_positions(guitar, [48, 52, 55], 5, 2) == ([], False)
+
+
+def test_bounded_positions() -> None:
+    """Test the mode of the requests under and over the limit."""
+    result = bounded_positions(guitar, [48, 52, 55], EnumerationLimits())
+    assert result.mode == "exhaustive"
+    assert [position for position, _ in result.positions_costs] == guitar.valid_positions(
+        guitar.possible_positions([48, 52, 55])
+    )
+    rejected = bounded_positions(guitar, big_chord, limits._replace(on_exceeded="reject"))
+    assert rejected.mode == "rejected"
+    assert rejected.positions_costs == []
+    assert rejected.estimated_size == enumeration_size(guitar, big_chord)
+    degraded = bounded_positions(guitar, big_chord, limits._replace(max_positions=3))
+    assert degraded.mode == "best_first"
+    assert degraded.complete
+    assert len(degraded.positions_costs) == 3
+    costs = [cost for _, cost in degraded.positions_costs]
+    assert costs == sorted(costs)
+    best_position = guitar.best_position(big_chord)
+    assert best_position is not None
+    assert costs[0] == guitar.position_cost(best_position)
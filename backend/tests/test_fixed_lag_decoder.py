@@ -0,0 +1,87 @@
+"""
+This is the test suite for the online fixed-lag arrangement.
+"""
+
+import math
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from pytest import raises
+
+from backend.src.api.api import app
+from backend.src.instruments.neck_instrument import Guitar
+from backend.src.music_piece.arrangement.fixed_lag_decoder import Decision, FixedLagDecoder
+from backend.src.music_piece.arrangement.neck_arrangement import (
+    arrangement_cost,
+    neck_arrangement,
+)
+from backend.src.music_piece.music_piece import MusicPiece
+
+piece = MusicPiece.from_midi(Path("backend/assets/midi_files/test_sample4.mid"))
+guitar = Guitar()
+
+
+def decode(decoder: FixedLagDecoder) -> list[Decision]:
+    """Streams the chords of the piece to the decoder, and returns every decision."""
+    decisions = []
+    for timed_chord in piece.timed_chords:
+        decisions.extend(decoder.push(timed_chord.chord))
+        assert len(decoder) <= decoder.lag  # the window never grows with the stream
+    return decisions + decoder.flush()
+
+
+def test_fixed_lag_decoder() -> None:
+    """Test that each chord is committed once, in order, with the costs of the arrangement."""
+    optimal_cost = arrangement_cost(neck_arrangement(piece, guitar), guitar)
+    for lag in [0, 1, 3]:
+        decisions = decode(FixedLagDecoder(guitar, lag))
+        assert [decision.chord_index for decision in decisions] == list(
+            range(len(piece.timed_chords))
+        )
+        positions = [decision.position for decision in decisions]
+        total_cost = sum(
+            decision.position_cost + decision.transition_cost for decision in decisions
+        )
+        assert math.isclose(total_cost, arrangement_cost(positions, guitar))
+        assert total_cost >= optimal_cost
+    # a lag longer than the stream is the exact arrangement
+    decisions = decode(FixedLagDecoder(guitar, len(piece.timed_chords)))
+    positions = [decision.position for decision in decisions]
+    assert math.isclose(arrangement_cost(positions, guitar), optimal_cost)
+
+
+def test_fixed_lag_decoder_errors() -> None:
+    """Test that a chord without positions is skipped, and the stream goes on."""
+    decoder = FixedLagDecoder(guitar, lag=1)
+    assert not decoder.push((48, 52, 55))
+    with raises(ValueError):
+        decoder.push((12,))
+    decisions = decoder.push((55, 59))
+    assert [decision.chord_index for decision in decisions] == [0]
+    assert [decision.chord_index for decision in decoder.flush()] == [2]
+    with raises(ValueError):
+        decoder.push((55, 59), sustained=(48,))  # not a note of the chord
+    with raises(ValueError):
+        FixedLagDecoder(guitar, lag=-1)
+
+
+def test_stream_arrangement_api() -> None:
+    """Test the WebSocket endpoint streaming the decisions."""
+    client = TestClient(app)
+    with client.websocket_connect("/streamArrangement?instrument=Guitar&lag=1") as websocket:
+        websocket.send_json({"notes": ["C3", "E3", "G3"]})
+        websocket.send_json({"notes": ["C0"]})
+        assert websocket.receive_json() == {
+            "index": 1,
+            "error": "No valid positions found for notes: C0 for guitar",
+        }
+        websocket.send_json({"notes": ["G3", "B3"]})
+        assert websocket.receive_json()["index"] == 0
+        websocket.send_json({"chord": []})
+        assert "error" in websocket.receive_json()
+        websocket.send_json({"end": True})
+        message = websocket.receive_json()
+        assert message["index"] == 2
+        assert set(message) == {"index", "position", "position_cost", "transition_cost"}
+    with client.websocket_connect("/streamArrangement?instrument=Piano") as websocket:
+        assert "error" in websocket.receive_json()
@@ -0,0 +1,34 @@
+"""
+This is the test suite for the keyboard arrangement functionality.
+"""
+
+from pytest import raises
+
+from backend.src.instruments.keyboard_instrument import KeyboardInstrument
+from backend.src.music_piece.arrangement.keyboard_arrangement import keyboard_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+
+
+def test_keyboard_arrangement_basic() -> None:
+    """Test basic keyboard arrangement functionality."""
+    piece = MusicPiece(title="Test Piece")
+    chords = [(48, 60, 64, 67), (43, 59, 62, 67), (45, 57, 60, 64, 69), (48, 60, 64, 67, 72)]
+    for index, chord in enumerate(chords):
+        piece.add_timed_chord(TimedChord(chord=chord, start_time=index, duration=1.0))
+    instrument = KeyboardInstrument()
+    positions = keyboard_arrangement(piece, instrument)
+    assert len(positions) == len(chords)
+    for position, chord in zip(positions, chords, strict=True):
+        assert sorted(position.placements) == sorted(chord)
+        assert position in instrument.possible_positions(list(chord))
+
+
+def test_keyboard_arrangement_raises() -> None:
+    """Test that unplayable pieces are rejected."""
+    piece = MusicPiece(title="Unplayable")
+    piece.add_timed_chord(TimedChord(chord=(36, 60, 84), start_time=0.0, duration=1.0))
+    with raises(ValueError):
+        keyboard_arrangement(piece, KeyboardInstrument())
+    with raises(ValueError):
+        keyboard_arrangement(MusicPiece(), KeyboardInstrument())
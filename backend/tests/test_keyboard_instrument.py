@@ -0,0 +1,84 @@
+"""
+This is the test suite for the KeyboardInstrument class.
+"""
+
+import math
+
+from backend.src.instruments.keyboard_instrument import KeyboardInstrument
+from backend.src.positions.position import Position
+
+keyboard = KeyboardInstrument()
+
+c_major_right = Position.from_str_notes(["C4", "E4", "G4"], [5, 7, 9])
+c_major_left = Position.from_str_notes(["C3", "E3", "G3"], [0, 2, 4])
+crossed_hands = Position.from_str_notes(["C5", "C3"], [3, 6])
+same_finger = Position.from_str_notes(["C4", "D4"], [6, 6])
+d_minor_right = Position.from_str_notes(["D4", "F4", "A4"], [5, 7, 9])
+
+
+def test_keyboard_position_cost() -> None:
+    """Test the position cost of the keyboard instrument."""
+    assert keyboard.position_cost(c_major_right) == 0
+    assert keyboard.position_cost(c_major_left) == 0
+    assert keyboard.position_cost(crossed_hands) >= keyboard.crossing_hands_penalty_factor
+    assert keyboard.position_cost(same_finger) >= keyboard.same_finger_penalty_factor
+
+
+def test_keyboard_transition_cost() -> None:
+    """Test the transition cost of the keyboard instrument."""
+    assert keyboard.transition_cost(c_major_right, c_major_right) == 0
+    assert keyboard.transition_cost(c_major_right, d_minor_right) > 0
+
+
+def test_keyboard_explain_costs() -> None:
+    """Test that the cost breakdowns sum up to the costs."""
+    positions = [c_major_right, c_major_left, crossed_hands, same_finger, d_minor_right]
+    for position in positions:
+        breakdown = keyboard.explain_position_cost(position)
+        assert math.isclose(sum(breakdown.values()), keyboard.position_cost(position))
+        for other in positions:
+            breakdown = keyboard.explain_transition_cost(position, other)
+            assert math.isclose(sum(breakdown.values()), keyboard.transition_cost(position, other))
+    assert keyboard.explain_position_cost(crossed_hands)["crossing_hands"] > 0
+
+
+def test_keyboard_possible_positions() -> None:
+    """Test the pruned enumeration of keyboard fingerings."""
+    single_note = keyboard.possible_positions([60])
+    assert len(single_note) == len(keyboard.fingers)
+    triad = keyboard.possible_positions([67, 60, 64])
+    assert 0 < len(triad) <= math.comb(10, 3)
+    for position in triad:
+        assert position.placements == [60, 64, 67]
+        assert position.fingers == sorted(set(position.fingers))
+    assert c_major_right in triad
+    assert c_major_left in keyboard.possible_positions([48, 52, 55])
+    # too wide for two hands
+    assert not keyboard.possible_positions([36, 60, 84])
+    assert not keyboard.possible_positions([])
+    assert not keyboard.possible_positions([0])
+
+
+def test_keyboard_slots() -> None:
+    """Test the fixed slot form of keyboard positions."""
+    assert keyboard.to_slots(c_major_right) == [-1, -1, -1, -1, -1, 60, -1, 64, -1, 67]
+    assert keyboard.slots_to_position(keyboard.to_slots(c_major_right)) == c_major_right
+    assert keyboard.positions_to_slots([]).shape == (0, 10)
+
+
+def test_keyboard_batch_costs() -> None:
+    """Test that the batch costs match the costs of single positions."""
+    layer_1 = keyboard.possible_positions([48, 60, 64, 67])
+    layer_2 = keyboard.possible_positions([50, 62, 65, 69])
+    slots_1 = keyboard.positions_to_slots(layer_1)
+    slots_2 = keyboard.positions_to_slots(layer_2)
+    for position, cost in zip(layer_1, keyboard.position_costs(slots_1), strict=True):
+        assert math.isclose(cost, keyboard.position_cost(position))
+    transitions = keyboard.transition_costs(slots_1, slots_2)
+    assert transitions.shape == (len(layer_1), len(layer_2))
+    for i, position_1 in enumerate(layer_1):
+        for j, position_2 in enumerate(layer_2):
+            assert math.isclose(transitions[i, j], keyboard.transition_cost(position_1, position_2))
+    same = keyboard.transition_costs(slots_1, slots_1)
+    for i, position_1 in enumerate(layer_1):
+        assert math.isclose(same[i, i], keyboard.transition_cost(position_1, position_1))
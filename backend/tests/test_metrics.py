@@ -0,0 +1,78 @@
+"""
+This is the test suite for the metrics module and the instrumentation of the pipeline.
+"""
+
+from backend.src.api.api import metrics
+from backend.src.instruments.neck_instrument import Guitar
+from backend.src.music_piece.arrangement.neck_arrangement import neck_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+from backend.src.utils.metrics import (
+    CANDIDATES_PER_CHORD,
+    GRAPH_EDGES,
+    METRICS,
+    STAGE_SECONDS,
+    MetricsRegistry,
+)
+
+
+def test_histogram_render() -> None:
+    """Test the Prometheus text format of a histogram."""
+    registry = MetricsRegistry(enabled=True)
+    histogram = registry.histogram("test_seconds", "A test histogram.", ("stage",), (0.1, 1))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+    assert registry.render().splitlines() == [
+        "# HELP test_seconds A test histogram.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 5.55',
+        'test_seconds_count{stage="a"} 3',
+    ]
+
+
+def test_counter_render() -> None:
+    """Test the Prometheus text format of a counter."""
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "A test counter.", ("result",))
+    counter.inc("hit")
+    counter.inc("hit", amount=2)
+    assert registry.render().splitlines()[-1] == 'test_total{result="hit"} 3'
+
+
+def test_disabled_metrics_record_nothing() -> None:
+    """Test that an arrangement records nothing when the metrics are disabled."""
+    piece = MusicPiece()
+    piece.add_timed_chord(TimedChord(chord=(48, 52, 55), start_time=0.0, duration=1.0))
+    piece.add_timed_chord(TimedChord(chord=(55, 59), start_time=1.0, duration=1.0))
+    METRICS.reset()
+    METRICS.enabled = False
+    neck_arrangement(piece, Guitar())
+    for stage in ["enumeration", "validation", "costing", "graph_build", "search"]:
+        assert STAGE_SECONDS.count(stage) == 0
+    assert CANDIDATES_PER_CHORD.count("valid") == 0
+    assert GRAPH_EDGES.count() == 0
+
+
+def test_pipeline_instrumentation() -> None:
+    """Test that an arrangement records each stage and that /metrics exposes them."""
+    piece = MusicPiece()
+    piece.add_timed_chord(TimedChord(chord=(48, 52, 55), start_time=0.0, duration=1.0))
+    piece.add_timed_chord(TimedChord(chord=(55, 59), start_time=1.0, duration=1.0))
+    METRICS.reset()
+    METRICS.enabled = True
+    try:
+        neck_arrangement(piece, Guitar())
+    finally:
+        METRICS.enabled = False
+    for stage in ["enumeration", "validation", "costing", "graph_build", "search"]:
+        assert STAGE_SECONDS.count(stage) > 0
+    assert CANDIDATES_PER_CHORD.count("valid") == 2
+    assert GRAPH_EDGES.count() == 1
+    body = bytes(metrics().body).decode()
+    assert 'omf_stage_seconds_count{stage="search"} 1' in body
+    assert 'omf_cache_requests_total{cache="places_one_note",result="hit"}' in body
+    METRICS.reset()
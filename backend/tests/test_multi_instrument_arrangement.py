@@ -0,0 +1,88 @@
+"""
+This is the test suite for the arrangement of a music piece for several instruments.
+"""
+
+from backend.src.api.get_instrument_comparison import (
+    ARRANGEMENT_POOLS,
+    IN_PROCESS_CHORDS,
+    arrangement_pool,
+    get_instrument_comparison,
+    shutdown_arrangement_pools,
+)
+from backend.src.instruments.neck_instrument import Banjo, Bass, Guitar, Mandolin, Ukulele
+from backend.src.music_piece.arrangement.multi_instrument_arrangement import (
+    InternedPiece,
+    multi_instrument_arrangement,
+)
+from backend.src.music_piece.arrangement.neck_arrangement import (
+    arrangement_cost,
+    explain_arrangement,
+    neck_arrangement,
+)
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+
+piece = MusicPiece(title="Test Piece")
+for index, chord in enumerate([(60, 64, 67), (67, 71, 74), (60, 64, 67), (57, 60, 64)]):
+    piece.add_timed_chord(TimedChord(chord=chord, start_time=float(index), duration=1.0))
+
+instruments = {"Guitar": Guitar(), "Ukulele": Ukulele(), "Banjo": Banjo(), "Bass": Bass()}
+
+
+def test_interned_piece() -> None:
+    """Test that the chords are stored once, and the piece is rebuilt identically."""
+    interned = InternedPiece.from_music_piece(piece)
+    assert interned.chords == [(60, 64, 67), (67, 71, 74), (57, 60, 64)]
+    assert interned.chord_indices == [0, 1, 0, 2]
+    rebuilt = interned.to_music_piece()
+    assert list(rebuilt.timed_chords) == list(piece.timed_chords)
+
+
+def test_multi_instrument_arrangement() -> None:
+    """Test that each instrument gets its own arrangement, sorted by total cost."""
+    arrangements = multi_instrument_arrangement(piece, instruments, max_workers=2)
+    assert set(arrangements) == set(instruments)
+    costs = [arrangement.total_cost for arrangement in arrangements.values()]
+    assert costs == sorted(costs)
+    assert arrangements["Bass"].error is not None  # out of range
+    assert arrangements["Bass"].total_cost == float("inf")
+    assert arrangements["Guitar"].error is None
+    for name, arrangement in arrangements.items():
+        if arrangement.error is not None:
+            continue
+        positions = neck_arrangement(piece, instruments[name])
+        assert arrangement.positions == positions
+        assert arrangement.total_cost == arrangement_cost(positions, instruments[name])
+    # in this process, same results
+    assert multi_instrument_arrangement(piece, instruments, max_workers=1) == arrangements
+    assert list(multi_instrument_arrangement(piece, {"Mandolin": Mandolin()})) == ["Mandolin"]
+
+
+def test_instrument_comparison_pool() -> None:
+    """Test that the short requests are arranged in this process, and the long ones on one pool
+    shared by the requests, started without forking."""
+    shutdown_arrangement_pools()
+    chords = [list(timed_chord.chord) for timed_chord in piece.timed_chords]
+    comparison = get_instrument_comparison(chords, instruments)
+    assert not ARRANGEMENT_POOLS
+    assert list(comparison) == list(multi_instrument_arrangement(piece, instruments, max_workers=1))
+    assert "cost_breakdown" not in comparison["Guitar"]
+    explained = get_instrument_comparison(chords, instruments, explain=True)
+    assert explained["Guitar"]["cost_breakdown"] == explain_arrangement(
+        neck_arrangement(piece, instruments["Guitar"]), instruments["Guitar"]
+    )
+    assert explained["Bass"] == comparison["Bass"]  # the error only
+
+    long_chords = chords * (IN_PROCESS_CHORDS // len(chords) + 1)
+    comparison = get_instrument_comparison(long_chords, instruments)
+    pool = arrangement_pool()
+    assert list(ARRANGEMENT_POOLS.values()) == [pool]
+    assert "fork" not in ARRANGEMENT_POOLS
+    assert comparison["Guitar"]["positions"] == [
+        position.to_json()
+        for position in neck_arrangement(MusicPiece.from_chords(long_chords), instruments["Guitar"])
+    ]
+    get_instrument_comparison(long_chords, instruments)
+    assert arrangement_pool() is pool
+    shutdown_arrangement_pools()
+    assert not ARRANGEMENT_POOLS
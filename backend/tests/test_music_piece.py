@@ -4,7 +4,11 @@ Tests for the MusicPiece class, which represents a musical piece with timed chor
 
 from pathlib import Path
 
-from backend.src.music_piece.music_piece import MusicPiece
+from pytest import raises
+
+from backend.src.music_piece.music_piece import ChordMerging, IngestionReport, MusicPiece
+from backend.src.music_piece.piano_roll import PianoRoll
+from backend.src.music_piece.timed_chord import TimedChord
 
 PATH_TO_MIDI_FILE = Path("backend/assets/midi_files/test_sample1.mid")
 
@@ -26,3 +30,102 @@ def test_music_piece_from_midi() -> None:
     assert piece.timed_chords[1].start_time - piece.timed_chords[0].start_time > 1
     assert piece.timed_chords[-1].chord == (51,)
     assert piece.timed_chords[-1].duration > 0.2
+
+
+def test_music_piece_from_chords() -> None:
+    """Test the creation of a music piece from a sequence of chords."""
+    music_piece = MusicPiece.from_chords([[64, 60, 67], [62]], title="Chords")
+    assert music_piece.title == "Chords"
+    assert [tc.chord for tc in music_piece.timed_chords] == [(60, 64, 67), (62,)]
+    assert [tc.start_time for tc in music_piece.timed_chords] == [0.0, 1.0]
+
+
+def test_music_piece_columns() -> None:
+    """Test that the timed chords are views of the columns of the music piece."""
+    music_piece = MusicPiece.from_chords([[60, 64, 67], [62], [59, 62]])
+    assert music_piece.start_times.tolist() == [0.0, 1.0, 2.0]
+    assert music_piece.pitch_offsets.tolist() == [0, 3, 4, 6]
+    assert music_piece.pitches.tolist() == [60, 64, 67, 62, 59, 62]
+    assert music_piece.timed_chords[-1].chord == (59, 62)
+    assert [tc.chord for tc in music_piece.timed_chords[1:]] == [(62,), (59, 62)]
+    assert not hasattr(music_piece.timed_chords[0], "__dict__")
+    with raises(ValueError):
+        music_piece.durations[0] = 2.0  # read-only
+
+
+def test_music_piece_save_load(tmp_path: Path) -> None:
+    """Test that a saved music piece is loaded identically, memory-mapped or not."""
+    piece = MusicPiece.from_midi(PATH_TO_MIDI_FILE)
+    path = tmp_path / "piece.omf"
+    piece.save(path)
+    for mmap in [True, False]:
+        loaded = MusicPiece.load(path, mmap=mmap)
+        assert loaded.title == piece.title
+        assert list(loaded.timed_chords) == list(piece.timed_chords)
+        assert loaded.ingestion_report == piece.ingestion_report
+    # a memory-mapped piece can be saved back to its file
+    MusicPiece.load(path).save(path)
+    assert list(MusicPiece.load(path).timed_chords) == list(piece.timed_chords)
+    assert [file.name for file in tmp_path.iterdir()] == [path.name]
+    # a memory-mapped piece is copied when a timed chord is added
+    loaded = MusicPiece.load(path)
+    loaded.add_timed_chord(TimedChord(chord=(60,), start_time=100.0, duration=1.0))
+    assert len(loaded.timed_chords) == len(piece.timed_chords) + 1
+    assert list(MusicPiece.load(path).timed_chords) == list(piece.timed_chords)
+
+    MusicPiece(title="Empty").save(path)
+    assert not MusicPiece.load(path).timed_chords
+    path.write_bytes(b"not a music piece")
+    with raises(ValueError):
+        MusicPiece.load(path)
+
+
+def roll_of(frames: list[tuple[int, ...]]) -> PianoRoll:
+    """Returns a piano roll at 10 frames per second playing one chord per frame."""
+    return PianoRoll(
+        roll=[[pitch in chord for chord in frames] for pitch in range(128)], frame_rate=10
+    )
+
+
+def test_music_piece_chord_merging() -> None:
+    """Test that staggered onsets and releases, and short chords, are merged."""
+    c_major, g_major = (48, 52, 55), (55, 59, 62)
+    roll = roll_of(
+        [(48,), (48, 52), *[c_major] * 4, (48, 52), (48,), *[g_major] * 3, (60,), *[g_major] * 2]
+    )
+    piece = MusicPiece.from_roll(roll)
+    assert piece.ingestion_report is not None
+    assert piece.ingestion_report.reduction_ratio == 1.0
+    assert len(piece.timed_chords) == 8
+
+    piece = MusicPiece.from_roll(roll, merging=ChordMerging(onset_tolerance=0.2))
+    assert [tc.chord for tc in piece.timed_chords][:2] == [c_major, (48, 52)]
+    assert piece.timed_chords[0].duration == 0.6
+    piece = MusicPiece.from_roll(
+        roll, merging=ChordMerging(onset_tolerance=0.2, offset_tolerance=0.2, min_duration=0.15)
+    )
+    assert [tc.chord for tc in piece.timed_chords] == [c_major, g_major]
+    assert [tc.start_time for tc in piece.timed_chords] == [0.0, 0.8]
+    assert [tc.duration for tc in piece.timed_chords] == [0.8, 0.6]
+    assert piece.ingestion_report == IngestionReport(frame_chords=8, timed_chords=2)
+    assert piece.ingestion_report.reduction_ratio == 4.0
+    # the staggering is longer than the tolerance
+    piece = MusicPiece.from_roll(roll, merging=ChordMerging(0.1, 0.1))
+    assert [tc.chord for tc in piece.timed_chords][:3] == [(48,), c_major, (48,)]
+
+
+def test_music_piece_onset_segmentation(tmp_path: Path) -> None:
+    """Test that the timed chords start at onsets, the held notes being sustained."""
+    roll = roll_of([(48, 60), (48, 60), (48, 64), (48, 64, 67), (48, 67), (48,), (48,)])
+    piece = MusicPiece.from_roll(roll)
+    assert len(piece.timed_chords) == 5
+    piece = MusicPiece.from_roll(roll, segmentation="onsets")
+    assert [tc.chord for tc in piece.timed_chords] == [(48, 60), (48, 64), (48, 64, 67)]
+    assert [tc.sustained for tc in piece.timed_chords] == [(), (48,), (48, 64)]
+    assert [tc.duration for tc in piece.timed_chords] == [0.2, 0.1, 0.4]
+    assert piece.ingestion_report == IngestionReport(frame_chords=5, timed_chords=3)
+    path = tmp_path / "piece.omf"
+    piece.save(path)
+    assert list(MusicPiece.load(path).timed_chords) == list(piece.timed_chords)
+    with raises(ValueError):
+        MusicPiece.from_roll(roll, merging=ChordMerging(), segmentation="onsets")
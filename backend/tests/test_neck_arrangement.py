@@ -2,12 +2,22 @@
 This is the test suite for the neck arrangement functionality.
 """
 
+import itertools
 from pathlib import Path
 
 from pytest import raises
 
 from backend.src.instruments.neck_instrument import Guitar
-from backend.src.music_piece.arrangement.neck_arrangement import neck_arrangement
+from backend.src.instruments.shape_library import shape_library
+from backend.src.music_piece.arrangement.anytime_arrangement import anytime_arrangement
+from backend.src.music_piece.arrangement.arrangement_session import ArrangementSession
+from backend.src.music_piece.arrangement.fixed_lag_decoder import FixedLagDecoder
+from backend.src.music_piece.arrangement.held_notes import held_transitions
+from backend.src.music_piece.arrangement.neck_arrangement import (
+    arrangement_cost,
+    explain_arrangement,
+    neck_arrangement,
+)
 from backend.src.music_piece.music_piece import MusicPiece
 from backend.src.music_piece.timed_chord import TimedChord
 from backend.src.positions.neck_position import NeckPosition
@@ -51,3 +61,71 @@ def test_neck_arrangement_from_midi_2() -> None:
     positions = neck_arrangement(music_piece=music_piece, instrument=instrument)
     assert isinstance(positions, list)
     assert len(positions) == len(music_piece.timed_chords)
+
+
+def test_explain_arrangement() -> None:
+    """Test the cost breakdown of an arrangement."""
+    piece = MusicPiece(title="Test Piece")
+    piece.add_timed_chord(TimedChord(chord=(48, 52, 55), start_time=0.0, duration=1.0))
+    piece.add_timed_chord(TimedChord(chord=(55, 59), start_time=1.0, duration=1.0))
+    instrument = Guitar()
+    positions = neck_arrangement(music_piece=piece, instrument=instrument)
+    explanation = explain_arrangement(positions, instrument)
+    assert len(explanation) == 2
+    assert explanation[0]["transition_cost"] == {}
+    assert sum(explanation[0]["position_cost"].values()) == instrument.position_cost(positions[0])
+    assert sum(explanation[1]["transition_cost"].values()) == instrument.transition_cost(
+        positions[0], positions[1]
+    )
+
+
+def test_solvers_keep_sustained_notes() -> None:
+    """Test that the solvers agree on a piece with sustained notes, and keep them in place."""
+    piece = MusicPiece.from_midi(
+        Path("backend/assets/midi_files/test_sample4.mid"), segmentation="onsets"
+    )
+    guitar = Guitar()
+    timed_chords = list(piece.timed_chords)
+    assert any(timed_chord.sustained for timed_chord in timed_chords)
+
+    def broken_held_notes(positions: list[NeckPosition]) -> int:
+        """Returns the number of transitions of the arrangement not allowed by held_notes."""
+        broken = 0
+        for (previous_chord, timed_chord), (previous, position) in zip(
+            itertools.pairwise(timed_chords), itertools.pairwise(positions), strict=True
+        ):
+            previous_positions = [
+                candidate for candidate, _ in shape_library(guitar).candidates(previous_chord.chord)
+            ]
+            candidates = [
+                candidate for candidate, _ in shape_library(guitar).candidates(timed_chord.chord)
+            ]
+            allowed = held_transitions(
+                previous_positions, candidates, timed_chord.sustained, guitar
+            )
+            broken += not allowed[previous_positions.index(previous), candidates.index(position)]
+        return broken
+
+    expected = neck_arrangement(piece, guitar)
+    expected_cost = arrangement_cost(expected, guitar)
+    assert broken_held_notes(expected) == 0
+
+    anytime = anytime_arrangement(piece, guitar, time_budget=60.0)
+    assert anytime.optimal
+    assert anytime.total_cost == expected_cost
+    assert broken_held_notes(anytime.positions) == 0
+
+    positions, total_cost = ArrangementSession(piece, guitar).arrangement()
+    assert total_cost == expected_cost
+    assert broken_held_notes(positions) == 0
+
+    for lag in [2, len(timed_chords)]:
+        decoder = FixedLagDecoder(guitar, lag)
+        decisions = []
+        for timed_chord in timed_chords:
+            decisions += decoder.push(timed_chord.chord, timed_chord.sustained)
+        decisions += decoder.flush()
+        positions = [decision.position for decision in decisions]
+        assert broken_held_notes(positions) == 0
+        if lag == len(timed_chords):  # the whole piece is seen before committing
+            assert arrangement_cost(positions, guitar) == expected_cost
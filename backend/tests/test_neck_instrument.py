@@ -2,7 +2,9 @@
 This is the test suite for the NeckInstrument class.
 """
 
-from backend.src.instruments.neck_instrument import Banjo, Guitar, NeckInstrument
+from pytest import raises
+
+from backend.src.instruments.neck_instrument import Banjo, Guitar, Mandolin, NeckInstrument
 from backend.src.positions.neck_position import NeckPosition
 
 
@@ -73,6 +75,30 @@ def test_neck_instrument_is_valid_position() -> None:
     assert not random_neck_instrument_1.is_valid_position(neck_pos_2)
 
 
+def test_neck_instrument_valid_positions() -> None:
+    """Test that the compiled validity checks give the verdicts of invalid_reason."""
+    invalid_positions = [
+        NeckPosition.from_strings_frets(fingers=[1, 2], strings=[1, 2], frets=[3, 2]),  # order
+        NeckPosition.from_strings_frets(fingers=[1, 2], strings=[1, 1], frets=[2, 3]),  # string
+        NeckPosition.from_strings_frets(fingers=[1, 4], strings=[1, 2], frets=[1, 6]),  # span
+        NeckPosition.from_strings_frets(fingers=[1, 2], strings=[1, 2], frets=[1, 13]),  # fret
+        NeckPosition.from_strings_frets(fingers=[1, 2], strings=[1, 7], frets=[1, 2]),  # string
+        NeckPosition.from_strings_frets(fingers=[1, 5], strings=[1, 2], frets=[1, 2]),  # finger
+        NeckPosition.from_strings_frets(fingers=[1, 1], strings=[1, 2], frets=[1, 3]),  # barre
+    ]
+    for position in invalid_positions:
+        assert not guitar.is_valid_position(position)
+    assert guitar.is_valid_position(NeckPosition(()))
+    for instrument in [guitar, banjo, random_neck_instrument_1, Mandolin()]:
+        for notes in [[60], [48, 52, 55], [40, 47, 52, 56], [67, 71, 74], [50, 57, 62]]:
+            positions = instrument.possible_positions(notes) + invalid_positions
+            expected = [pos for pos in positions if instrument.invalid_reason(pos) is None]
+            assert [pos for pos in positions if instrument.is_valid_position(pos)] == expected
+            assert instrument.valid_positions(positions) == expected
+            # more positions than MIN_VECTORIZED_POSITIONS, checked as arrays
+            assert instrument.valid_positions(positions * 20) == expected * 20
+
+
 def test_neck_instrument_default_fingering() -> None:
     """Test the default fingering of the neck instruments."""
     assert guitar.default_fingering(in_position=neck_pos_1) == neck_pos_1
@@ -97,3 +123,68 @@ def test_neck_instrument_possible_positions() -> None:
     assert len(guitar.possible_positions([60])) > 3
     assert len(guitar.possible_positions([48, 50, 52])) > 0
     assert len(banjo.possible_positions([48, 50, 100])) == 0
+
+
+def test_neck_instrument_best_position() -> None:
+    """Test that the best position search matches an exhaustive search."""
+    chords = [
+        [60],
+        [48, 52, 55],
+        [47, 52, 55],
+        [52, 57, 61],
+        [40, 47, 52, 56, 59, 64],
+        [67, 71, 74],
+    ]
+    for instrument in [guitar, banjo, Mandolin()]:
+        for notes in chords:
+            valid_positions = [
+                pos
+                for pos in instrument.possible_positions(notes)
+                if instrument.is_valid_position(pos)
+            ]
+            best = instrument.best_position(notes)
+            if not valid_positions:
+                assert best is None
+                continue
+            expected = min(valid_positions, key=instrument.position_cost)
+            assert best == expected
+    assert guitar.best_position([]) is None
+    assert banjo.best_position([48, 50, 100]) is None
+
+
+def test_neck_instrument_invalid_reason() -> None:
+    """Test the reasons given for invalid positions."""
+    assert guitar.invalid_reason(neck_pos_1) is None
+    assert banjo.invalid_reason(neck_pos_3) == "String doesn't exist"
+    assert random_neck_instrument_1.invalid_reason(neck_pos_2) == "Finger doesn't exist"
+
+
+def test_neck_instrument_explain_costs() -> None:
+    """Test that the cost breakdowns sum up to the costs."""
+    for position in [neck_pos_1, neck_pos_2, neck_pos_3, neck_pos_4]:
+        breakdown = guitar.explain_position_cost(position)
+        assert sum(breakdown.values()) == guitar.position_cost(position)
+        for other in [neck_pos_1, neck_pos_2, neck_pos_3, neck_pos_4]:
+            breakdown = guitar.explain_transition_cost(position, other)
+            assert sum(breakdown.values()) == guitar.transition_cost(position, other)
+    assert banjo.explain_position_cost(neck_pos_3) == {"invalid_position": 1000.0}
+    assert set(guitar.explain_position_cost(neck_pos_3)) == {
+        "in_between_strings",
+        "string_gap",
+        "hand_placement",
+    }
+
+
+def test_neck_instrument_courses() -> None:
+    """Test that the positions of an instrument with courses are expanded to its strings."""
+    mandolin = Mandolin()
+    assert mandolin.detail()["strings"] == ["E5", "E5", "A4", "A4", "D4", "D4", "G4", "G4"]
+    assert mandolin.possible_places_one_note(69) == [(2, 0), (3, 7), (4, 2)]
+    position = NeckPosition.from_strings_frets(fingers=[0, 2], strings=[2, 1], frets=[0, 2])
+    expanded = mandolin.expand_courses(position)
+    assert expanded.strings == [3, 4, 1, 2]
+    assert expanded.frets == [0, 0, 2, 2]
+    assert expanded.fingers == [0, 0, 2, 2]
+    assert guitar.expand_courses(neck_pos_1) is neck_pos_1
+    with raises(ValueError):
+        NeckInstrument(open_strings=["E4", "B3"], courses=[2])
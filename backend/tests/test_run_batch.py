@@ -0,0 +1,99 @@
+"""
+This is the test suite for the batch arrangement of MIDI corpora.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import pretty_midi
+from pytest import MonkeyPatch
+
+from backend.batch.run_batch import arrange_file, collect_midi_files, parse_args, run
+from backend.src.music_piece.music_piece import MusicPiece
+
+SAMPLE = Path("backend/assets/midi_files/test_sample4.mid")
+
+
+def read_records(output: Path) -> list[dict]:
+    """Returns the records of a JSONL output."""
+    return [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+
+
+def test_collect_midi_files(tmp_path: Path) -> None:
+    """Test that directories, files and glob patterns are collected without duplicates."""
+    (tmp_path / "nested").mkdir()
+    shutil.copy(SAMPLE, tmp_path / "a.mid")
+    shutil.copy(SAMPLE, tmp_path / "nested" / "b.MIDI")
+    (tmp_path / "notes.txt").write_text("not a MIDI file")
+    files = [tmp_path / "a.mid", tmp_path / "nested" / "b.MIDI"]
+    assert collect_midi_files([str(tmp_path)]) == files
+    assert collect_midi_files([str(tmp_path / "**" / "*"), str(tmp_path / "a.mid")]) == files
+    assert collect_midi_files([str(tmp_path / "missing" / "*.mid")]) == []
+
+
+def test_run_batch(tmp_path: Path) -> None:
+    """Test that the files are arranged in parallel, the failures recorded,
+    and the results already in the output skipped."""
+    shutil.copy(SAMPLE, tmp_path / "sample.mid")
+    (tmp_path / "broken.mid").write_bytes(b"not a MIDI file")
+    output, cache = tmp_path / "results.jsonl", tmp_path / "cache.sqlite"
+    argv = [str(tmp_path), "--instruments", "Guitar", "Ukulele", "--workers", "2"]
+    argv += ["--output", str(output), "--cache", str(cache), "--no-progress"]
+
+    assert run(parse_args(argv)) == 0
+    records = read_records(output)
+    assert len(records) == 4
+    failed = [record for record in records if record["error"] is not None]
+    assert {record["file"] for record in failed} >= {str(tmp_path / "broken.mid")}
+    arranged = [record for record in records if record["error"] is None]
+    for record in arranged:
+        assert record["cached"] is False
+        assert record["chords"] == len(record["positions"]) > 0
+
+    assert run(parse_args(argv)) == 0
+    assert len(read_records(output)) == 4  # everything was skipped
+
+    shutil.copy(SAMPLE, tmp_path / "copy.mid")
+    assert run(parse_args(argv)) == 0
+    copies = [record for record in read_records(output)[4:] if record["error"] is None]
+    assert len(copies) == len(arranged)
+    assert all(record["cached"] for record in copies)  # same content as sample.mid
+
+    previous = read_records(output)
+    assert run(parse_args([*argv, "--retry-failed"])) == 0
+    retried = read_records(output)[len(previous) :]
+    assert len(retried) == sum(record["error"] is not None for record in previous)
+
+
+def test_arrange_file_parses_once(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Test that a file is parsed once for all its instruments, not at all when they are all
+    cached, and that the positions of course instruments are on their strings."""
+    midi = pretty_midi.PrettyMIDI()
+    mandolin = pretty_midi.Instrument(program=0)
+    for index, pitch in enumerate([67, 69, 71, 72]):
+        mandolin.notes.append(pretty_midi.Note(100, pitch, index * 0.5, index * 0.5 + 0.5))
+    midi.instruments.append(mandolin)
+    midi_path = tmp_path / "scale.mid"
+    midi.write(str(midi_path))
+    from_midi = MusicPiece.from_midi
+    calls = []
+
+    def counted_from_midi(*args: object, **kwargs: object) -> MusicPiece:
+        calls.append(args)
+        return from_midi(*args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(MusicPiece, "from_midi", counted_from_midi)
+    cache_path = tmp_path / "cache.sqlite"
+    records = arrange_file(midi_path, ["Guitar", "Mandolin"], 20, cache_path)
+    assert len(calls) == 1
+    assert [record["error"] for record in records] == [None, None]
+    assert [record["cached"] for record in records] == [False, False]
+    for position in records[1]["positions"]:
+        assert len(position["strings"]) == 2  # one note on the two strings of a course
+    cached_records = arrange_file(midi_path, ["Guitar", "Mandolin"], 20, cache_path)
+    assert len(calls) == 1
+    assert [record["cached"] for record in cached_records] == [True, True]
+    assert [record["positions"] for record in cached_records] == [
+        record["positions"] for record in records
+    ]
@@ -0,0 +1,72 @@
+"""
+This is the test suite for the ShapeLibrary class.
+"""
+
+from backend.src.instruments.neck_instrument import Banjo, Guitar, Mandolin
+from backend.src.instruments.shape_library import ShapeLibrary, shape_library
+from backend.src.music_piece.arrangement.neck_arrangement import neck_arrangement
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+
+chords = [
+    (61,),
+    (49, 53, 56),  # C# major, then its transpositions
+    (58, 62, 65),
+    (56, 60, 63),
+    (42, 46, 49, 54),
+    (44, 48, 51, 56),
+    (48, 52, 55),  # G3 is an open string
+    (62, 65, 69),
+]
+
+
+def test_shape_library_candidates() -> None:
+    """Test that the translated shapes are the enumerated valid positions, with their costs."""
+    for instrument in [Guitar(), Banjo(), Mandolin()]:
+        library = ShapeLibrary(instrument)
+        for chord in chords:
+            expected = [
+                (position, instrument.position_cost(position, check_valid=False))
+                for position in instrument.valid_positions(
+                    instrument.possible_positions(list(chord))
+                )
+            ]
+            candidates = library.candidates(chord)
+            assert [repr(position) for position, _ in candidates] == [
+                repr(position) for position, _ in expected
+            ]
+            assert [cost for _, cost in candidates] == [cost for _, cost in expected]
+
+
+def test_shape_library_shapes() -> None:
+    """Test that the transpositions of a chord share their shapes."""
+    guitar = Guitar()
+    library = ShapeLibrary(guitar)
+    assert library.candidates(()) == []
+    assert not library.is_regular((48, 52, 55))
+    library.candidates((48, 52, 55))
+    assert len(library) == 0  # enumerated
+    for chord in chords[1:4]:
+        assert library.is_regular(chord)
+        library.candidates(chord)
+    assert (0, 4, 7) in library
+    assert len(library) == 1
+    # high on the neck, the shapes past the last fret are dropped
+    candidates = library.candidates((66, 70, 73))
+    assert candidates != []
+    assert all(max(position.frets) <= 12 for position, _ in candidates)
+    assert len(candidates) < len(library.candidates((49, 53, 56)))
+
+
+def test_shared_shape_library() -> None:
+    """Test that the equal instruments share a library, kept from one arrangement to the next."""
+    library = shape_library(Guitar())
+    assert shape_library(Guitar()) is library
+    piece = MusicPiece()
+    piece.add_timed_chord(TimedChord(chord=(51, 55, 58), start_time=0.0, duration=1.0))
+    neck_arrangement(piece, Guitar())
+    assert (0, 4, 7) in library
+    guitar = Guitar()
+    guitar.new_finger_cost += 1
+    assert shape_library(guitar) is not library
+    assert library.instrument.new_finger_cost == Guitar().new_finger_cost
@@ -2,6 +2,8 @@
 Tests for the TimedChord class, which represents a chord with timing information.
 """
 
+from pytest import raises
+
 from backend.src.music_piece.timed_chord import TimedChord
 
 # Create a TimedChord instance for testing
@@ -25,3 +27,11 @@ def test_start_time_property() -> None:
 def test_duration_property() -> None:
     """Test that the duration property returns the correct duration."""
     assert timed_chord.duration == DURATION
+
+
+def test_sustained_notes() -> None:
+    """Test that the sustained notes must be notes of the chord."""
+    assert timed_chord.sustained == ()
+    assert TimedChord(chord, START_TIME, DURATION, sustained=(60,)).sustained == (60,)
+    with raises(ValueError):
+        TimedChord(chord, START_TIME, DURATION, sustained=(62,))
@@ -0,0 +1,100 @@
+"""
+This is the test suite for the capo and tuning sweep.
+"""
+
+from pytest import MonkeyPatch, raises
+
+from backend.src.instruments.neck_instrument import Guitar, NeckInstrument, Ukulele
+from backend.src.music_piece.arrangement.neck_arrangement import (
+    arrangement_cost,
+    neck_arrangement,
+)
+from backend.src.music_piece.arrangement.tuning_sweep import (
+    GUITAR_TUNINGS,
+    Tuning,
+    capo_tunings,
+    retuned_instrument,
+    tuning_sweep,
+)
+from backend.src.music_piece.music_piece import MusicPiece
+from backend.src.music_piece.timed_chord import TimedChord
+
+guitar = Guitar()
+piece = MusicPiece(title="Test Piece")
+for index, chord in enumerate([(50, 57, 62, 66), (43, 50, 55, 59), (50, 57, 62, 66), (45, 52, 57)]):
+    piece.add_timed_chord(TimedChord(chord=chord, start_time=float(index), duration=1.0))
+
+
+def test_retuned_instrument() -> None:
+    """Test the open strings and frets of a retuned instrument."""
+    drop_d = Tuning.from_open_strings("Drop D", guitar, GUITAR_TUNINGS["Drop D"], capo=2)
+    assert drop_d.string_offsets == (0, 0, 0, 0, 0, -2)
+    retuned = retuned_instrument(guitar, drop_d)
+    assert retuned.open_strings == [66, 61, 57, 52, 47, 40]
+    assert retuned.number_of_frets == 10
+    assert retuned.new_finger_cost == guitar.new_finger_cost
+    assert retuned.possible_places_one_note(40) == [(6, 0)]
+    assert guitar.open_strings == [64, 59, 55, 50, 45, 40]  # unchanged
+    with raises(ValueError):
+        retuned_instrument(guitar, Tuning("Capo 12", (0,) * 6, 12))
+    with raises(ValueError):
+        Tuning.from_open_strings("Open D", guitar, ["D4"])
+
+
+def test_capo_tunings() -> None:
+    """Test that the capo tunings stop before the last fret, whatever max_capo."""
+    ukulele = Ukulele()
+    tunings = capo_tunings(ukulele, max_capo=30)
+    assert [tuning.capo for tuning in tunings] == list(range(ukulele.number_of_frets))
+    for tuning in tunings:
+        assert retuned_instrument(ukulele, tuning).number_of_frets >= 1
+    assert len(tuning_sweep(piece, ukulele, tunings, exact_count=0)) == len(tunings)
+
+
+def test_tuning_sweep() -> None:
+    """Test that the best estimated tunings are arranged exactly, and the others only ranked."""
+    tunings = capo_tunings(guitar, max_capo=4) + [
+        Tuning.from_open_strings(name, guitar, open_strings)
+        for name, open_strings in GUITAR_TUNINGS.items()
+        if name != "Standard"
+    ]
+    tunings.append(Tuning("Too high", (12,) * 6))  # the low notes can't be played
+    results = tuning_sweep(piece, guitar, tunings, exact_count=3, max_workers=1)
+    assert len(results) == len(tunings)
+    exact, estimated = results[:3], results[3:]
+    for result in exact:
+        retuned = retuned_instrument(guitar, result.tuning)
+        assert result.positions == neck_arrangement(piece, retuned)
+        assert result.total_cost == arrangement_cost(result.positions, retuned)
+    assert [result.total_cost for result in exact] == sorted(
+        result.total_cost for result in exact if result.total_cost is not None
+    )
+    assert max(result.estimated_cost for result in exact) <= min(
+        result.estimated_cost for result in estimated
+    )
+    assert all(result.positions is None for result in estimated)
+    assert results[-1].tuning.name == "Too high"
+    assert results[-1].estimated_cost == float("inf")
+    with raises(ValueError):
+        tuning_sweep(piece, guitar, [tunings[0], tunings[0]])
+
+
+def test_tuning_estimates_share_the_placements(monkeypatch: MonkeyPatch) -> None:
+    """Test that the tunings are estimated without searching positions, and that a capo
+    shifts the estimate of the instrument tuned as with the capo."""
+
+    def no_search(*_: object) -> None:
+        msg = "The estimates must not search the best positions."
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(NeckInstrument, "best_position", no_search)
+    tunings = capo_tunings(guitar, max_capo=4)
+    estimates = {
+        result.tuning.name: result.estimated_cost
+        for result in tuning_sweep(piece, guitar, tunings, exact_count=0)
+    }
+    for tuning in tunings:
+        retuned = retuned_instrument(guitar, tuning)
+        [result] = tuning_sweep(piece, retuned, capo_tunings(retuned, max_capo=0), exact_count=0)
+        assert result.estimated_cost == estimates[tuning.name]
+    assert len(set(estimates.values())) > 1
@@ -0,0 +1,108 @@
+"""
+This is the test suite for the voicing index of the musical instrument fingering application.
+It tests the ranking of the voicings of a set of pitch classes on an instrument.
+"""
+
+import threading
+
+import pytest
+
+from backend.src.api.get_voicings_for_chord_symbol import (
+    MAX_VOICINGS,
+    VOICING_INDEXES,
+    get_voicings_for_chord_symbol,
+    voicing_index,
+)
+from backend.src.autochord.chord_symbol import chord_symbol_pitch_classes
+from backend.src.instruments.neck_instrument import Guitar, Mandolin, Ukulele
+from backend.src.instruments.voicing_index import VoicingIndex
+
+C_MAJOR = frozenset({0, 4, 7})
+
+guitar = Guitar()
+
+
+def test_voicings() -> None:
+    """Test that the voicings play the pitch classes and are ranked by cost."""
+    index = VoicingIndex(guitar, max_voicings=5)
+    voicings = index.voicings(C_MAJOR)
+    assert len(voicings) == 5
+    costs = [cost for _, cost in voicings]
+    assert costs == sorted(costs)
+    for position, cost in voicings:
+        assert guitar.is_valid_position(position)
+        assert cost == guitar.position_cost(position)
+        notes = [
+            guitar.open_strings[string - 1] + fret
+            for string, fret in zip(position.strings, position.frets, strict=True)
+        ]
+        assert {note % 12 for note in notes} == C_MAJOR
+        assert len(notes) == len(C_MAJOR)
+
+
+def test_voicings_are_indexed_once() -> None:
+    """Test that a set of pitch classes is indexed on its first lookup only."""
+    index = VoicingIndex(guitar)
+    assert len(index) == 0
+    index.build([C_MAJOR, frozenset({2, 5, 9})])
+    assert C_MAJOR in index
+    assert len(index) == 2
+    assert index.voicings(C_MAJOR) is index.voicings(C_MAJOR)
+
+
+def test_voicings_unplayable() -> None:
+    """Test the sets of pitch classes the instrument can't play."""
+    index = VoicingIndex(Ukulele())
+    assert index.voicings(frozenset()) == []
+    assert index.voicings(frozenset({0, 2, 4, 5, 7})) == []
+
+
+def test_voicing_index_is_built_on_creation() -> None:
+    """Test that the voicing index of an instrument holds every chord symbol it can play
+    when it is created, and that the limits out of range are rejected."""
+    ukulele = Ukulele()
+    VOICING_INDEXES.pop(ukulele.name, None)
+    index = voicing_index(ukulele)
+    assert voicing_index(ukulele) is index
+    assert index.max_voicings == MAX_VOICINGS
+    indexed = len(index)
+    for symbol in ["C", "Cmaj7", "F#m7b5", "D7sus4", "Bbm9"]:
+        assert chord_symbol_pitch_classes(symbol) in index
+    voicings = get_voicings_for_chord_symbol("Am", ukulele, MAX_VOICINGS)
+    assert isinstance(voicings, list)
+    assert len(voicings) == MAX_VOICINGS
+    assert len(index) == indexed
+    for limit in [0, MAX_VOICINGS + 1]:
+        with pytest.raises(ValueError, match="limit"):
+            get_voicings_for_chord_symbol("Cmaj7", ukulele, limit)
+
+
+def test_voicing_index_builds_do_not_block_other_instruments(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a request for an instrument doesn't wait for the index of another one."""
+    guitar_started = threading.Event()
+    release_guitar = threading.Event()
+    build = VoicingIndex.build
+
+    def slow_guitar_build(index: VoicingIndex, sets_of_pitch_classes: list[frozenset[int]]) -> None:
+        if index.instrument.name == guitar.name:
+            guitar_started.set()
+            release_guitar.wait(timeout=10)
+            sets_of_pitch_classes = [C_MAJOR]
+        build(index, sets_of_pitch_classes)
+
+    monkeypatch.setattr(VoicingIndex, "build", slow_guitar_build)
+    mandolin = Mandolin()
+    VOICING_INDEXES.pop(guitar.name, None)
+    VOICING_INDEXES.pop(mandolin.name, None)
+    guitar_build = threading.Thread(target=voicing_index, args=(guitar,))
+    guitar_build.start()
+    try:
+        assert guitar_started.wait(timeout=10)
+        assert chord_symbol_pitch_classes("Cmaj7") in voicing_index(mandolin)
+        assert guitar.name not in VOICING_INDEXES
+    finally:
+        release_guitar.set()
+        guitar_build.join()
+    assert C_MAJOR in VOICING_INDEXES.pop(guitar.name)